@@ -0,0 +1,180 @@
+"""FAISS index specs shared by the builders, the API store and the ANN benchmark.
+
+A spec is "<kind>[:key=value,...]", for example:
+
+    flat
+    hnsw:M=32,efConstruction=80,efSearch=64
+    ivf:nlist=1024,nprobe=16
+    ivfpq:nlist=1024,m=48,nbits=8,nprobe=32
+
+All kinds use inner product, i.e. cosine similarity on unit vectors.
+"""
+import math
+import warnings
+from typing import Dict, Optional, Tuple
+
+import faiss
+import numpy as np
+
+KINDS = ("flat", "hnsw", "ivf", "ivfpq")
+
+# Parameters that only affect search; everything else requires a rebuild.
+SEARCH_KEYS = {"nprobe", "efSearch"}
+
+_INT_KEYS = {"M", "efConstruction", "efSearch", "nlist", "nprobe", "m", "nbits"}
+
+
+def parse_index_spec(spec: str) -> Tuple[str, Dict[str, int]]:
+    spec = (spec or "flat").strip()
+    kind, _, rest = spec.partition(":")
+    kind = kind.strip().lower()
+    if kind not in KINDS:
+        raise ValueError(f"Unknown index kind {kind!r} (expected one of {', '.join(KINDS)})")
+
+    params: Dict[str, int] = {}
+    for part in filter(None, (p.strip() for p in rest.split(","))):
+        key, sep, val = part.partition("=")
+        key = key.strip()
+        if not sep or key not in _INT_KEYS:
+            raise ValueError(f"Bad index spec parameter {part!r} in {spec!r}")
+        params[key] = int(val)
+    return kind, params
+
+
+def build_key(spec: str) -> Tuple[str, Tuple[Tuple[str, int], ...]]:
+    """Identity of the index structure, ignoring search-only parameters."""
+    kind, params = parse_index_spec(spec)
+    return kind, tuple(sorted((k, v) for k, v in params.items() if k not in SEARCH_KEYS))
+
+
+def default_nlist(n: int) -> int:
+    # ~4*sqrt(n) lists, but keep >= 39 training points per centroid.
+    return max(1, min(int(4 * math.sqrt(max(n, 1))), n // 39 or 1))
+
+
+def make_index(spec: str, d: int, n_hint: int) -> faiss.Index:
+    """Create an empty (untrained) index for spec."""
+    kind, p = parse_index_spec(spec)
+    if kind == "flat":
+        return faiss.IndexFlatIP(d)
+
+    if kind == "hnsw":
+        index = faiss.IndexHNSWFlat(d, p.get("M", 32), faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = p.get("efConstruction", 80)
+        index.hnsw.efSearch = p.get("efSearch", 64)
+        return index
+
+    nlist = p.get("nlist") or default_nlist(n_hint)
+    quantizer = faiss.IndexFlatIP(d)
+    if kind == "ivf":
+        index = faiss.IndexIVFFlat(quantizer, d, nlist, faiss.METRIC_INNER_PRODUCT)
+    else:
+        m = p.get("m", 48)
+        if d % m:
+            raise ValueError(f"ivfpq m={m} must divide the embedding dimension {d}")
+        index = faiss.IndexIVFPQ(quantizer, d, nlist, m, p.get("nbits", 8), faiss.METRIC_INNER_PRODUCT)
+    index.nprobe = p.get("nprobe", max(1, nlist // 64))
+    return index
+
+
+def _train_sample(emb: np.ndarray, index: faiss.Index) -> np.ndarray:
+    # k-means subsamples to 256 points per centroid anyway; an evenly strided sample keeps
+    # training memory bounded when emb is a memory-mapped corpus.
+    ivf = ivf_of(index)
+    centroids = ivf.nlist if ivf is not None else 1
+    if isinstance(ivf, faiss.IndexIVFPQ):
+        centroids = max(centroids, 1 << ivf.pq.nbits)
+    n_train = min(len(emb), centroids * 256)
+    step = max(1, len(emb) // n_train)
+    return np.ascontiguousarray(emb[::step][:n_train], dtype="float32")
+
+
+def add_chunked(index: faiss.Index, emb: np.ndarray, start: int = 0, chunk_rows: int = 65536) -> None:
+    """index.add(emb[start:]) without materializing the whole slice at once."""
+    for i in range(start, len(emb), chunk_rows):
+        index.add(np.ascontiguousarray(emb[i: i + chunk_rows], dtype="float32"))
+
+
+def build_index(emb: np.ndarray, spec: str = "flat") -> faiss.Index:
+    """Create, train (if needed) and fill an index for unit vectors emb (array or memmap)."""
+    index = make_index(spec, emb.shape[1], len(emb))
+    if not index.is_trained and len(emb):
+        index.train(_train_sample(emb, index))
+    add_chunked(index, emb)
+    return index
+
+
+def read_index(path: str, mmap: bool = False) -> faiss.Index:
+    """Load an index; with mmap the vector/code storage stays in the OS page cache.
+
+    Memory-mapped indexes are read-only and shared by every worker process that maps the
+    same file, and loading them does no full read. IO_FLAG_MMAP_IFC (faiss-cpu >= 1.11)
+    covers flat, HNSW and IVF storage; older builds only map IVF lists (IO_FLAG_MMAP), so
+    other indexes are read into memory with a warning.
+    """
+    if not mmap:
+        return faiss.read_index(path)
+    flag = getattr(faiss, "IO_FLAG_MMAP_IFC", None)
+    if flag is not None:
+        return faiss.read_index(path, flag | faiss.IO_FLAG_READ_ONLY)
+    index = faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    if ivf_of(index) is None:
+        warnings.warn(
+            f"faiss {faiss.__version__} can't memory-map {type(index).__name__} storage "
+            f"(needs faiss-cpu >= 1.11); {path} was read into memory",
+            RuntimeWarning,
+        )
+    return index
+
+
+def ivf_of(index: faiss.Index) -> Optional[faiss.IndexIVF]:
+    try:
+        return faiss.downcast_index(faiss.extract_index_ivf(index))
+    except RuntimeError:
+        return None
+
+
+def is_lossy(index: faiss.Index) -> bool:
+    """True when the index stores compressed codes, so its similarities are approximate."""
+    return isinstance(ivf_of(index), (faiss.IndexIVFPQ, faiss.IndexIVFScalarQuantizer))
+
+
+def search_params(
+    index: faiss.Index,
+    sel: Optional[faiss.IDSelector] = None,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    widen: int = 1,
+) -> faiss.SearchParameters:
+    """SearchParameters of the right subclass for index, with optional filter and overrides.
+
+    widen multiplies nprobe / efSearch, for a retry that must reach rows the first search missed.
+    """
+    ivf = ivf_of(index)
+    if ivf is not None:
+        params = faiss.SearchParametersIVF()
+        params.nprobe = min(ivf.nlist, int(nprobe or ivf.nprobe) * widen)
+    elif isinstance(index, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = int(ef_search or index.hnsw.efSearch) * widen
+    else:
+        params = faiss.SearchParameters()
+    if sel is not None:
+        params.sel = sel
+    return params
+
+
+def fully_probed(index: faiss.Index, nprobe: Optional[int] = None, widen: int = 1) -> bool:
+    """True when a search with these settings already visits every stored vector (IVF: every list)."""
+    ivf = ivf_of(index)
+    return ivf is None or int(nprobe or ivf.nprobe) * widen >= ivf.nlist
+
+
+def describe_index(index: faiss.Index) -> str:
+    ivf = ivf_of(index)
+    if ivf is not None:
+        kind = "ivfpq" if isinstance(ivf, faiss.IndexIVFPQ) else "ivf"
+        return f"{kind}:nlist={ivf.nlist},nprobe={ivf.nprobe}"
+    if isinstance(index, faiss.IndexHNSW):
+        return f"hnsw:efSearch={index.hnsw.efSearch}"
+    return "flat"
@@ -0,0 +1,141 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+import numpy as np
+
+
+@dataclass
+class _Pending:
+    text: str
+    future: Future = field(default_factory=Future)
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+def _percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    return float(np.percentile(np.fromiter(values, dtype="float64"), q))
+
+
+class EmbeddingBatcher:
+    """Coalesce concurrent single-query encodes into one forward pass.
+
+    Callers block in encode(); a background thread takes everything already queued,
+    encodes the unique texts in one call and hands each caller its (1, d) row. It only
+    holds a batch open for more requests (up to window_ms, or until max_batch are queued)
+    while traffic is concurrent, i.e. the previous batch had more than one request; a
+    lone request on an idle server is encoded straight away. After close(), encode()
+    runs the encoder in the calling thread.
+    """
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], np.ndarray],
+        window_ms: float = 3.0,
+        max_batch: int = 32,
+    ):
+        self._encode_fn = encode_fn
+        self.window_s = max(0.0, float(window_ms)) / 1000.0
+        self.max_batch = max(1, int(max_batch))
+
+        self._queue: "queue.Queue[Optional[_Pending]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._last_batch = 1
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+        self.batches = 0
+        self.items = 0
+        self.max_batch_seen = 0
+        self._recent_sizes: deque = deque(maxlen=1024)
+        self._recent_waits_ms: deque = deque(maxlen=1024)
+
+    def encode(self, text: str) -> np.ndarray:
+        pending = _Pending(text)
+        with self._lock:
+            # Checked under the lock close() takes, so nothing is queued behind the shutdown marker.
+            closed = self._closed
+            if not closed:
+                self._queue.put(pending)
+        if closed:
+            return self._encode_fn([text])[0:1]
+        return pending.future.result()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join(timeout=1.0)
+
+    def _collect(self, first: _Pending) -> List[_Pending]:
+        batch = [first]
+        deadline = time.perf_counter() + self.window_s
+        while len(batch) < self.max_batch:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                timeout = deadline - time.perf_counter()
+                if self._last_batch <= 1 or timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+            if item is None:
+                # Re-queue the shutdown marker so the run loop sees it after this batch.
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+            self._last_batch = len(batch)
+
+            started = time.perf_counter()
+            texts = list(dict.fromkeys(p.text for p in batch))
+            try:
+                vecs = self._encode_fn(texts)
+            except Exception as e:  # surface encoder failures to every waiting caller
+                for p in batch:
+                    p.future.set_exception(e)
+                continue
+
+            row_of = {t: i for i, t in enumerate(texts)}
+            for p in batch:
+                p.future.set_result(vecs[row_of[p.text]: row_of[p.text] + 1])
+
+            with self._lock:
+                self.batches += 1
+                self.items += len(batch)
+                self.max_batch_seen = max(self.max_batch_seen, len(batch))
+                self._recent_sizes.append(len(batch))
+                self._recent_waits_ms.extend((started - p.enqueued_at) * 1000.0 for p in batch)
+
+    def stats(self) -> dict:
+        with self._lock:
+            sizes = list(self._recent_sizes)
+            waits = list(self._recent_waits_ms)
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "mean_batch_size": (self.items / self.batches) if self.batches else 0.0,
+                "max_batch_size": self.max_batch_seen,
+                "p50_batch_size": _percentile(sizes, 50),
+                "p50_queue_wait_ms": _percentile(waits, 50),
+                "p99_queue_wait_ms": _percentile(waits, 99),
+                "window_ms": self.window_s * 1000.0,
+                "max_batch": self.max_batch,
+            }
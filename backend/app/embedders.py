@@ -0,0 +1,116 @@
+"""Query embedding backends for ProjectStore.
+
+"torch" runs the SentenceTransformer model as before. "onnx" runs a model exported by
+scripts/export_onnx.py (optionally int8-quantized) under ONNX Runtime: fast tokenizer ->
+transformer -> mean pooling -> L2 normalize, the same pipeline as all-MiniLM-L6-v2's
+SentenceTransformer, so its vectors search the indexes the builders wrote with torch.
+The export writes embedder.json next to the model; it must name the configured model.
+"hash" needs no model at all (see HashEmbedder); it is for offline benchmarks.
+"""
+import json
+import os
+import re
+import zlib
+from typing import List
+
+import numpy as np
+
+BACKENDS = ("torch", "onnx", "hash")
+
+
+class TorchEmbedder:
+    name = "torch"
+
+    def __init__(self, model_name: str, local_files_only: bool = False):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name, local_files_only=local_files_only)
+        self.dim = int(self.model.get_sentence_embedding_dimension())
+
+    def encode(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        return self.model.encode(texts, batch_size=batch_size).astype("float32")
+
+
+class OnnxEmbedder:
+    name = "onnx"
+
+    def __init__(self, model_path: str, model_name: str):
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise RuntimeError("embed_backend='onnx' needs onnxruntime (pip install -r requirements-onnx.txt)") from e
+
+        export_dir = os.path.dirname(os.path.abspath(model_path))
+        with open(os.path.join(export_dir, "embedder.json"), "r", encoding="utf-8") as f:
+            info = json.load(f)
+        if info.get("model_name") != model_name:
+            raise RuntimeError(
+                f"ONNX export at {model_path} is for {info.get('model_name')!r}, not {model_name!r} (re-export)"
+            )
+
+        self.dim = int(info["dim"])
+        self.tokenizer = Tokenizer.from_file(os.path.join(export_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=int(info["max_seq_length"]))
+        self.tokenizer.enable_padding(pad_id=int(info["pad_token_id"]), pad_token=info["pad_token"])
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, sess_options=opts, providers=["CPUExecutionProvider"])
+        self._inputs = {i.name for i in self.session.get_inputs()}
+        if os.path.basename(model_path) == info.get("int8_file"):
+            self.name = "onnx-int8"
+
+    def encode(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        out = []
+        for i in range(0, len(texts), batch_size):
+            enc = self.tokenizer.encode_batch(texts[i: i + batch_size])
+            mask = np.array([e.attention_mask for e in enc], dtype=np.int64)
+            feed = {
+                "input_ids": np.array([e.ids for e in enc], dtype=np.int64),
+                "attention_mask": mask,
+                "token_type_ids": np.array([e.type_ids for e in enc], dtype=np.int64),
+            }
+            hidden = self.session.run(None, {k: v for k, v in feed.items() if k in self._inputs})[0]
+            # Mean pooling over real tokens, as the SentenceTransformer Pooling module does.
+            m = mask[:, :, None].astype("float32")
+            out.append((hidden * m).sum(axis=1) / np.clip(m.sum(axis=1), 1e-9, None))
+        vecs = np.vstack(out).astype("float32")
+        return vecs / np.clip(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-12, None)
+
+
+class HashEmbedder:
+    """Signed feature hashing of a text's words into dim buckets, L2-normalized.
+
+    Deterministic and offline: texts that share words land close together, which is enough
+    to exercise search and reranking on a synthetic corpus. The vectors have nothing to do
+    with a real model's, so an index built with one only serves queries encoded by the other.
+    """
+    name = "hash"
+
+    def __init__(self, dim: int = 384):
+        self.dim = int(dim)
+
+    def encode(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype="float32")
+        for i, text in enumerate(texts):
+            words = re.findall(r"\w+", (text or "").lower())
+            if not words:
+                continue
+            h = np.fromiter((zlib.crc32(w.encode("utf-8")) for w in words), dtype=np.int64, count=len(words))
+            sign = np.where(h & 1, 1.0, -1.0)
+            out[i] = np.bincount((h >> 1) % self.dim, weights=sign, minlength=self.dim)
+        return out / np.clip(np.linalg.norm(out, axis=1, keepdims=True), 1e-12, None)
+
+
+def make_embedder(backend: str, model_name: str, onnx_path: str = "", local_files_only: bool = False):
+    backend = (backend or "torch").lower()
+    if backend == "torch":
+        return TorchEmbedder(model_name, local_files_only=local_files_only)
+    if backend == "onnx":
+        if not onnx_path or not os.path.exists(onnx_path):
+            raise RuntimeError(f"No ONNX model at {onnx_path!r} (run scripts/export_onnx.py)")
+        return OnnxEmbedder(onnx_path, model_name)
+    if backend == "hash":
+        return HashEmbedder()
+    raise ValueError(f"Unknown embed_backend {backend!r} (expected one of {', '.join(BACKENDS)})")
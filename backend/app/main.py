@@ -1,11 +1,17 @@
-from typing import List, Optional
-
-from fastapi import FastAPI, Query
+import hmac
+import threading
+import uuid
+from collections import Counter
+from typing import List, Optional, Sequence
+
+import numpy as np
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 
+from .cache import LRUCache
 from .settings import settings
 from .models import CheckRequest, CheckResponse, Neighbor, ScoreResponse
-from .store import ProjectStore
+from .store import Corpus, ProjectStore, ReloadInProgress
 from .scoring import originality_score, label_for_score
 from .suggest import make_suggestions
 
@@ -20,7 +26,17 @@ app.add_middleware(
 )
 
 store: ProjectStore | None = None
-last_response: CheckResponse | None = None
+
+# Full CheckResponses keyed by (canonical query, k, index generation). The sidebar GETs
+# without a query resolve through the caller's most recent key instead of a global; callers
+# are told apart by a session cookie, since many users can share one IP behind a proxy/NAT.
+result_cache = LRUCache(settings.result_cache_max_entries, ttl_seconds=settings.result_cache_ttl_s)
+last_keys = LRUCache(settings.result_cache_max_entries)
+SESSION_COOKIE = "check_session"
+
+# Search rounds each query needed (see _search_adaptive); reported by /stats for tuning.
+search_rounds: Counter = Counter()
+_search_rounds_lock = threading.Lock()
 
 
 def trend_label(score_all: int, score_recent: int):
@@ -40,62 +56,23 @@ def trend_label(score_all: int, score_recent: int):
             "Some overlap exists; adding a sharper niche/constraint can increase novelty.")
 
 
-def is_good_neighbor(p) -> bool:
-    tl = (p.type_label or "").lower()
-    if tl in {"template", "list", "platform"}:
-        return False
-
-    t = (p.title or "").strip().lower()
-    d = (p.description or "").strip().lower()
-
-    # hard filter: generic starter/boilerplate collections
-    bad_title_substrings = [
-        "starter", "boilerplate", "template", "blueprint", "misc", "resources",
-        "examples", "sample", "skeleton", "kickstart"
-    ]
-    if any(x in t for x in bad_title_substrings):
-        return False
-
-    generic_titles = {
-        "hackathon", "hackathons", "hackathon project", "hackathon-project",
-        "project", "projects", "1st-hackathon",
-    }
-    if t in generic_titles:
-        return False
-
-    # descriptions that say nothing
-    if len(d) < 60 and ("hackathon" in d or "repository" in d or "project" in d):
-        return False
-
-    return True
-
-
-def build_neighbors(sims, idxs, k_keep: int, qtext: str):
+def build_neighbors(corpus: Corpus, sims, idxs, k_keep: int, qtext: str):
     assert store is not None
-    candidates = []
-    texts = []
 
-    for emb_sim, idx in zip(sims, idxs):
-        if idx is None or idx < 0:
-            continue
-        if emb_sim != emb_sim:  # NaN
-            continue
-
-        p = store.projects[int(idx)]
-        if not p:
-            continue
-
-        overlap = store.weighted_overlap(qtext, p.text)
-        fused = store.combined_similarity(float(emb_sim), overlap)
-
-        candidates.append((fused, float(emb_sim), float(overlap), p))
+    sims = np.asarray(sims, dtype="float64")
+    idxs = np.asarray(idxs, dtype=np.int64)
+    valid = (idxs >= 0) & ~np.isnan(sims)
+    sims, idxs = sims[valid], idxs[valid]
 
-    candidates.sort(key=lambda x: x[0], reverse=True)
+    overlaps = corpus.weighted_overlap_rows(qtext, idxs)
+    fused_all = store.combined_similarity_many(sims, overlaps)
+    order = np.argsort(-fused_all, kind="stable")
 
     neighbors = []
-    for fused, emb_sim, overlap, p in candidates:
-        if not is_good_neighbor(p):
-            continue
+    rows = []
+    for i in order.tolist():
+        p = corpus.projects[int(idxs[i])]
+        fused, emb_sim, overlap = float(fused_all[i]), float(sims[i]), float(overlaps[i])
 
         neighbors.append(Neighbor(
             id=p.id,
@@ -112,16 +89,17 @@ def build_neighbors(sims, idxs, k_keep: int, qtext: str):
             winner=p.winner,
             award_texts=p.award_texts,
             creators=p.creators,
+            duplicates=p.duplicates,
             similarity=float(fused),
             semantic_similarity=float(emb_sim),
             rare_overlap=float(overlap),
         ))
-        texts.append(p.text)
+        rows.append(int(idxs[i]))
 
         if len(neighbors) >= k_keep:
             break
 
-    return neighbors, texts
+    return neighbors, rows
 
 
 @app.on_event("startup")
@@ -129,12 +107,36 @@ def _startup():
     global store
     store = ProjectStore(
         index_all_path=settings.index_all_path,
-        index_recent_path=settings.index_recent_path,
-        recent_row_ids_path=settings.recent_row_ids_path,
+        row_timestamps_path=settings.row_timestamps_path,
         meta_path=settings.meta_path,
         embed_model_name=settings.embed_model_name,
+        meta_bin_path=settings.meta_bin_path,
+        meta_offsets_path=settings.meta_offsets_path,
+        terms_dir=settings.terms_dir,
         local_model_only=False,
+        embed_cache_max_entries=settings.embed_cache_max_entries,
+        embed_cache_max_bytes=int(settings.embed_cache_max_mb * 1024 * 1024),
+        embed_batching=settings.embed_batching,
+        embed_batch_window_ms=settings.embed_batch_window_ms,
+        embed_batch_max_size=settings.embed_batch_max_size,
+        recent_months=settings.recent_months,
+        nprobe=settings.index_nprobe,
+        ef_search=settings.index_ef_search,
+        index_mmap=settings.index_mmap,
+        embeddings_path=settings.embeddings_path,
+        embed_backend=settings.embed_backend,
+        embed_onnx_path=settings.embed_onnx_path,
+        manifest_path=settings.manifest_path,
+        row_quality_path=settings.row_quality_path,
     )
+    if settings.reload_watch_s > 0:
+        store.watch(settings.reload_watch_s)
+
+
+@app.on_event("shutdown")
+def _shutdown():
+    if store is not None:
+        store.close()
 
 
 @app.get("/health")
@@ -142,31 +144,114 @@ def health():
     return {"ok": True}
 
 
+@app.post("/admin/reload")
+def admin_reload(x_admin_token: Optional[str] = Header(default=None)):
+    """Load the current build files as a new generation and swap it in without downtime.
+
+    Disabled unless admin_token is set: behind a reverse proxy every caller looks local.
+    """
+    assert store is not None
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(x_admin_token or "", settings.admin_token):
+        raise HTTPException(status_code=403, detail="Bad admin token")
+    try:
+        return store.reload()
+    except ReloadInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except (RuntimeError, OSError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=f"Reload rejected, still serving generation "
+                                                    f"{store.generation}: {e}")
+
+
 @app.get("/stats")
 def stats():
     assert store is not None
+    corpus = store.corpus
     return {
-        "total_projects": store.total_projects,
-        "recent_projects": store.recent_projects,
+        "total_projects": corpus.total_projects,
+        "recent_projects": corpus.recent_projects,
+        "neighbor_candidates": corpus.good_count,
+        "search_rounds": dict(sorted(search_rounds.items())),
+        "index": corpus.index_description,
+        "generation": corpus.generation,
+        "last_reload": store.last_reload,
+        "last_reload_error": store.last_reload_error,
+        "embed_backend": store.embedder.name,
+        "embed_cache": store.embed_cache.stats(),
+        "result_cache": result_cache.stats(),
+        "embed_batcher": store.batcher.stats() if store.batcher is not None else None,
     }
 
 
-def _compute_check(req: CheckRequest) -> CheckResponse:
-    assert store is not None
-
+def _k_search(req: CheckRequest) -> int:
+    # Junk rows are already excluded inside the search (Corpus.good); the margin only lets
+    # the fused rerank in build_neighbors promote rows that share rarer terms.
     k = req.k or settings.top_k_default
-    k_search = max(120, int(k) * 30)  # widen more; filters remove junk
+    return max(40, int(k) * 8)
+
+
+def _search_adaptive(corpus: Corpus, qvecs: np.ndarray, reqs: Sequence[CheckRequest], months: Optional[int]):
+    """corpus.search_batch per query row, widened geometrically only for rows that come back short.
+
+    Row i starts at _k_search(reqs[i]) candidates. While its all-time or recent list holds
+    fewer than k rows (of those the corpus has), it is searched again with
+    settings.search_widen_factor times the depth and IVF probes / HNSW beam, for at most
+    settings.search_max_rounds rounds. A row's results depend only on its own request, so a
+    batch returns what each /check would. Returns one (sims_all, idxs_all, sims_recent,
+    idxs_recent) tuple per row.
+    """
+    factor = max(2, settings.search_widen_factor)
+    want_recent = corpus.recent_window(months).count
+    depths = [_k_search(r) for r in reqs]
+    out: list = [None] * len(reqs)
+    todo, widen, rounds = list(range(len(reqs))), 1, 1
+    while todo:
+        depth = max(depths[i] for i in todo)
+        sims_all, idxs_all, sims_recent, idxs_recent = corpus.search_batch(
+            np.ascontiguousarray(qvecs[todo]), depth, months, widen=widen,
+        )
+        retry = []
+        for row, i in enumerate(todo):
+            # Slice back to this row's depth so results match a single /check call.
+            d = depths[i]
+            out[i] = (sims_all[row, :d], idxs_all[row, :d], sims_recent[row, :d], idxs_recent[row, :d])
+            k = reqs[i].k or settings.top_k_default
+            short = (
+                np.count_nonzero(out[i][1] >= 0) < min(k, corpus.good_count)
+                or np.count_nonzero(out[i][3] >= 0) < min(k, want_recent)
+            )
+            if short and rounds < settings.search_max_rounds and not corpus.search_exhausted(d, widen):
+                depths[i] = d * factor
+                retry.append(i)
+            else:
+                with _search_rounds_lock:
+                    search_rounds[rounds] += 1
+        todo, widen, rounds = retry, widen * factor, rounds + 1
+    return out
+
+
+def _compute_check(req: CheckRequest, corpus: Corpus) -> CheckResponse:
+    assert store is not None
 
     qvec = store.embed_query(req.title, req.description, req.tags)
 
-    sims_all, idxs_all = store.search_all(qvec, k_search)
-    sims_recent, idxs_recent = store.search_recent(qvec, k_search)
+    (hits,) = _search_adaptive(corpus, qvec, [req], req.recent_months)
+
+    return _finish_check(req, corpus, *hits)
+
+
+def _finish_check(req: CheckRequest, corpus: Corpus, sims_all, idxs_all, sims_recent, idxs_recent) -> CheckResponse:
+    """Rerank, score and build suggestions from raw search results for one request."""
+    assert store is not None
+
+    k = req.k or settings.top_k_default
 
     qtext = store.query_text(req.title, req.description, req.tags)
-    specificity = store.query_specificity(qtext)
+    specificity = corpus.query_specificity(qtext)
 
-    neighbors_all, texts_all = build_neighbors(sims_all, idxs_all, k, qtext)
-    neighbors_recent, texts_recent = build_neighbors(sims_recent, idxs_recent, k, qtext)
+    neighbors_all, rows_all = build_neighbors(corpus, sims_all, idxs_all, k, qtext)
+    neighbors_recent, rows_recent = build_neighbors(corpus, sims_recent, idxs_recent, k, qtext)
 
     score_all = originality_score([n.similarity for n in neighbors_all], specificity=specificity)
     score_recent = originality_score([n.similarity for n in neighbors_recent], specificity=specificity)
@@ -178,7 +263,8 @@ def _compute_check(req: CheckRequest) -> CheckResponse:
 
     suggestions = make_suggestions(
         query_text=qtext,
-        neighbor_texts=[*texts_recent, *texts_all],
+        neighbor_rows=[*rows_recent, *rows_all],
+        corpus_terms=corpus.terms,
         score=score_recent,
     )
 
@@ -202,31 +288,118 @@ def _parse_tags(tags: Optional[str]) -> Optional[List[str]]:
     return parsed or None
 
 
+def _session_id(request: Request, response: Response) -> str:
+    """The caller's session id, issuing a new session cookie if it has none."""
+    session = request.cookies.get(SESSION_COOKIE)
+    if not session:
+        session = uuid.uuid4().hex
+        response.set_cookie(SESSION_COOKIE, session, httponly=True, samesite="lax")
+    return session
+
+
+def _check_key(req: CheckRequest, corpus: Corpus) -> tuple:
+    assert store is not None
+    k = int(req.k or settings.top_k_default)
+    months = int(req.recent_months or settings.recent_months)
+    return (store.canonical_query(req.title, req.description, req.tags), k, months, corpus.generation)
+
+
+def _cached_check(req: CheckRequest, session: str) -> CheckResponse:
+    assert store is not None
+    # One snapshot per request: a reload mid-request can't mix row ids and metadata.
+    corpus = store.corpus
+    key = _check_key(req, corpus)
+    resp = result_cache.get(key)
+    if resp is None:
+        resp = _compute_check(req, corpus)
+        result_cache.put(key, resp)
+    last_keys.put(session, key)
+    return resp
+
+
+def _resolve_response(
+    request: Request,
+    response: Response,
+    title: Optional[str],
+    description: str,
+    tags: Optional[str],
+    k: Optional[int],
+    recent_months: Optional[int],
+) -> CheckResponse | None:
+    if title:
+        return _cached_check(
+            CheckRequest(
+                title=title,
+                description=description,
+                tags=_parse_tags(tags),
+                k=k or settings.top_k_default,
+                recent_months=recent_months,
+            ),
+            _session_id(request, response),
+        )
+    # Callers without the cookie (e.g. scripts ignoring Set-Cookie) have no previous check.
+    session = request.cookies.get(SESSION_COOKIE)
+    key = last_keys.get(session) if session else None
+    return result_cache.get(key) if key is not None else None
+
+
 @app.post("/check", response_model=CheckResponse)
-def check(req: CheckRequest):
-    global last_response
-    last_response = _compute_check(req)
-    return last_response
+def check(req: CheckRequest, request: Request, response: Response):
+    return _cached_check(req, _session_id(request, response))
+
+
+@app.post("/check/batch", response_model=List[CheckResponse])
+def check_batch(reqs: List[CheckRequest]):
+    """Score many ideas at once: one encode call and one multi-row index search."""
+    assert store is not None
+    if len(reqs) > settings.check_batch_max_items:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.check_batch_max_items} ideas per batch",
+        )
+
+    corpus = store.corpus
+    keys = [_check_key(r, corpus) for r in reqs]
+    results: dict = {}
+    todo: dict = {}
+    for key, req in zip(keys, reqs):
+        if key in results or key in todo:
+            continue
+        cached = result_cache.get(key)
+        if cached is not None:
+            results[key] = cached
+        else:
+            todo[key] = req
+
+    # One encode + search pass per distinct recency window (usually just one).
+    by_window: dict = {}
+    for key, req in todo.items():
+        by_window.setdefault(key[2], []).append((key, req))
+
+    for months, pending in by_window.items():
+        qvecs = store.embed_queries([key[0] for key, _ in pending])
+        hits = _search_adaptive(corpus, qvecs, [req for _, req in pending], months)
+
+        for (key, req), row_hits in zip(pending, hits):
+            resp = _finish_check(req, corpus, *row_hits)
+            result_cache.put(key, resp)
+            results[key] = resp
+
+    return [results[key] for key in keys]
 
 
 @app.get("/score", response_model=ScoreResponse)
 def score(
+    request: Request,
+    response: Response,
     title: Optional[str] = None,
     description: str = "",
     tags: Optional[str] = None,
     k: Optional[int] = None,
+    recent_months: Optional[int] = Query(default=None, ge=1, le=600),
 ):
-    global last_response
-    if title:
-        last_response = _compute_check(
-            CheckRequest(
-                title=title,
-                description=description,
-                tags=_parse_tags(tags),
-                k=k or settings.top_k_default,
-            )
-        )
-    if last_response is None:
+    resp = _resolve_response(request, response, title, description, tags, k, recent_months)
+    if resp is None:
         return ScoreResponse(
             score_all=0,
             score_recent=0,
@@ -236,54 +409,42 @@ def score(
             trend_note="",
         )
     return ScoreResponse(
-        score_all=last_response.score_all,
-        score_recent=last_response.score_recent,
-        label_all=last_response.label_all,
-        label_recent=last_response.label_recent,
-        trend_label=last_response.trend_label,
-        trend_note=last_response.trend_note,
+        score_all=resp.score_all,
+        score_recent=resp.score_recent,
+        label_all=resp.label_all,
+        label_recent=resp.label_recent,
+        trend_label=resp.trend_label,
+        trend_note=resp.trend_note,
     )
 
 
 @app.get("/projects", response_model=List[Neighbor])
 def projects(
+    request: Request,
+    response: Response,
     title: Optional[str] = None,
     description: str = "",
     tags: Optional[str] = None,
     k: Optional[int] = None,
+    recent_months: Optional[int] = Query(default=None, ge=1, le=600),
 ):
-    global last_response
-    if title:
-        last_response = _compute_check(
-            CheckRequest(
-                title=title,
-                description=description,
-                tags=_parse_tags(tags),
-                k=k or settings.top_k_default,
-            )
-        )
-    if last_response is None:
+    resp = _resolve_response(request, response, title, description, tags, k, recent_months)
+    if resp is None:
         return []
-    return last_response.neighbors_recent or last_response.neighbors_all
+    return resp.neighbors_recent or resp.neighbors_all
 
 
 @app.get("/suggestions", response_model=List[str])
 def suggestions(
+    request: Request,
+    response: Response,
     title: Optional[str] = None,
     description: str = "",
     tags: Optional[str] = None,
     k: Optional[int] = None,
+    recent_months: Optional[int] = Query(default=None, ge=1, le=600),
 ):
-    global last_response
-    if title:
-        last_response = _compute_check(
-            CheckRequest(
-                title=title,
-                description=description,
-                tags=_parse_tags(tags),
-                k=k or settings.top_k_default,
-            )
-        )
-    if last_response is None:
+    resp = _resolve_response(request, response, title, description, tags, k, recent_months)
+    if resp is None:
         return []
-    return last_response.suggestions
\ No newline at end of file
+    return resp.suggestions
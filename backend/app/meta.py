@@ -0,0 +1,151 @@
+"""Project metadata aligned to index rows.
+
+Builders write one compact JSON record per row into a single binary file plus an int64
+offsets array. The API memory-maps both and only parses a row when it is actually used,
+so workers neither hold every README in their heap nor pay a full JSON load at startup.
+"""
+import json
+import mmap
+import os
+from array import array
+from dataclasses import dataclass, fields
+from typing import Iterable, Iterator, List, Optional
+
+import numpy as np
+
+
+@dataclass(slots=True)
+class Project:
+    id: str
+    title: str
+    tagline: Optional[str]
+    description: str
+    tags: List[str]
+    url: Optional[str]
+    created_at: Optional[str]
+
+    search_text: str
+    text: str
+
+    started_date: Optional[str] = None
+    built_with_tags: List[str] = None
+    hackathon_name: Optional[str] = None
+    repo_url: Optional[str] = None
+    demo_url: Optional[str] = None
+    winner: Optional[bool] = None
+    award_texts: List[str] = None
+    creators: List[dict] = None
+
+    source: str = "unknown"
+    pushed_at: Optional[str] = None
+    stars: Optional[int] = None
+    language: Optional[str] = None
+    submission_score: Optional[float] = None
+    type_label: Optional[str] = None
+    duplicates: Optional[int] = None  # near-duplicate rows folded into this one at build time
+
+
+PROJECT_FIELDS = frozenset(f.name for f in fields(Project))
+
+
+def _make_search_text(p: dict) -> str:
+    title = (p.get("title") or "").strip()
+    tagline = (p.get("tagline") or "").strip()
+    desc = (p.get("description") or "").strip()
+    tags = p.get("tags") or []
+    built_with = p.get("built_with_tags") or []
+    hackathon = (p.get("hackathon_name") or "").strip()
+    tag_str = " ".join([t for t in tags if isinstance(t, str)])
+    built_str = " ".join([t for t in built_with if isinstance(t, str)])
+
+    parts = []
+    if title:
+        parts.append(title)
+    if tagline:
+        parts.append(tagline)
+    if desc:
+        parts.append(desc)
+    if tag_str:
+        parts.append(tag_str)
+    if built_str:
+        parts.append(built_str)
+    if hackathon:
+        parts.append(hackathon)
+    return "\n".join(parts).strip()
+
+
+def normalize_row(p: dict) -> dict:
+    """Apply the search_text/text/tags fallbacks and keep only Project fields."""
+    p = {k: v for k, v in p.items() if k in PROJECT_FIELDS}
+    if not p.get("search_text"):
+        p["search_text"] = _make_search_text(p)
+    if not p.get("text"):
+        p["text"] = p["search_text"]
+    if not isinstance(p.get("tags"), list):
+        p["tags"] = []
+    return p
+
+
+def dump_row(row: dict) -> bytes:
+    """Compact UTF-8 JSON record for an already-normalized row."""
+    return json.dumps(row, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def write_meta(rows: Iterable[dict], bin_path, offsets_path) -> int:
+    """Write normalized rows as concatenated UTF-8 JSON plus n+1 byte offsets."""
+    offsets = array("q", [0])
+    with open(bin_path, "wb") as f:
+        for row in rows:
+            blob = dump_row(normalize_row(row))
+            f.write(blob)
+            offsets.append(offsets[-1] + len(blob))
+    np.save(offsets_path, np.frombuffer(offsets, dtype=np.int64))
+    return len(offsets) - 1
+
+
+class MetaTable:
+    """Sequence of Project rows backed by a memory-mapped file (or a legacy JSON list)."""
+
+    def __init__(self, buf=None, offsets: Optional[np.ndarray] = None, rows: Optional[List[dict]] = None):
+        self._buf = buf
+        self._offsets = offsets
+        self._rows = rows
+
+    @classmethod
+    def open(cls, bin_path: Optional[str], offsets_path: Optional[str], json_path: Optional[str] = None) -> "MetaTable":
+        if bin_path and offsets_path and os.path.exists(bin_path) and os.path.exists(offsets_path):
+            offsets = np.load(offsets_path, mmap_mode="r")
+            buf = b""
+            if os.path.getsize(bin_path) > 0:
+                with open(bin_path, "rb") as f:
+                    buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return cls(buf=buf, offsets=offsets)
+        if json_path and os.path.exists(json_path):
+            with open(json_path, "r", encoding="utf-8") as f:
+                return cls(rows=json.load(f))
+        raise FileNotFoundError(f"No project metadata at {bin_path} or {json_path}")
+
+    def __len__(self) -> int:
+        if self._rows is not None:
+            return len(self._rows)
+        return len(self._offsets) - 1
+
+    def row(self, i: int) -> dict:
+        """Raw (normalized) metadata dict for row i."""
+        if self._rows is not None:
+            return normalize_row(self._rows[i])
+        if i < 0:
+            i += len(self)
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return json.loads(self._buf[start:end])
+
+    def __getitem__(self, i: int) -> Project:
+        return Project(**self.row(int(i)))
+
+    def iter_rows(self) -> Iterator[dict]:
+        for i in range(len(self)):
+            yield self.row(i)
+
+    def __iter__(self) -> Iterator[Project]:
+        for i in range(len(self)):
+            yield self[i]
@@ -7,6 +7,7 @@ class CheckRequest(BaseModel):
     description: str = ""
     tags: Optional[List[str]] = None
     k: int = 5
+    recent_months: Optional[int] = Field(default=None, ge=1, le=600)
 
 
 class Neighbor(BaseModel):
@@ -24,6 +25,7 @@ class Neighbor(BaseModel):
     winner: Optional[bool] = None
     award_texts: Optional[List[str]] = None
     creators: Optional[List[dict]] = None
+    duplicates: Optional[int] = None
     similarity: float  # fused "same-idea" similarity
     semantic_similarity: Optional[float] = None
     rare_overlap: Optional[float] = None
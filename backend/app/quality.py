@@ -0,0 +1,52 @@
+"""Which corpus rows may be shown as neighbors.
+
+Templates, starter kits, link lists and rows whose title or description says nothing
+would otherwise crowd out real projects. The rules only read a row's metadata, so they are
+evaluated once per row into a boolean mask: the builders write it next to the index
+(row_quality.npy) and Corpus filters every FAISS search on it. Builds made with other
+rules (or none) get the mask recomputed from the metadata on load.
+"""
+from typing import Iterable
+
+import numpy as np
+
+RULES_VERSION = 1  # bump whenever is_good_neighbor changes; recorded in the build manifest
+
+_BAD_TYPE_LABELS = frozenset({"template", "list", "platform"})
+
+# hard filter: generic starter/boilerplate collections
+_BAD_TITLE_SUBSTRINGS = (
+    "starter", "boilerplate", "template", "blueprint", "misc", "resources",
+    "examples", "sample", "skeleton", "kickstart",
+)
+
+_GENERIC_TITLES = frozenset({
+    "hackathon", "hackathons", "hackathon project", "hackathon-project",
+    "project", "projects", "1st-hackathon",
+})
+
+
+def is_good_neighbor(p: dict) -> bool:
+    tl = (p.get("type_label") or "").lower()
+    if tl in _BAD_TYPE_LABELS:
+        return False
+
+    t = (p.get("title") or "").strip().lower()
+    d = (p.get("description") or "").strip().lower()
+
+    if any(x in t for x in _BAD_TITLE_SUBSTRINGS):
+        return False
+
+    if t in _GENERIC_TITLES:
+        return False
+
+    # descriptions that say nothing
+    if len(d) < 60 and ("hackathon" in d or "repository" in d or "project" in d):
+        return False
+
+    return True
+
+
+def quality_mask(rows: Iterable[dict]) -> np.ndarray:
+    """is_good_neighbor for each row, as a bool array."""
+    return np.fromiter((is_good_neighbor(p) for p in rows), dtype=bool)
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import BaseModel
 
 
@@ -5,20 +7,67 @@ class Settings(BaseModel):
     # Base dir
     data_dir: str = "data"
 
-    # Dual FAISS indexes
+    # FAISS index over every project; recency is a query-time filter on row timestamps
     index_all_path: str = "data/index_all.faiss"
-    index_recent_path: str = "data/index_recent.faiss"
-    recent_row_ids_path: str = "data/recent_row_ids.json"
+    row_timestamps_path: str = "data/row_timestamps.npy"
+
+    # Which rows may be shown as neighbors (app/quality.py); every search filters on it
+    row_quality_path: str = "data/row_quality.npy"
+
+    # ANN search overrides (None = value stored in the index file; see app/ann.py)
+    index_nprobe: Optional[int] = None
+    index_ef_search: Optional[int] = None
 
-    # Metadata aligned to index rows
+    # Memory-map the index (and embeddings, used to re-score PQ candidates) so uvicorn
+    # workers share one copy through the page cache and cold start does no full read.
+    index_mmap: bool = False
+    embeddings_path: str = "data/embeddings.npy"
+
+    # Metadata aligned to index rows: memory-mapped records + offsets (JSON is the legacy fallback)
+    meta_bin_path: str = "data/projects_meta.bin"
+    meta_offsets_path: str = "data/projects_meta.offsets.npy"
     meta_path: str = "data/projects_meta.json"
 
-    # Embedding model
+    # Precomputed corpus term counts / IDF (see app/terms.py)
+    terms_dir: str = "data/projects_terms"
+
+    # Written last by the builders; lists every output file's size so a reload can
+    # reject a half-written build. reload_watch_s > 0 polls it and hot-reloads new builds
+    # (POST /admin/reload does the same on demand, with an X-Admin-Token header matching
+    # admin_token; it is disabled while admin_token is unset).
+    manifest_path: str = "data/build_manifest.json"
+    reload_watch_s: float = 0.0
+    admin_token: Optional[str] = None
+
+    # Embedding model; embed_backend "onnx" runs the export from scripts/export_onnx.py
+    # (model.onnx, or model.int8.onnx for the quantized one) instead of PyTorch; "hash" is
+    # the model-free stub used by scripts/bench_check.py.
     embed_model_name: str = "sentence-transformers/all-MiniLM-L6-v2"
+    embed_backend: str = "torch"
+    embed_onnx_path: str = "data/onnx/model.int8.onnx"
+
+    # Query embedding cache (LRU over canonical query text)
+    embed_cache_max_entries: int = 4096
+    embed_cache_max_mb: float = 16.0
+
+    # Micro-batching of concurrent query encodes
+    embed_batching: bool = True
+    embed_batch_window_ms: float = 3.0
+    embed_batch_max_size: int = 32
+
+    # CheckResponse cache keyed by (canonical query, k, index generation)
+    result_cache_max_entries: int = 1024
+    result_cache_ttl_s: float = 600.0
+
+    # /check searches are retried this many times deeper (and with more IVF probes / HNSW
+    # beam) while fewer than k neighbors come back; /stats counts the rounds used
+    search_widen_factor: int = 4
+    search_max_rounds: int = 4
 
     # API defaults
     top_k_default: int = 5
-    recent_months: int = 24
+    check_batch_max_items: int = 1000
+    recent_months: int = 24  # default window; CheckRequest.recent_months overrides per call
 
 
 settings = Settings()
\ No newline at end of file
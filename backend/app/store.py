@@ -1,66 +1,26 @@
+import calendar
 import json
 import math
+import os
 import re
-from collections import Counter
+import threading
+import time
 from dataclasses import dataclass
-from typing import List, Optional, Tuple
+from datetime import datetime, timezone
+from typing import List, Optional, Sequence, Tuple
 
 import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
 
+from . import ann
+from .batching import EmbeddingBatcher
+from .cache import LRUCache
+from .embedders import make_embedder
+from .meta import MetaTable, Project  # noqa: F401  (Project re-exported for callers)
+from .quality import RULES_VERSION, quality_mask
+from .terms import TermIndex, _tokenize
+from .timestamps import row_timestamp
 
-@dataclass
-class Project:
-    id: str
-    title: str
-    tagline: Optional[str]
-    description: str
-    tags: List[str]
-    url: Optional[str]
-    created_at: Optional[str]
-
-    search_text: str
-    text: str
-
-    started_date: Optional[str] = None
-    built_with_tags: List[str] = None
-    hackathon_name: Optional[str] = None
-    repo_url: Optional[str] = None
-    demo_url: Optional[str] = None
-    winner: Optional[bool] = None
-    award_texts: List[str] = None
-    creators: List[dict] = None
-
-    source: str = "unknown"
-    pushed_at: Optional[str] = None
-    stars: Optional[int] = None
-    language: Optional[str] = None
-    submission_score: Optional[float] = None
-    type_label: Optional[str] = None
-
-
-# Stopwords tuned to remove schema/meta/UI words and generic hackathon boilerplate.
-_STOP = {
-    # function words
-    "the","a","an","and","or","to","of","in","for","with","on","at","by","from","as",
-    "is","are","was","were","be","been","it","this","that","these","those","your","our",
-
-    # question words (these should NEVER drive "constraints")
-    "how","why","what","when","where","who","whom","which",
-
-    # generic software boilerplate
-    "app","project","projects","repo","repository","code","using","use","uses","used",
-    "build","built","create","creating","platform","website","web","api","service",
-    "system","powered","tool","tools",
-
-    # hackathon boilerplate
-    "hackathon","demo","prototype",
-
-    # form/schema leakage (your exact bug)
-    "title","description","tags","tag","idea","ideas","originality","original",
-    "check","checker","done","score","scoring","recent","alltime","all-time","all",
-}
 
 # Lines we want to strip if the frontend accidentally includes UI labels or button text
 _UI_LINE_RE = re.compile(
@@ -82,38 +42,6 @@ def _sanitize_user_text(s: str) -> str:
     return out
 
 
-def _tokenize(s: str) -> List[str]:
-    s = (s or "").lower()
-    toks = re.findall(r"[a-z0-9]{3,}", s)
-    return [t for t in toks if t not in _STOP]
-
-
-def _make_search_text(p: dict) -> str:
-    title = (p.get("title") or "").strip()
-    tagline = (p.get("tagline") or "").strip()
-    desc = (p.get("description") or "").strip()
-    tags = p.get("tags") or []
-    built_with = p.get("built_with_tags") or []
-    hackathon = (p.get("hackathon_name") or "").strip()
-    tag_str = " ".join([t for t in tags if isinstance(t, str)])
-    built_str = " ".join([t for t in built_with if isinstance(t, str)])
-
-    parts = []
-    if title:
-        parts.append(title)
-    if tagline:
-        parts.append(tagline)
-    if desc:
-        parts.append(desc)
-    if tag_str:
-        parts.append(tag_str)
-    if built_str:
-        parts.append(built_str)
-    if hackathon:
-        parts.append(hackathon)
-    return "\n".join(parts).strip()
-
-
 def _safe_unit(vecs: np.ndarray) -> np.ndarray:
     vecs = np.nan_to_num(vecs, nan=0.0, posinf=0.0, neginf=0.0).astype("float32")
     norms = np.linalg.norm(vecs, axis=1, keepdims=True)
@@ -121,63 +49,418 @@ def _safe_unit(vecs: np.ndarray) -> np.ndarray:
     return vecs / norms
 
 
-class ProjectStore:
+def _months_ago(months: int, now: Optional[datetime] = None) -> datetime:
+    """Midnight UTC `months` calendar months before today; day clamped to month end."""
+    now = now or datetime.now(timezone.utc)
+    y, m = now.year, now.month - months
+    while m <= 0:
+        m += 12
+        y -= 1
+    d = min(now.day, calendar.monthrange(y, m)[1])
+    return datetime(y, m, d, tzinfo=timezone.utc)
+
+
+class ReloadInProgress(RuntimeError):
+    pass
+
+
+def _check_manifest(path: Optional[str], model_name: Optional[str]) -> Optional[dict]:
+    """Check the files a build manifest lists against disk; None for builds without one."""
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if model_name and manifest.get("model") and manifest["model"] != model_name:
+        raise RuntimeError(f"index was built with {manifest['model']!r}, not {model_name!r} (rebuild indices)")
+    base = os.path.dirname(path)
+    for rel, size in (manifest.get("files") or {}).items():
+        full = os.path.join(base, rel)
+        if not os.path.exists(full) or os.path.getsize(full) != size:
+            raise RuntimeError(f"{full} does not match {path} (build still running or incomplete)")
+    return manifest
+
+
+def _bitmap_selector(mask: np.ndarray) -> Tuple[np.ndarray, "faiss.IDSelectorBitmap"]:
+    """FAISS selector admitting the rows set in mask, plus the packed bits it points into."""
+    bits = np.packbits(mask, bitorder="little")
+    return bits, faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(bits))
+
+
+@dataclass
+class _RecentWindow:
+    """Row mask for one recency cutoff (neighbor-quality rows only) plus its FAISS selector."""
+    cutoff: datetime
+    mask: np.ndarray
+    bits: np.ndarray  # packed bitmap referenced by selector; must outlive it
+    selector: "faiss.IDSelectorBitmap"
+    count: int
+
+
+class Corpus:
+    """One immutable generation of everything a build writes: index, metadata, row
+    timestamps, term stats (and embeddings for re-scoring a compressed index).
+
+    ProjectStore swaps whole Corpus objects on reload; a request takes one snapshot
+    (store.corpus) up front so its row ids, metadata and overlap stats always agree.
+    """
+
     def __init__(
         self,
         index_all_path: str,
-        index_recent_path: str,
-        recent_row_ids_path: str,
+        row_timestamps_path: str,
         meta_path: str,
-        embed_model_name: str,
-        local_model_only: bool = False,
+        meta_bin_path: Optional[str] = None,
+        meta_offsets_path: Optional[str] = None,
+        terms_dir: Optional[str] = None,
+        manifest_path: Optional[str] = None,
+        row_quality_path: Optional[str] = None,
+        embed_model_name: Optional[str] = None,
+        embed_dim: Optional[int] = None,
+        recent_months: int = 24,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        index_mmap: bool = False,
+        embeddings_path: Optional[str] = None,
+        generation: int = 0,
     ):
-        self.index_all = faiss.read_index(index_all_path)
-        self.index_recent = faiss.read_index(index_recent_path)
-
-        with open(meta_path, "r", encoding="utf-8") as f:
-            raw = json.load(f)
+        # A build rewrites every file; refuse a set that doesn't match its manifest (a build
+        # still running, or one that died half way) rather than pairing new rows with old metadata.
+        self.manifest = _check_manifest(manifest_path, embed_model_name)
+
+        # Any index kind from app.ann (flat, HNSW, IVF, IVF-PQ); None keeps the built-in defaults.
+        # With index_mmap the vectors live in the shared page cache instead of each worker's heap.
+        self.index_all = ann.read_index(index_all_path, mmap=index_mmap)
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        if embed_dim is not None and self.index_all.d != embed_dim:
+            raise RuntimeError(
+                f"index dimension {self.index_all.d} does not match the embedding model ({embed_dim})"
+            )
+
+        # Full-precision vectors, only needed to re-score candidates from a compressed index.
+        self.embeddings: Optional[np.ndarray] = None
+        if ann.is_lossy(self.index_all) and embeddings_path and os.path.exists(embeddings_path):
+            emb = np.load(embeddings_path, mmap_mode="r" if index_mmap else None)
+            if emb.shape[0] == self.index_all.ntotal:
+                self.embeddings = emb
+
+        # Memory-mapped rows; a Project is only materialized when a row is actually used.
+        # meta_path (a JSON list) is the fallback for builds that predate the binary format.
+        self.projects = MetaTable.open(meta_bin_path, meta_offsets_path, meta_path)
+
+        # Part of every result-cache key; bumped by each reload.
+        self.generation = generation
+
+        self.total_projects = len(self.projects)
+        self.recent_months = recent_months
 
-        with open(recent_row_ids_path, "r", encoding="utf-8") as f:
-            self.recent_row_ids = json.load(f)
+        if self.index_all.ntotal != len(self.projects):
+            raise RuntimeError("index_all size mismatch with metadata (rebuild indices)")
 
-        self.total_projects = len(raw)
-        self.recent_projects = len(self.recent_row_ids)
-        self.embed_model_name = embed_model_name
+        # Per-row epoch seconds (-1 = undated). Recency is a query-time filter over index_all,
+        # so the window can vary per request and never goes stale between builds.
+        if os.path.exists(row_timestamps_path):
+            self.row_ts = np.load(row_timestamps_path, mmap_mode="r")
+        else:
+            self.row_ts = np.array([row_timestamp(p) for p in self.projects.iter_rows()], dtype=np.int64)
+        if len(self.row_ts) != len(self.projects):
+            raise RuntimeError("row timestamps size mismatch with metadata (rebuild indices)")
+
+        # Rows that may be shown as neighbors (app/quality.py). Every search filters on it, so
+        # junk rows never take up result slots. Taken from the build when it used these rules.
+        self.good = None
+        if (
+            row_quality_path
+            and os.path.exists(row_quality_path)
+            and (self.manifest or {}).get("quality_rules") == RULES_VERSION
+        ):
+            self.good = np.load(row_quality_path, mmap_mode="r")
+        if self.good is None or len(self.good) != len(self.projects):
+            self.good = quality_mask(self.projects.iter_rows())
+        self.good_count = int(np.count_nonzero(self.good))
+        self._good_bits, self._good_selector = None, None
+        if self.good_count < len(self.good):
+            self._good_bits, self._good_selector = _bitmap_selector(np.asarray(self.good, dtype=bool))
+
+        self._windows: dict[tuple[int, datetime], _RecentWindow] = {}
+        self._windows_lock = threading.Lock()
+
+        # Corpus term counts + IDF: written by the builders, else tokenized once here.
+        if terms_dir and os.path.exists(os.path.join(terms_dir, "info.json")):
+            self.terms = TermIndex.load(terms_dir)
+        else:
+            self.terms = TermIndex.build((p.search_text, p.text) for p in self.projects)
+        if self.terms.doc_terms.shape[0] != len(self.projects):
+            raise RuntimeError("term index size mismatch with metadata (rebuild indices)")
+
+    def recent_window(self, months: Optional[int] = None) -> _RecentWindow:
+        """Mask/selector for rows dated on or after `months` ago; cached per cutoff day."""
+        months = int(months or self.recent_months)
+        cutoff = _months_ago(months)
+        key = (months, cutoff)
+        win = self._windows.get(key)
+        if win is not None:
+            return win
+        with self._windows_lock:
+            win = self._windows.get(key)
+            if win is None:
+                mask = (self.row_ts >= int(cutoff.timestamp())) & self.good
+                bits, selector = _bitmap_selector(mask)
+                win = _RecentWindow(cutoff=cutoff, mask=mask, bits=bits, selector=selector, count=int(mask.sum()))
+                # Only today's cutoffs are reachable; drop the stale ones.
+                self._windows = {k: w for k, w in self._windows.items() if k[1] == cutoff}
+                self._windows[key] = win
+        return win
+
+    def _search_params(self, sel: Optional["faiss.IDSelector"] = None, widen: int = 1) -> "faiss.SearchParameters":
+        return ann.search_params(self.index_all, sel=sel, nprobe=self.nprobe, ef_search=self.ef_search, widen=widen)
+
+    def search_exhausted(self, k: int, widen: int = 1) -> bool:
+        """True when search_batch(k, widen=widen) already covers every row a wider one could return."""
+        return k >= self.good_count and ann.fully_probed(self.index_all, self.nprobe, widen)
+
+    def _rescore(self, qvecs: np.ndarray, sims: np.ndarray, idxs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Replace approximate (PQ) similarities with exact ones from the embeddings and re-sort."""
+        if self.embeddings is None:
+            return sims, idxs
+        valid = idxs >= 0
+        rows = self.embeddings[np.where(valid, idxs, 0).ravel()].reshape(*idxs.shape, -1)
+        exact = np.einsum("nkd,nd->nk", rows.astype("float32", copy=False), qvecs)
+        exact = np.where(valid, exact, np.finfo("float32").min).astype("float32")
+        order = np.argsort(-exact, axis=1, kind="stable")
+        return np.take_along_axis(exact, order, axis=1), np.take_along_axis(idxs, order, axis=1)
+
+    @property
+    def index_description(self) -> str:
+        return ann.describe_index(self.index_all)
+
+    @property
+    def recent_projects(self) -> int:
+        return int(np.count_nonzero(self.row_ts >= int(self.recent_window().cutoff.timestamp())))
+
+    def search_batch(
+        self,
+        qvecs: np.ndarray,
+        k: int,
+        recent_months: Optional[int] = None,
+        widen: int = 1,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """All-time and recent neighbors for each query row, among the neighbor-quality rows.
+
+        Returns (sims_all, idxs_all, sims_recent, idxs_recent), each (n, k), ids -1 padded.
+        One all-time pass is searched deep enough that the recent rows inside it usually
+        fill the recent list too; rows that come up short get a selector-filtered search.
+        widen scales the approximate indexes' search effort (see ann.search_params).
+        """
+        win = self.recent_window(recent_months)
+        n_rows = self.good_count
+        k = max(1, min(int(k), n_rows)) if n_rows else 1
+
+        frac = win.count / n_rows if n_rows else 0.0
+        depth = min(n_rows, int(math.ceil(k / max(frac, 0.125)))) if n_rows else k
+        params = self._search_params(self._good_selector, widen)
+        sims, idxs = self.index_all.search(qvecs, max(k, depth), params=params)
+        sims, idxs = self._rescore(qvecs, np.nan_to_num(sims, nan=-1.0, posinf=-1.0, neginf=-1.0), idxs)
+
+        n = len(qvecs)
+        sims_recent = np.full((n, k), -1.0, dtype="float32")
+        idxs_recent = np.full((n, k), -1, dtype=np.int64)
+        exhausted = depth >= n_rows  # the pass already covered every row
+        valid = idxs >= 0
+        is_recent = valid & win.mask[np.where(valid, idxs, 0)]
+        short = []
+        for row in range(n):
+            pos = np.flatnonzero(is_recent[row])[:k]
+            if len(pos) >= k or exhausted:
+                sims_recent[row, :len(pos)] = sims[row, pos]
+                idxs_recent[row, :len(pos)] = idxs[row, pos]
+            else:
+                short.append(row)
+
+        if short and win.count:
+            params = self._search_params(win.selector, widen)
+            s2, i2 = self.index_all.search(np.ascontiguousarray(qvecs[short]), k, params=params)
+            s2, i2 = self._rescore(qvecs[short], np.nan_to_num(s2, nan=-1.0, posinf=-1.0, neginf=-1.0), i2)
+            sims_recent[short] = s2
+            idxs_recent[short] = i2
+
+        return sims[:, :k], idxs[:, :k], sims_recent, idxs_recent
 
-        allowed = set(Project.__dataclass_fields__.keys())
+    def query_specificity(self, qtext: str) -> float:
+        terms = set(_tokenize(qtext))
+        if not terms:
+            return 0.0
+        vals = [self.terms.idf_of(t) for t in terms]
+        return float(sum(vals) / len(vals))
 
-        normalized = []
-        for p in raw:
-            p = dict(p)
-            if not p.get("search_text"):
-                p["search_text"] = _make_search_text(p)
-            if not p.get("text"):
-                p["text"] = p["search_text"]
-            if not isinstance(p.get("tags"), list):
-                p["tags"] = []
-            normalized.append(p)
+    def weighted_overlap(self, qtext: str, doc_text: str) -> float:
+        q_terms = set(_tokenize(qtext))
+        if not q_terms:
+            return 0.0
+        d_terms = set(_tokenize(doc_text))
+        inter = q_terms & d_terms
+        if not inter:
+            return 0.0
+        num = sum(self.terms.idf_of(t) for t in inter)
+        den = sum(self.terms.idf_of(t) for t in q_terms)
+        return float(num / den) if den > 0 else 0.0
 
-        self.projects: List[Project] = [
-            Project(**{k: v for k, v in p.items() if k in allowed})
-            for p in normalized
-        ]
+    def weighted_overlap_rows(self, qtext: str, rows: Sequence[int]) -> np.ndarray:
+        """Vectorized weighted_overlap of qtext against the stored text of each row."""
+        rows = np.asarray(rows, dtype=np.int64)
+        out = np.zeros(len(rows), dtype="float64")
+        q_terms = set(_tokenize(qtext))
+        if not q_terms or len(rows) == 0:
+            return out
+        den = sum(self.terms.idf_of(t) for t in q_terms)
+        vocab = self.terms.vocab
+        term_ids = np.array(sorted(vocab[t] for t in q_terms if t in vocab), dtype=np.int64)
+        if den <= 0 or term_ids.size == 0:
+            return out
+        hits = (self.terms.doc_terms[rows][:, term_ids] > 0).astype("float64")
+        num = hits @ self.terms.idf[term_ids]
+        return np.asarray(num, dtype="float64").ravel() / den
 
-        if self.index_all.ntotal != len(self.projects):
-            raise RuntimeError("index_all size mismatch with metadata (rebuild indices)")
 
-        # Corpus-wide DF/IDF so overlap scoring emphasizes rare shared constraints.
-        self._df = Counter()
-        for p in self.projects:
-            self._df.update(set(_tokenize(p.search_text)))
-        n_docs = max(1, len(self.projects))
-        self._idf = {t: (math.log((n_docs + 1) / (df + 1)) + 1.0) for t, df in self._df.items()}
-        self._n_docs = n_docs
+class ProjectStore:
+    def __init__(
+        self,
+        index_all_path: str,
+        row_timestamps_path: str,
+        meta_path: str,
+        embed_model_name: str,
+        meta_bin_path: Optional[str] = None,
+        meta_offsets_path: Optional[str] = None,
+        terms_dir: Optional[str] = None,
+        local_model_only: bool = False,
+        embed_cache_max_entries: int = 4096,
+        embed_cache_max_bytes: Optional[int] = None,
+        embed_batching: bool = True,
+        embed_batch_window_ms: float = 3.0,
+        embed_batch_max_size: int = 32,
+        recent_months: int = 24,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        index_mmap: bool = False,
+        embeddings_path: Optional[str] = None,
+        embed_backend: str = "torch",
+        embed_onnx_path: Optional[str] = None,
+        manifest_path: Optional[str] = None,
+        row_quality_path: Optional[str] = None,
+        embedder=None,
+    ):
+        self.embed_model_name = embed_model_name
+        self.recent_months = recent_months
 
-        self.model = SentenceTransformer(
+        # "torch" (SentenceTransformer) or "onnx" (ONNX Runtime export, see app/embedders.py);
+        # callers may pass any object with name, dim and encode(texts) instead.
+        self.embedder = embedder or make_embedder(
+            embed_backend,
             embed_model_name,
+            onnx_path=embed_onnx_path or "",
             local_files_only=local_model_only,
         )
 
+        # Everything reload() re-reads; the model, caches and batcher outlive generations.
+        self._corpus_args = dict(
+            index_all_path=index_all_path,
+            row_timestamps_path=row_timestamps_path,
+            meta_path=meta_path,
+            meta_bin_path=meta_bin_path,
+            meta_offsets_path=meta_offsets_path,
+            terms_dir=terms_dir,
+            manifest_path=manifest_path,
+            row_quality_path=row_quality_path,
+            embed_model_name=embed_model_name,
+            embed_dim=self.embedder.dim,
+            recent_months=recent_months,
+            nprobe=nprobe,
+            ef_search=ef_search,
+            index_mmap=index_mmap,
+            embeddings_path=embeddings_path,
+        )
+        self.corpus = Corpus(**self._corpus_args)
+        self._reload_lock = threading.Lock()
+        self._watch_stop = threading.Event()
+        self.last_reload: Optional[dict] = None
+        self.last_reload_error: Optional[str] = None
+
+        # Unit query vectors keyed on the canonical query; identical resubmits skip the encoder.
+        self.embed_cache = LRUCache(embed_cache_max_entries, embed_cache_max_bytes)
+
+        # Concurrent cache misses share one forward pass instead of fighting over torch threads.
+        self.batcher: Optional[EmbeddingBatcher] = None
+        if embed_batching:
+            self.batcher = EmbeddingBatcher(
+                self.encode_texts,
+                window_ms=embed_batch_window_ms,
+                max_batch=embed_batch_max_size,
+            )
+
+    @property
+    def generation(self) -> int:
+        return self.corpus.generation
+
+    def reload(self) -> dict:
+        """Load the files on disk as a new generation, validate it and swap it in.
+
+        The current corpus keeps serving until the swap (a plain reference assignment), and
+        requests that already took a snapshot finish on it. A failed load leaves it in
+        place and raises. Raises ReloadInProgress if another reload is running.
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            raise ReloadInProgress("a reload is already running")
+        try:
+            started = time.perf_counter()
+            old = self.corpus
+            try:
+                new = Corpus(**self._corpus_args, generation=old.generation + 1)
+            except Exception as e:
+                self.last_reload_error = f"{type(e).__name__}: {e}"
+                raise
+            self.corpus = new
+            self.last_reload_error = None
+            self.last_reload = {
+                "generation": new.generation,
+                "previous_generation": old.generation,
+                "total_projects": new.total_projects,
+                "index": new.index_description,
+                "load_s": round(time.perf_counter() - started, 3),
+                "at": datetime.now(timezone.utc).isoformat(),
+            }
+            return self.last_reload
+        finally:
+            self._reload_lock.release()
+
+    def watch(self, interval_s: float) -> None:
+        """Poll the build manifest (or the index file) and reload when a new build lands.
+
+        Builders write the manifest last, so its change marks a complete build. A failed
+        load is recorded in last_reload_error and retried on the next change.
+        """
+        path = self._corpus_args["manifest_path"] or self._corpus_args["index_all_path"]
+
+        def signature():
+            try:
+                st = os.stat(path)
+            except OSError:
+                return None
+            return st.st_mtime_ns, st.st_size
+
+        def run():
+            seen = signature()
+            while not self._watch_stop.wait(interval_s):
+                sig = signature()
+                if sig is None or sig == seen:
+                    continue
+                seen = sig
+                try:
+                    self.reload()
+                except Exception:
+                    pass  # kept in last_reload_error; the current generation keeps serving
+
+        threading.Thread(target=run, name="index-watch", daemon=True).start()
+
     def query_text(self, title: str, description: str, tags: Optional[List[str]] = None) -> str:
         """Clean query text WITHOUT schema labels or UI button text."""
         tags = tags or []
@@ -190,53 +473,49 @@ class ProjectStore:
         if d:
             parts.append(d)
         if tags:
-            parts.append(" ".join([_sanitize_user_text(x) for x in tags if isinstance(x, str)]))
+            # Sorted so tag order does not change the embedding or the cache key.
+            clean_tags = {_sanitize_user_text(x) for x in tags if isinstance(x, str)}
+            parts.append(" ".join(sorted(t for t in clean_tags if t)))
         return "\n".join([p for p in parts if p]).strip()
 
-    def embed_query(self, title: str, description: str, tags: Optional[List[str]] = None) -> np.ndarray:
-        q = self.query_text(title, description, tags)
-        vec = self.model.encode([q]).astype("float32")
-        return _safe_unit(vec)
-
-    def search_all(self, qvec: np.ndarray, k: int) -> Tuple[List[float], List[int]]:
-        sims, idxs = self.index_all.search(qvec, k)
-        sims = np.nan_to_num(sims, nan=-1.0, posinf=-1.0, neginf=-1.0)
-        return sims[0].tolist(), idxs[0].tolist()
-
-    def search_recent(self, qvec: np.ndarray, k: int) -> Tuple[List[float], List[int]]:
-        sims, idxs = self.index_recent.search(qvec, k)
-        sims = np.nan_to_num(sims, nan=-1.0, posinf=-1.0, neginf=-1.0)
+    def canonical_query(self, title: str, description: str, tags: Optional[List[str]] = None) -> str:
+        """Whitespace-collapsed query_text; the key for anything cached per query."""
+        return " ".join(self.query_text(title, description, tags).split())
 
-        out_sims: List[float] = []
-        out_global: List[int] = []
+    def encode_texts(self, texts: List[str]) -> np.ndarray:
+        """Encode already-canonical query texts into unit vectors in one forward pass."""
+        batch_size = max(1, min(len(texts), 64))
+        vecs = self.embedder.encode(texts, batch_size=batch_size)
+        return _safe_unit(vecs)
 
-        for sim, local_idx in zip(sims[0].tolist(), idxs[0].tolist()):
-            if local_idx is None or local_idx < 0:
-                continue
-            global_idx = self.recent_row_ids[local_idx]
-            out_sims.append(float(sim))
-            out_global.append(int(global_idx))
+    def _remember(self, q: str, vec: np.ndarray) -> np.ndarray:
+        vec = np.array(vec, dtype="float32").reshape(1, -1)
+        vec.setflags(write=False)
+        self.embed_cache.put(q, vec)
+        return vec
 
-        return out_sims, out_global
-
-    def query_specificity(self, qtext: str) -> float:
-        terms = set(_tokenize(qtext))
-        if not terms:
-            return 0.0
-        vals = [self._idf.get(t, 1.0) for t in terms]
-        return float(sum(vals) / len(vals))
-
-    def weighted_overlap(self, qtext: str, doc_text: str) -> float:
-        q_terms = set(_tokenize(qtext))
-        if not q_terms:
-            return 0.0
-        d_terms = set(_tokenize(doc_text))
-        inter = q_terms & d_terms
-        if not inter:
-            return 0.0
-        num = sum(self._idf.get(t, 1.0) for t in inter)
-        den = sum(self._idf.get(t, 1.0) for t in q_terms)
-        return float(num / den) if den > 0 else 0.0
+    def embed_query(self, title: str, description: str, tags: Optional[List[str]] = None) -> np.ndarray:
+        q = self.canonical_query(title, description, tags)
+        cached = self.embed_cache.get(q)
+        if cached is not None:
+            return cached
+        vec = self.batcher.encode(q) if self.batcher is not None else self.encode_texts([q])
+        return self._remember(q, vec)
+
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """Unit vectors for many canonical queries; all cache misses share one encode call."""
+        found = [self.embed_cache.get(q) for q in queries]
+        missing = list(dict.fromkeys(q for q, v in zip(queries, found) if v is None))
+        fresh = {}
+        if missing:
+            for q, row in zip(missing, self.encode_texts(missing)):
+                fresh[q] = self._remember(q, row)
+        return np.vstack([v if v is not None else fresh[q] for q, v in zip(queries, found)])
+
+    def close(self) -> None:
+        self._watch_stop.set()
+        if self.batcher is not None:
+            self.batcher.close()
 
     def combined_similarity(self, emb_sim: float, overlap: float) -> float:
         """Fuse semantic similarity with constraint overlap.
@@ -261,4 +540,14 @@ class ProjectStore:
             w_emb = 0.60
 
         s = w_emb * max(0.0, emb_sim) + (1.0 - w_emb) * o
-        return float(max(0.0, min(1.0, s)))
\ No newline at end of file
+        return float(max(0.0, min(1.0, s)))
+
+    def combined_similarity_many(self, emb_sims: np.ndarray, overlaps: np.ndarray) -> np.ndarray:
+        """Array form of combined_similarity; same thresholds and weights."""
+        emb = np.maximum(0.0, np.asarray(emb_sims, dtype="float64"))
+        o = np.clip(np.asarray(overlaps, dtype="float64"), 0.0, 1.0) ** 0.7
+
+        capped = np.clip(0.22 * emb, 0.0, 0.22)
+        w_emb = np.where(o < 0.18, 0.30, np.where(o < 0.30, 0.45, 0.60))
+        fused = np.clip(w_emb * emb + (1.0 - w_emb) * o, 0.0, 1.0)
+        return np.where(o < 0.08, capped, fused)
@@ -1,7 +1,10 @@
-import math
 import re
-from collections import Counter
-from typing import List, Tuple
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from .terms import TermIndex
 
 
 STOP = {
@@ -34,49 +37,79 @@ def tokenize(s: str) -> List[str]:
     return [t for t in toks if t not in STOP]
 
 
-def top_terms(texts: List[str], k: int = 10) -> List[Tuple[str, int]]:
-    c = Counter()
-    for t in texts:
-        c.update(tokenize(t))
-    return c.most_common(k)
-
-
-def _idf_from_texts(texts: List[str]) -> dict[str, float]:
-    df = Counter()
-    n = 0
-    for t in texts:
-        terms = set(tokenize(t))
-        if not terms:
-            continue
-        n += 1
-        df.update(terms)
-
-    n = max(1, n)
-    return {term: (math.log((n + 1) / (dfv + 1)) + 1.0) for term, dfv in df.items()}
-
-
-def _best_term(query_text: str, neighbor_texts: List[str]) -> str:
-    tokens = tokenize(query_text)
+_SUGGEST_TERM = re.compile(r"[a-z][a-z0-9]{2,}")
+
+
+@dataclass
+class NeighborTerms:
+    """Term statistics of one request's neighbor rows, gathered once from the corpus TermIndex.
+
+    Terms are in first-seen order (row by row, each row's terms in text order), so ties
+    rank the way a Counter over the tokenized texts would.
+    """
+    terms: List[str]
+    counts: np.ndarray  # occurrences across the rows' full text
+    df: np.ndarray  # rows containing the term
+    n_rows: int  # rows with any such term
+
+    def local_idf(self) -> Dict[str, float]:
+        n = max(1, self.n_rows)
+        idf = np.log((n + 1) / (self.df + 1)) + 1.0
+        return dict(zip(self.terms, idf.tolist()))
+
+
+def neighbor_terms(index: TermIndex, rows: Sequence[int]) -> NeighborTerms:
+    """Read the stored term counts of rows (repeats count again) instead of re-tokenizing their text.
+
+    The TermIndex tokenizer keeps every [a-z0-9]{3,} run; only the terms this module's
+    tokenize() would produce (letter first, not in STOP) are kept.
+    """
+    m = index.doc_terms
+    spans = [(int(m.indptr[r]), int(m.indptr[r + 1])) for r in rows]
+    if not spans:
+        return NeighborTerms([], np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), 0)
+    ids = np.concatenate([m.indices[a:b] for a, b in spans])
+    cnt = np.concatenate([m.data[a:b] for a, b in spans])
+    row_of = np.repeat(np.arange(len(spans)), [b - a for a, b in spans])
+
+    uniq, first, inverse = np.unique(ids, return_index=True, return_inverse=True)
+    names = [index.names[j] for j in uniq.tolist()]
+    ok = np.array([t not in STOP and _SUGGEST_TERM.fullmatch(t) is not None for t in names], dtype=bool)
+    keep = np.flatnonzero(ok)
+    keep = keep[np.argsort(first[keep], kind="stable")]
+    slot = np.full(len(uniq), -1, dtype=np.int64)
+    slot[keep] = np.arange(len(keep))
+    pos = slot[inverse]
+    hit = pos >= 0
+    return NeighborTerms(
+        terms=[names[i] for i in keep.tolist()],
+        counts=np.bincount(pos[hit], weights=cnt[hit], minlength=len(keep)).astype(np.int64),
+        df=np.bincount(pos[hit], minlength=len(keep)),
+        n_rows=len(np.unique(row_of[hit])),
+    )
+
+
+def top_terms(stats: NeighborTerms, k: int = 10) -> List[Tuple[str, int]]:
+    order = np.argsort(-stats.counts, kind="stable")[:k]
+    return [(stats.terms[i], int(stats.counts[i])) for i in order.tolist()]
+
+
+def _best_term(tokens: List[str], idf: Dict[str, float], corpus: TermIndex) -> str:
     if not tokens:
         return "idea"
 
-    idf = _idf_from_texts(neighbor_texts) if neighbor_texts else {}
-    ranked = sorted(tokens, key=lambda t: (-(idf.get(t, 1.0)), -len(t), t))
+    # Rarest in the neighborhood first; the corpus IDF separates local ties.
+    ranked = sorted(tokens, key=lambda t: (-(idf.get(t, 1.0)), -corpus.idf_of(t), -len(t), t))
     return ranked[0] if ranked else tokens[0]
 
 
-def overlap_terms(query_text: str, neighbor_texts: List[str], k: int = 8) -> List[str]:
-    q = set(tokenize(query_text))
-    if not q or not neighbor_texts:
+def overlap_terms(tokens: List[str], stats: NeighborTerms, idf: Dict[str, float], corpus: TermIndex,
+                  k: int = 8) -> List[str]:
+    q = set(tokens)
+    if not q or not stats.n_rows:
         return []
 
-    idf = _idf_from_texts(neighbor_texts)
-
-    neigh_terms = set()
-    for t in neighbor_texts:
-        neigh_terms.update(tokenize(t))
-
-    inter = [term for term in q if term in neigh_terms]
+    inter = [term for term in q if term in idf]
     if not inter:
         return []
 
@@ -87,7 +120,7 @@ def overlap_terms(query_text: str, neighbor_texts: List[str], k: int = 8) -> Lis
     if not inter:
         return []
 
-    inter.sort(key=lambda term: (-(idf.get(term, 1.0)), term))
+    inter.sort(key=lambda term: (-(idf.get(term, 1.0)), -corpus.idf_of(term), term))
     return inter[:k]
 
 
@@ -120,15 +153,22 @@ def _detect_domain(tokens: List[str]) -> str:
     return "general"
 
 
-def make_suggestions(query_text: str, neighbor_texts: List[str], score: int | None = None) -> List[str]:
-    ov = overlap_terms(query_text, neighbor_texts, k=8)
-    neigh_top = [t for t, _ in top_terms(neighbor_texts, k=8)]
+def make_suggestions(query_text: str, neighbor_rows: Sequence[int], corpus_terms: TermIndex,
+                     score: int | None = None) -> List[str]:
+    """Suggestions for query_text given its neighbors' row ids in corpus_terms.
+
+    Neighbor statistics come from the stored term counts of those rows, gathered once.
+    """
     tokens = tokenize(query_text)
+    stats = neighbor_terms(corpus_terms, neighbor_rows)
+    idf = stats.local_idf()
+    ov = overlap_terms(tokens, stats, idf, corpus_terms, k=8)
+    neigh_top = [t for t, _ in top_terms(stats, k=8)]
     domain = _detect_domain(tokens)
     seed = _seed_from_text(query_text)
 
     overlap_phrase = ", ".join(ov[:6]) if ov else ""
-    key_term = _best_term(query_text, neighbor_texts)
+    key_term = _best_term(tokens, idf, corpus_terms)
     if key_term in {"idea", "this"} and tokens:
         key_term = tokens[0]
 
@@ -0,0 +1,149 @@
+"""Corpus term statistics: tokenizer, per-row term counts and IDF.
+
+Built once (at index build time, or at load for older builds) and memory-mapped by every
+worker, so request-time overlap scoring never re-tokenizes corpus text.
+"""
+import json
+import re
+from array import array
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+from scipy import sparse
+
+
+# Stopwords tuned to remove schema/meta/UI words and generic hackathon boilerplate.
+_STOP = {
+    # function words
+    "the","a","an","and","or","to","of","in","for","with","on","at","by","from","as",
+    "is","are","was","were","be","been","it","this","that","these","those","your","our",
+
+    # question words (these should NEVER drive "constraints")
+    "how","why","what","when","where","who","whom","which",
+
+    # generic software boilerplate
+    "app","project","projects","repo","repository","code","using","use","uses","used",
+    "build","built","create","creating","platform","website","web","api","service",
+    "system","powered","tool","tools",
+
+    # hackathon boilerplate
+    "hackathon","demo","prototype",
+
+    # form/schema leakage (your exact bug)
+    "title","description","tags","tag","idea","ideas","originality","original",
+    "check","checker","done","score","scoring","recent","alltime","all-time","all",
+}
+
+
+
+def _tokenize(s: str) -> List[str]:
+    s = (s or "").lower()
+    toks = re.findall(r"[a-z0-9]{3,}", s)
+    return [t for t in toks if t not in _STOP]
+
+
+def idf_from_df(df, n_docs: int) -> np.ndarray:
+    """Smoothed IDF per term; terms with df == 0 (text-only) get 1.0."""
+    df = np.asarray(df, dtype="float64")
+    return np.where(df > 0, np.log((n_docs + 1) / (df + 1)) + 1.0, 1.0)
+
+
+@dataclass
+class TermIndex:
+    """Vocabulary, CSR row x term counts over project text, and IDF per term.
+
+    DF/IDF come from each row's search_text (so overlap emphasizes rare shared
+    constraints); counts come from the full text. Terms that only occur in text keep an
+    IDF of 1.0, the same fallback used for unknown query terms.
+    """
+    vocab: Dict[str, int]
+    doc_terms: sparse.csr_matrix
+    idf: np.ndarray
+    n_docs: int
+    names: List[str] = field(default=None, repr=False)  # term id -> term
+
+    def __post_init__(self):
+        if self.names is None:
+            self.names = sorted(self.vocab, key=self.vocab.__getitem__)
+
+    @classmethod
+    def build(cls, docs: Iterable[Tuple[str, str]]) -> "TermIndex":
+        """docs yields (search_text, text) for each row, in index order."""
+        vocab: Dict[str, int] = {}
+        df: List[int] = []
+        indptr = array("q", [0])
+        indices = array("q")
+        counts = array("q")
+
+        def term_id(term: str) -> int:
+            j = vocab.get(term)
+            if j is None:
+                j = vocab[term] = len(vocab)
+                df.append(0)
+            return j
+
+        for search_text, text in docs:
+            for term in set(_tokenize(search_text)):
+                df[term_id(term)] += 1
+            for term, c in Counter(_tokenize(text)).items():
+                indices.append(term_id(term))
+                counts.append(c)
+            indptr.append(len(indices))
+
+        n_rows = len(indptr) - 1
+        doc_terms = sparse.csr_matrix(
+            (
+                np.frombuffer(counts, dtype=np.int64).astype(np.int32),
+                np.frombuffer(indices, dtype=np.int64),
+                np.frombuffer(indptr, dtype=np.int64),
+            ),
+            shape=(n_rows, len(vocab)),
+        )
+
+        n_docs = max(1, n_rows)
+        return cls(vocab=vocab, doc_terms=doc_terms, idf=idf_from_df(df, n_docs), n_docs=n_docs)
+
+    def idf_of(self, term: str) -> float:
+        j = self.vocab.get(term)
+        return float(self.idf[j]) if j is not None else 1.0
+
+    def save(self, path) -> None:
+        out = Path(path)
+        out.mkdir(parents=True, exist_ok=True)
+        np.save(out / "indptr.npy", self.doc_terms.indptr)
+        np.save(out / "indices.npy", self.doc_terms.indices)
+        np.save(out / "counts.npy", self.doc_terms.data)
+        np.save(out / "idf.npy", self.idf)
+        (out / "vocab.txt").write_text("\n".join(self.names), encoding="utf-8")
+        (out / "info.json").write_text(
+            json.dumps({"rows": int(self.doc_terms.shape[0]), "n_docs": self.n_docs}),
+            encoding="utf-8",
+        )
+
+    @classmethod
+    def load(cls, path, mmap: bool = True) -> "TermIndex":
+        src = Path(path)
+        mode = "r" if mmap else None
+        info = json.loads((src / "info.json").read_text(encoding="utf-8"))
+        text = (src / "vocab.txt").read_text(encoding="utf-8")
+        names = text.split("\n") if text else []
+        vocab = {t: j for j, t in enumerate(names)}
+        doc_terms = sparse.csr_matrix(
+            (
+                np.load(src / "counts.npy", mmap_mode=mode),
+                np.load(src / "indices.npy", mmap_mode=mode),
+                np.load(src / "indptr.npy", mmap_mode=mode),
+            ),
+            shape=(int(info["rows"]), len(vocab)),
+            copy=False,
+        )
+        return cls(
+            vocab=vocab,
+            doc_terms=doc_terms,
+            idf=np.load(src / "idf.npy", mmap_mode=mode),
+            n_docs=int(info["n_docs"]),
+            names=names,
+        )
@@ -0,0 +1,33 @@
+"""The date a corpus row counts as, for recency windows ("similar projects in the last N months").
+
+The builders write it per row (row_timestamps.npy) and the API recomputes it for builds
+without that file, so both must agree: every caller goes through row_timestamp. A row's
+date is when the project was made (created_at, or a Devpost entry's started_date), with
+pushed_at only for rows that have neither. Naive datetimes are taken as UTC.
+"""
+from datetime import datetime, timezone
+from typing import Optional
+
+DATE_FIELDS = ("created_at", "started_date", "pushed_at")
+
+
+def parse_ts(s: Optional[str]) -> int:
+    """ISO date/datetime -> epoch seconds (UTC); -1 when missing or unparseable."""
+    if not s:
+        return -1
+    try:
+        dt = datetime.fromisoformat(str(s).replace("Z", "+00:00"))
+    except ValueError:
+        return -1
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+def row_timestamp(p: dict) -> int:
+    """Epoch seconds of the first parseable DATE_FIELDS value; -1 when undated."""
+    for key in DATE_FIELDS:
+        ts = parse_ts(p.get(key))
+        if ts >= 0:
+            return ts
+    return -1
@@ -0,0 +1,112 @@
+"""Recall/latency benchmark for ANN index specs against exact (flat) search.
+
+Example:
+    python scripts/bench_ann.py --specs flat "hnsw:M=32,efSearch=64" \
+        "ivf:nprobe=8" "ivf:nprobe=32" "ivfpq:m=48,nprobe=32" --k 10
+
+Specs that differ only in search parameters (nprobe, efSearch) share one built index.
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import faiss
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.ann import build_index, build_key, parse_index_spec, search_params  # noqa: E402
+
+DATA = Path("data")
+EMB = DATA / "embeddings.npy"
+
+
+def make_queries(emb: np.ndarray, n: int, noise: float, seed: int) -> np.ndarray:
+    """Perturbed copies of random corpus rows, so queries land near (not on) real projects."""
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(emb), size=min(n, len(emb)), replace=False)
+    q = emb[rows] + rng.normal(0.0, noise, size=(len(rows), emb.shape[1])).astype("float32")
+    q /= np.linalg.norm(q, axis=1, keepdims=True) + 1e-12
+    return np.ascontiguousarray(q, dtype="float32")
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    hits = sum(len(set(f[f >= 0].tolist()) & set(t.tolist())) for f, t in zip(found, truth))
+    return hits / float(len(truth) * k)
+
+
+def bench_spec(index: faiss.Index, spec: str, queries: np.ndarray, truth: np.ndarray, k: int) -> dict:
+    _, p = parse_index_spec(spec)
+    params = search_params(index, nprobe=p.get("nprobe"), ef_search=p.get("efSearch"))
+
+    # One query at a time, like the API.
+    lat_ms = []
+    found = np.empty((len(queries), k), dtype=np.int64)
+    for i in range(len(queries)):
+        t0 = time.perf_counter()
+        _, idx = index.search(queries[i: i + 1], k, params=params)
+        lat_ms.append((time.perf_counter() - t0) * 1000.0)
+        found[i] = idx[0]
+
+    t0 = time.perf_counter()
+    index.search(queries, k, params=params)
+    batch_s = time.perf_counter() - t0
+
+    return {
+        "spec": spec,
+        f"recall@{k}": round(recall_at_k(found, truth), 4),
+        "p50_ms": round(float(np.percentile(lat_ms, 50)), 3),
+        "p99_ms": round(float(np.percentile(lat_ms, 99)), 3),
+        "batch_qps": round(len(queries) / batch_s, 1) if batch_s > 0 else None,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--emb", default=str(EMB), help="embeddings .npy aligned to the corpus")
+    ap.add_argument("--specs", nargs="+", default=["flat", "hnsw:M=32,efSearch=64", "ivf:nprobe=16"])
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--queries", type=int, default=500)
+    ap.add_argument("--noise", type=float, default=0.05)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--json", default="", help="write results to this path")
+    args = ap.parse_args()
+
+    emb = np.ascontiguousarray(np.load(args.emb, mmap_mode="r"), dtype="float32")
+    queries = make_queries(emb, args.queries, args.noise, args.seed)
+
+    flat = faiss.IndexFlatIP(emb.shape[1])
+    flat.add(emb)
+    _, truth = flat.search(queries, args.k)
+
+    results = []
+    built: dict = {}
+    for spec in args.specs:
+        key = build_key(spec)
+        if key not in built:
+            t0 = time.perf_counter()
+            index = build_index(emb, spec)
+            built[key] = (index, time.perf_counter() - t0, len(faiss.serialize_index(index)))
+        index, build_s, size = built[key]
+
+        row = bench_spec(index, spec, queries, truth, args.k)
+        row["build_s"] = round(build_s, 2)
+        row["index_mb"] = round(size / 1e6, 1)
+        results.append(row)
+        print(
+            f"{spec:<40} recall@{args.k}={row[f'recall@{args.k}']:.4f} "
+            f"p50={row['p50_ms']:.3f}ms p99={row['p99_ms']:.3f}ms "
+            f"qps={row['batch_qps']} build={row['build_s']}s size={row['index_mb']}MB"
+        )
+
+    if args.json:
+        Path(args.json).write_text(
+            json.dumps({"n": len(emb), "d": emb.shape[1], "k": args.k, "results": results}, indent=2),
+            encoding="utf-8",
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+"""Per-stage latency/memory benchmark of the /check hot path on a synthetic corpus.
+
+Example:
+    python scripts/bench_check.py --sizes 10000 100000 1000000 --json bench/HEAD.json
+    python scripts/bench_check.py --sizes 10000 --compare bench/HEAD.json
+
+For each size a deterministic corpus is generated (see generate_corpus) and built with the
+real builder (stream_build.run_build) into bench/n<N>-<params>/data, in the on-disk format
+the API loads; later runs with the same parameters reuse it (--rebuild starts over). Texts
+are embedded with app.embedders.HashEmbedder, so nothing is downloaded and runs are
+repeatable, but absolute search quality means nothing.
+
+Queries are fresh synthetic projects drawn from the corpus topics. Every stage of
+_compute_check is timed on its own (p50/p95/mean ms), then once more under tracemalloc
+for the peak Python/numpy allocation per call. Results go to --json; --compare prints
+the p50 ratio of each stage against an earlier result file.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import faiss
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app import main as api  # noqa: E402
+from app.embedders import HashEmbedder  # noqa: E402
+from app.models import CheckRequest  # noqa: E402
+from app.scoring import originality_score  # noqa: E402
+from app.store import ProjectStore  # noqa: E402
+from app.suggest import make_suggestions  # noqa: E402
+from app.timestamps import row_timestamp  # noqa: E402
+from stream_build import Outputs, Source, run_build  # noqa: E402
+
+BENCH = Path("bench")
+STAGES = (
+    "embed_query",
+    "search",
+    "weighted_overlap",
+    "build_neighbors",
+    "originality_score",
+    "make_suggestions",
+    "compute_check",
+)
+
+_SYLLABLES = ["ka", "lo", "mi", "ne", "su", "ta", "ri", "po", "vu", "de", "xo", "ba", "ze", "qui", "fa", "ho"]
+_TYPE_LABELS = ["project"] * 94 + ["template"] * 3 + ["list"] * 2 + ["platform"]
+
+
+class _Vocabulary:
+    """Zipf-distributed made-up words, plus a few characteristic words per topic."""
+
+    def __init__(self, rng: np.random.Generator, size: int, topics: int, topic_words: int = 24):
+        words, seen = [], set()
+        while len(words) < size:
+            w = "".join(rng.choice(_SYLLABLES, size=int(rng.integers(2, 5))))
+            if w not in seen:
+                seen.add(w)
+                words.append(w)
+        self.words = np.array(words)
+        p = 1.0 / np.arange(1, size + 1) ** 1.07
+        self.cdf = np.cumsum(p / p.sum())
+        self.topics = rng.choice(size, size=(topics, topic_words))
+
+    def sample(self, rng: np.random.Generator, topic: int, n: int, topical: float = 0.5) -> List[str]:
+        from_topic = rng.random(n) < topical
+        ids = np.where(
+            from_topic,
+            self.topics[topic, rng.integers(0, self.topics.shape[1], n)],
+            np.minimum(np.searchsorted(self.cdf, rng.random(n)), len(self.words) - 1),
+        )
+        return self.words[ids].tolist()
+
+
+def _words(rng: np.random.Generator, mean: float, sigma: float = 0.6, lo: int = 3) -> int:
+    """Log-normal length with the given mean (in words)."""
+    return max(lo, int(rng.lognormal(np.log(mean) - sigma * sigma / 2, sigma)))
+
+
+def _project(rng, vocab: _Vocabulary, i: int, desc_words: float, readme_words: float,
+             start: datetime, span_days: int) -> dict:
+    topic = int(rng.integers(0, len(vocab.topics)))
+    title = "-".join(vocab.sample(rng, topic, int(rng.integers(1, 4)), topical=0.7))
+    description = " ".join(vocab.sample(rng, topic, _words(rng, desc_words)))
+    tags = sorted(set(vocab.sample(rng, topic, int(rng.integers(1, 6)), topical=0.8)))
+    readme = " ".join(vocab.sample(rng, topic, _words(rng, readme_words, sigma=0.9), topical=0.35))
+    created = start + timedelta(days=float(rng.uniform(0, span_days)))
+    pushed = created + timedelta(days=float(rng.exponential(60)))
+    search_text = f"Title: {title}\nDescription: {description}\nTags: {', '.join(tags)}"
+    return {
+        "id": f"bench:{i}",
+        "source": "github",
+        "title": title,
+        "tagline": None,
+        "description": description,
+        "tags": tags,
+        "url": f"https://github.com/bench/{title}-{i}",
+        "created_at": created.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "pushed_at": pushed.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "stars": int(rng.zipf(1.8)),
+        "language": "Python",
+        "submission_score": float(rng.integers(0, 10)),
+        "type_label": str(rng.choice(_TYPE_LABELS)),
+        "search_text": search_text,
+        "text": search_text + "\nREADME: " + readme,
+    }
+
+
+def generate_corpus(path: Path, n: int, *, seed: int = 0, desc_words: float = 25.0, readme_words: float = 150.0,
+                    start: str = "2015-01-01", end: str = "2025-12-31", vocab_size: int = 50_000) -> None:
+    """Write n synthetic harvester records (the projects.jsonl format) to path.
+
+    Each record belongs to one of n // 40 topics and draws about half its words from that
+    topic, so neighbors share constraints the way real near-ideas do. Description and README
+    lengths are log-normal around desc_words / readme_words; created_at is uniform in
+    [start, end). The same arguments always produce the same file.
+    """
+    rng = np.random.default_rng(seed)
+    vocab = _Vocabulary(rng, vocab_size, topics=max(1, n // 40))
+    t0 = datetime.fromisoformat(start).replace(tzinfo=timezone.utc)
+    span = max(1, (datetime.fromisoformat(end).replace(tzinfo=timezone.utc) - t0).days)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as f:
+        for i in range(n):
+            f.write(json.dumps(_project(rng, vocab, i, desc_words, readme_words, t0, span)) + "\n")
+
+
+def make_queries(n: int, corpus_rows: int, seed: int, desc_words: float) -> List[CheckRequest]:
+    """Fresh projects from the same topics as a corpus of corpus_rows (same vocabulary seed)."""
+    rng = np.random.default_rng(seed)
+    vocab = _Vocabulary(rng, 50_000, topics=max(1, corpus_rows // 40))
+    qrng = np.random.default_rng(seed + 1)
+    t0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    out = []
+    for i in range(n):
+        p = _project(qrng, vocab, i, desc_words, 1, t0, 1)
+        out.append(CheckRequest(title=p["title"].replace("-", " "), description=p["description"], tags=p["tags"]))
+    return out
+
+
+def build_corpus(work: Path, n: int, args, embedder: HashEmbedder) -> dict:
+    """Generate and build one corpus under work/ unless an identical build is already there."""
+    params = {
+        "n": n, "seed": args.seed, "desc_words": args.desc_words, "readme_words": args.readme_words,
+        "start": args.start, "end": args.end, "dim": embedder.dim, "index_spec": args.index_spec,
+    }
+    data = work / "data"
+    out = Outputs.in_dir(data)
+    params_path = work / "params.json"
+    if not args.rebuild and out.manifest.exists() and params_path.exists():
+        if json.loads(params_path.read_text(encoding="utf-8")) == params:
+            return {"reused": True}
+
+    timings = {}
+    t0 = time.perf_counter()
+    jsonl = data / "projects.jsonl"
+    generate_corpus(jsonl, n, seed=args.seed, desc_words=args.desc_words, readme_words=args.readme_words,
+                    start=args.start, end=args.end)
+    timings["generate_s"] = round(time.perf_counter() - t0, 2)
+
+    t0 = time.perf_counter()
+    cache = work / "embedding_cache.sqlite"
+    run_build(
+        [Source(jsonl, lambda p: p)],
+        out=out,
+        model_name=f"hash-{embedder.dim}",
+        encode_fn=embedder.encode,
+        text_of=lambda p: p["search_text"],
+        timestamp_of=row_timestamp,
+        index_spec=args.index_spec,
+        cache_path=cache,
+        full=True,
+        restart=True,
+    )
+    timings["build_s"] = round(time.perf_counter() - t0, 2)
+    cache.unlink(missing_ok=True)  # the stub embedder is cheaper to rerun than to cache
+    params_path.write_text(json.dumps(params), encoding="utf-8")
+    return timings
+
+
+def open_store(work: Path, embedder: HashEmbedder) -> ProjectStore:
+    out = Outputs.in_dir(work / "data")
+    return ProjectStore(
+        index_all_path=str(out.index),
+        row_timestamps_path=str(out.row_ts),
+        meta_path=str(work / "data" / "projects_meta.json"),
+        embed_model_name=f"hash-{embedder.dim}",
+        meta_bin_path=str(out.meta_bin),
+        meta_offsets_path=str(out.meta_offsets),
+        terms_dir=str(out.terms),
+        manifest_path=str(out.manifest),
+        row_quality_path=str(out.row_quality),
+        embed_batching=False,
+        embed_cache_max_entries=0,  # every stage call encodes, like a first-time query
+        embedder=embedder,
+    )
+
+
+def _rss_mb() -> Optional[float]:
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _stage_calls(store: ProjectStore, req: CheckRequest) -> Dict[str, Callable[[], object]]:
+    """One zero-argument callable per stage for req, with the inputs each stage needs precomputed."""
+    corpus = store.corpus
+    k = req.k or api.settings.top_k_default
+    qtext = store.query_text(req.title, req.description, req.tags)
+    qvec = store.embed_query(req.title, req.description, req.tags)
+    (hits,) = api._search_adaptive(corpus, qvec, [req], req.recent_months)
+    sims_all, idxs_all, sims_recent, idxs_recent = hits
+    valid = idxs_all[idxs_all >= 0]
+    neighbors_all, rows_all = api.build_neighbors(corpus, sims_all, idxs_all, k, qtext)
+    neighbors_recent, rows_recent = api.build_neighbors(corpus, sims_recent, idxs_recent, k, qtext)
+    specificity = corpus.query_specificity(qtext)
+    sims = [n.similarity for n in neighbors_all]
+
+    return {
+        "embed_query": lambda: store.embed_queries([store.canonical_query(req.title, req.description, req.tags)]),
+        "search": lambda: api._search_adaptive(corpus, qvec, [req], req.recent_months),
+        "weighted_overlap": lambda: corpus.weighted_overlap_rows(qtext, valid),
+        "build_neighbors": lambda: (
+            api.build_neighbors(corpus, sims_all, idxs_all, k, qtext),
+            api.build_neighbors(corpus, sims_recent, idxs_recent, k, qtext),
+        ),
+        "originality_score": lambda: originality_score(sims, specificity=specificity),
+        "make_suggestions": lambda: make_suggestions(qtext, [*rows_recent, *rows_all], corpus.terms, score=50),
+        "compute_check": lambda: api._compute_check(req, corpus),
+    }
+
+
+def bench_size(store: ProjectStore, queries: List[CheckRequest], mem_queries: int) -> Dict[str, dict]:
+    calls = [_stage_calls(store, q) for q in queries]
+    for c in calls[: min(5, len(calls))]:  # warm up page cache and lazy state
+        for fn in c.values():
+            fn()
+
+    lat: Dict[str, List[float]] = {s: [] for s in STAGES}
+    for c in calls:
+        for stage in STAGES:
+            t0 = time.perf_counter()
+            c[stage]()
+            lat[stage].append((time.perf_counter() - t0) * 1000.0)
+
+    peak: Dict[str, int] = {s: 0 for s in STAGES}
+    tracemalloc.start()
+    for c in calls[:mem_queries]:
+        for stage in STAGES:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            c[stage]()
+            peak[stage] = max(peak[stage], tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+
+    return {
+        stage: {
+            "p50_ms": round(float(np.percentile(lat[stage], 50)), 4),
+            "p95_ms": round(float(np.percentile(lat[stage], 95)), 4),
+            "mean_ms": round(float(np.mean(lat[stage])), 4),
+            "peak_kb": round(peak[stage] / 1024, 1),
+        }
+        for stage in STAGES
+    }
+
+
+def _environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=Path(__file__).resolve().parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "time": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "faiss": getattr(faiss, "__version__", None),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(results: dict, baseline_path: str) -> None:
+    baseline = json.loads(Path(baseline_path).read_text(encoding="utf-8"))
+    base = {r["n"]: r for r in baseline["sizes"]}
+    print(f"\np50 vs {baseline_path} (commit {baseline['env'].get('commit')}):")
+    for row in results["sizes"]:
+        old = base.get(row["n"])
+        if old is None:
+            continue
+        cells = []
+        for stage in STAGES:
+            a, b = old["stages"].get(stage, {}).get("p50_ms"), row["stages"][stage]["p50_ms"]
+            cells.append(f"{stage}={b / a:.2f}x" if a else f"{stage}=n/a")
+        print(f"  n={row['n']:<8} " + " ".join(cells))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--mem-queries", type=int, default=20, help="queries re-run under tracemalloc")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--desc-words", type=float, default=25.0, help="mean description length (log-normal)")
+    ap.add_argument("--readme-words", type=float, default=150.0, help="mean README length (log-normal)")
+    ap.add_argument("--start", default="2015-01-01", help="earliest created_at")
+    ap.add_argument("--end", default="2025-12-31", help="latest created_at")
+    ap.add_argument("--dim", type=int, default=384, help="stub embedding width (all-MiniLM-L6-v2 is 384)")
+    ap.add_argument("--index-spec", default="flat")
+    ap.add_argument("--dir", default=str(BENCH), help="where corpora are generated and built")
+    ap.add_argument("--rebuild", action="store_true", help="regenerate corpora even if a matching build exists")
+    ap.add_argument("--json", default="", help="write results to this path")
+    ap.add_argument("--compare", default="", help="earlier --json output to compare p50s against")
+    args = ap.parse_args()
+
+    embedder = HashEmbedder(args.dim)
+    results = {"env": _environment(), "args": vars(args), "sizes": []}
+    for n in args.sizes:
+        work = Path(args.dir) / f"n{n}-s{args.seed}-d{args.dim}-{args.index_spec.replace(':', '_')}"
+        built = build_corpus(work, n, args, embedder)
+
+        gc.collect()
+        rss0 = _rss_mb()
+        t0 = time.perf_counter()
+        store = open_store(work, embedder)
+        load_s = time.perf_counter() - t0
+        api.store = store
+        row = {
+            "n": n,
+            **built,
+            "load_s": round(load_s, 2),
+            "rss_mb": _rss_mb(),
+            "rss_load_mb": round(_rss_mb() - rss0, 1) if rss0 is not None else None,
+            "stages": bench_size(store, make_queries(args.queries, n, args.seed, args.desc_words), args.mem_queries),
+        }
+        results["sizes"].append(row)
+        store.close()
+        api.store = None
+        del store
+        gc.collect()
+
+        print(f"n={n} load={row['load_s']}s rss={row['rss_mb']}MB" + (f" build={row['build_s']}s" if "build_s" in row else ""))
+        for stage in STAGES:
+            s = row["stages"][stage]
+            print(f"  {stage:<18} p50={s['p50_ms']:.3f}ms p95={s['p95_ms']:.3f}ms peak={s['peak_kb']:.0f}KB")
+
+    if args.json:
+        Path(args.json).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,111 +1,81 @@
-import json
+import argparse
+import sys
 from pathlib import Path
-from datetime import datetime, timezone
-import calendar
 
-import numpy as np
-import faiss
-from sentence_transformers import SentenceTransformer
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.timestamps import DATE_FIELDS, row_timestamp  # noqa: E402
+from dedup import plan_duplicates  # noqa: E402
+from encoding import CorpusEncoder  # noqa: E402
+from stream_build import CHUNK_ROWS, Outputs, Source, run_build  # noqa: E402
 
 DATA = Path("data")
 JSONL = DATA / "projects.jsonl"
 
 MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
 
-OUT_ALL_INDEX = DATA / "index_all.faiss"
-OUT_RECENT_INDEX = DATA / "index_recent.faiss"
-OUT_META = DATA / "projects_meta.json"
-OUT_EMB = DATA / "embeddings.npy"
-OUT_RECENT_ROWS = DATA / "recent_row_ids.json"
+OUT = Outputs.in_dir(DATA)
+EMB_CACHE = DATA / "embedding_cache.sqlite"
 
-RECENT_MONTHS = 24  # change to 12/36 as you like
 
-
-def parse_dt(s: str | None):
-    if not s:
-        return None
-    try:
-        return datetime.fromisoformat(s.replace("Z", "+00:00"))
-    except Exception:
-        return None
-
-
-def month_subtract(dt: datetime, months: int) -> datetime:
-    """Subtract N months from dt without numpy; clamps day to last day of target month."""
-    y = dt.year
-    m = dt.month - months
-    while m <= 0:
-        m += 12
-        y -= 1
-    last_day = calendar.monthrange(y, m)[1]
-    d = min(dt.day, last_day)
-    return dt.replace(year=y, month=m, day=d)
-
-
-def l2_normalize(x: np.ndarray) -> np.ndarray:
-    norm = np.linalg.norm(x, axis=1, keepdims=True) + 1e-12
-    return x / norm
-
-
-def main():
+def main(index_spec: str = "flat", cache_path: Path = EMB_CACHE, full: bool = False,
+         chunk_rows: int = CHUNK_ROWS, restart: bool = False, workers: int = 1, dedup: bool = True):
     DATA.mkdir(parents=True, exist_ok=True)
 
-    projects = []
-    with JSONL.open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            projects.append(json.loads(line))
-
-    if not projects:
-        raise RuntimeError("projects.jsonl is empty")
+    # Only texts not already in the embedding cache are encoded (and the model or worker
+    # pool is only started if there are any).
+    encode = CorpusEncoder(MODEL_NAME, workers=workers)
 
-    # Prefer embedding a compact "search_text" if present; fallback to "text"
-    texts = []
-    for p in projects:
-        t = (p.get("search_text") or "").strip()
-        if not t:
-            t = (p.get("text") or "").strip()
-        texts.append(t)
+    def choose_text(p: dict) -> str:
+        # Prefer embedding a compact "search_text" if present; fallback to "text"
+        return (p.get("search_text") or "").strip() or (p.get("text") or "").strip()
 
-    model = SentenceTransformer(MODEL_NAME)
-    emb = model.encode(texts, batch_size=64, show_progress_bar=True).astype("float32")
-    emb = l2_normalize(emb)
-    np.save(OUT_EMB, emb)
+    # Collapse near-duplicates (same repo_url/url, or near-identical text) to one row each.
+    source = Source(JSONL, lambda p: p)
+    input_id = ""
+    if dedup and JSONL.exists():
+        plan = plan_duplicates([source], choose_text)
+        print(plan.summary())
+        plan.apply([source])
+        input_id = "dedup:" + plan.fingerprint
 
-    with OUT_META.open("w", encoding="utf-8") as f:
-        json.dump(projects, f, ensure_ascii=False)
-
-    d = emb.shape[1]
-
-    # All-time index (cosine via inner product on normalized vectors)
-    idx_all = faiss.IndexFlatIP(d)
-    idx_all.add(emb)
-    faiss.write_index(idx_all, str(OUT_ALL_INDEX))
-
-    # Recent index: define "recent" by pushed_at (what’s active lately)
-    now = datetime.now(timezone.utc)
-    cutoff = month_subtract(now, RECENT_MONTHS)
-
-    recent_rows = []
-    for i, p in enumerate(projects):
-        dt = parse_dt(p.get("pushed_at")) or parse_dt(p.get("created_at"))
-        if dt and dt >= cutoff:
-            recent_rows.append(i)
-
-    emb_recent = emb[recent_rows] if recent_rows else emb[:0]
-    idx_recent = faiss.IndexFlatIP(d)
-    if len(recent_rows) > 0:
-        idx_recent.add(emb_recent)
-    faiss.write_index(idx_recent, str(OUT_RECENT_INDEX))
-
-    OUT_RECENT_ROWS.write_text(json.dumps(recent_rows), encoding="utf-8")
-
-    print(f"All-time: {len(projects)} projects")
-    print(f"Recent (>= {cutoff.date()} by pushed_at): {len(recent_rows)} projects")
-    print(f"Wrote: {OUT_ALL_INDEX}, {OUT_RECENT_INDEX}, {OUT_META}, {OUT_RECENT_ROWS}, {OUT_EMB}")
+    try:
+        summary = run_build(
+            [source],
+            out=OUT,
+            model_name=MODEL_NAME,
+            encode_fn=encode,
+            text_of=choose_text,
+            timestamp_of=row_timestamp,
+            index_spec=index_spec,
+            cache_path=cache_path,
+            full=full,
+            chunk_rows=chunk_rows,
+            restart=restart,
+            input_id=input_id,
+        )
+    finally:
+        encode.close()
+    print(encode.report())
+
+    print(f"All-time: {summary['rows']} projects ({summary['index']})")
+    print(f"Dated rows ({'/'.join(DATE_FIELDS)}): {summary['dated']} projects")
+    print(f"Neighbor candidates: {summary['good']} projects (app/quality.py)")
+    print(f"Wrote: {OUT.index}, {OUT.meta_bin}, {OUT.terms}, {OUT.row_ts}, {OUT.row_quality}, {OUT.emb}")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "--index-spec",
+        default="flat",
+        help='flat | hnsw:M=32,efSearch=64 | ivf:nlist=1024,nprobe=16 | ivfpq:nlist=1024,m=48,nprobe=32',
+    )
+    ap.add_argument("--cache", default=str(EMB_CACHE), help="embedding cache (SQLite) keyed by text hash")
+    ap.add_argument("--full", action="store_true", help="rebuild the index even if it could be appended to")
+    ap.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="records read, encoded and checkpointed at a time")
+    ap.add_argument("--restart", action="store_true", help="discard an interrupted build instead of resuming it")
+    ap.add_argument("--workers", type=int, default=1, help="encoder processes (0 = one per CPU core)")
+    ap.add_argument("--no-dedup", action="store_true", help="keep near-duplicate rows instead of collapsing them")
+    args = ap.parse_args()
+    main(index_spec=args.index_spec, cache_path=Path(args.cache), full=args.full,
+         chunk_rows=args.chunk_rows, restart=args.restart, workers=args.workers, dedup=not args.no_dedup)
\ No newline at end of file
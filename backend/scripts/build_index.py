@@ -1,9 +1,12 @@
-import json
+import argparse
+import sys
 from pathlib import Path
-from datetime import datetime, timezone
-import numpy as np
-import faiss
-from sentence_transformers import SentenceTransformer
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.timestamps import DATE_FIELDS, row_timestamp  # noqa: E402
+from dedup import plan_duplicates  # noqa: E402
+from encoding import CorpusEncoder  # noqa: E402
+from stream_build import CHUNK_ROWS, Outputs, Source, run_build  # noqa: E402
 
 DATA = Path("data")
 JSONL_PROJECTS = DATA / "projects.jsonl"
@@ -11,46 +14,8 @@ JSONL_DEVPOST = DATA / "devpost.jsonl"
 
 MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
 
-OUT_ALL_INDEX = DATA / "index_all.faiss"
-OUT_RECENT_INDEX = DATA / "index_recent.faiss"
-OUT_META = DATA / "projects_meta.json"
-OUT_EMB = DATA / "embeddings.npy"
-OUT_RECENT_ROWS = DATA / "recent_row_ids.json"
-
-RECENT_MONTHS = 24  # change to 12/36 as you like
-
-
-def parse_dt(s: str | None):
-    if not s:
-        return None
-    try:
-        dt = datetime.fromisoformat(s.replace("Z", "+00:00"))
-        if dt.tzinfo is None:
-            return dt.replace(tzinfo=timezone.utc)
-        return dt
-    except Exception:
-        return None
-
-
-def month_subtract(dt: datetime, months: int) -> datetime:
-    """Subtract months without extra deps; clamps day to last day of resulting month."""
-    y = dt.year
-    m = dt.month - months
-    while m <= 0:
-        m += 12
-        y -= 1
-    # clamp day
-    import calendar
-    last_day = calendar.monthrange(y, m)[1]
-    d = min(dt.day, last_day)
-    return dt.replace(year=y, month=m, day=d)
-
-
-def safe_normalize(emb: np.ndarray) -> np.ndarray:
-    emb = np.nan_to_num(emb, nan=0.0, posinf=0.0, neginf=0.0).astype("float32")
-    norms = np.linalg.norm(emb, axis=1, keepdims=True)
-    norms = np.where(norms == 0, 1.0, norms)
-    return emb / norms
+OUT = Outputs.in_dir(DATA)
+EMB_CACHE = DATA / "embedding_cache.sqlite"
 
 
 def choose_text(p: dict) -> str:
@@ -147,78 +112,75 @@ def _normalize_legacy(p: dict) -> dict:
     return normalized
 
 
-def main():
-    projects = []
-
-    if JSONL_PROJECTS.exists():
-        with JSONL_PROJECTS.open("r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    raw = json.loads(line)
-                    projects.append(_normalize_legacy(raw))
-                except Exception:
-                    continue
-
-    if JSONL_DEVPOST.exists():
-        with JSONL_DEVPOST.open("r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    raw = json.loads(line)
-                    if "scraped_at" in raw:
-                        raw.pop("scraped_at", None)
-                    projects.append(_normalize_devpost(raw, "devpost"))
-                except Exception:
-                    continue
-
-    if not projects:
-        raise RuntimeError("No projects loaded from projects.jsonl or devpost.jsonl")
-
-    texts = [choose_text(p) for p in projects]
-
-    model = SentenceTransformer(MODEL_NAME)
-    emb = model.encode(texts, batch_size=64, show_progress_bar=True).astype("float32")
-    emb = safe_normalize(emb)
-
-    # Save embeddings (optional)
-    np.save(OUT_EMB, emb)
-
-    # Save meta aligned to embeddings
-    OUT_META.write_text(json.dumps(projects, ensure_ascii=False), encoding="utf-8")
+def _devpost_row(raw: dict):
+    try:
+        raw.pop("scraped_at", None)
+        return _normalize_devpost(raw, "devpost")
+    except Exception:
+        return None
 
-    d = emb.shape[1]
 
-    # All-time index (cosine similarity because vectors are normalized)
-    idx_all = faiss.IndexFlatIP(d)
-    idx_all.add(emb)
-    faiss.write_index(idx_all, str(OUT_ALL_INDEX))
+def _legacy_row(raw: dict):
+    try:
+        return _normalize_legacy(raw)
+    except Exception:
+        return None
 
-    # Recent index
-    now = datetime.now(timezone.utc)
-    cutoff = month_subtract(now, RECENT_MONTHS)
 
-    recent_rows: list[int] = []
-    for i, p in enumerate(projects):
-        dt = parse_dt(p.get("created_at")) or parse_dt(p.get("pushed_at"))
-        if dt and dt >= cutoff:
-            recent_rows.append(i)
+def main(index_spec: str = "flat", cache_path: Path = EMB_CACHE, full: bool = False,
+         chunk_rows: int = CHUNK_ROWS, restart: bool = False, workers: int = 1, dedup: bool = True):
+    DATA.mkdir(parents=True, exist_ok=True)
 
-    emb_recent = emb[recent_rows] if recent_rows else emb[:0]
-    idx_recent = faiss.IndexFlatIP(d)
-    if len(recent_rows) > 0:
-        idx_recent.add(emb_recent)
-    faiss.write_index(idx_recent, str(OUT_RECENT_INDEX))
+    # Only texts not already in the embedding cache are encoded (and the model or worker
+    # pool is only started if there are any).
+    encode = CorpusEncoder(MODEL_NAME, workers=workers)
 
-    OUT_RECENT_ROWS.write_text(json.dumps(recent_rows), encoding="utf-8")
+    # Collapse near-duplicates across both files, e.g. a Devpost entry and the GitHub repo it links.
+    sources = [Source(JSONL_PROJECTS, _legacy_row), Source(JSONL_DEVPOST, _devpost_row)]
+    input_id = ""
+    if dedup:
+        plan = plan_duplicates(sources, choose_text)
+        print(plan.summary())
+        plan.apply(sources)
+        input_id = "dedup:" + plan.fingerprint
 
-    print(f"All-time: {len(projects)} projects")
-    print(f"Recent (>= {cutoff.date()}): {len(recent_rows)} projects")
+    try:
+        summary = run_build(
+            sources,
+            out=OUT,
+            model_name=MODEL_NAME,
+            encode_fn=encode,
+            text_of=choose_text,
+            timestamp_of=row_timestamp,
+            index_spec=index_spec,
+            cache_path=cache_path,
+            full=full,
+            chunk_rows=chunk_rows,
+            restart=restart,
+            input_id=input_id,
+        )
+    finally:
+        encode.close()
+    print(encode.report())
+
+    print(f"All-time: {summary['rows']} projects ({summary['index']})")
+    print(f"Dated rows ({'/'.join(DATE_FIELDS)}): {summary['dated']} projects")
+    print(f"Neighbor candidates: {summary['good']} projects (app/quality.py)")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "--index-spec",
+        default="flat",
+        help='flat | hnsw:M=32,efSearch=64 | ivf:nlist=1024,nprobe=16 | ivfpq:nlist=1024,m=48,nprobe=32',
+    )
+    ap.add_argument("--cache", default=str(EMB_CACHE), help="embedding cache (SQLite) keyed by text hash")
+    ap.add_argument("--full", action="store_true", help="rebuild the index even if it could be appended to")
+    ap.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="records read, encoded and checkpointed at a time")
+    ap.add_argument("--restart", action="store_true", help="discard an interrupted build instead of resuming it")
+    ap.add_argument("--workers", type=int, default=1, help="encoder processes (0 = one per CPU core)")
+    ap.add_argument("--no-dedup", action="store_true", help="keep near-duplicate rows instead of collapsing them")
+    args = ap.parse_args()
+    main(index_spec=args.index_spec, cache_path=Path(args.cache), full=args.full,
+         chunk_rows=args.chunk_rows, restart=args.restart, workers=args.workers, dedup=not args.no_dedup)
\ No newline at end of file
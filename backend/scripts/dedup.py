@@ -0,0 +1,352 @@
+"""Near-duplicate detection for the index builders.
+
+Rows are grouped when they point at the same repository (their url/repo_url agree after
+normalization, which also joins a Devpost entry to the GitHub repo it links, across input
+files) or when the MinHash estimate of the Jaccard similarity of their embedded texts' word
+3-shingles is at least MIN_JACCARD. Each group is represented by its earliest row (kept, so
+an append-only rebuild keeps its prefix, and told how many rows were folded into it), and a
+row only joins a group by matching that representative: A ~ B and B ~ C put C with A only
+if C ~ A too, so a chain of pairwise matches can't merge distinct projects. Same-repo rows
+always stay together.
+
+Candidate pairs come from LSH banding: signatures are split into BANDS bands and rows that
+agree on a whole band are compared (sorting by each band key brings them next to each
+other), so no all-pairs pass is needed.
+
+The scan spills signatures and band keys to a temp directory next to the input and the
+grouping pass reads one band at a time with the signatures memory-mapped, so memory is a
+few integers per row plus the rows that get dropped.
+"""
+import hashlib
+import json
+import re
+import shutil
+import tempfile
+import zlib
+from array import array
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+MIN_SHINGLES = 8  # shorter texts ("Title: chat app") are too generic to call near-duplicates
+MIN_JACCARD = 0.7
+NUM_PERM = 64
+BANDS = 16  # of NUM_PERM // BANDS values; pairs at MIN_JACCARD share a band with p > 0.99
+BAND_WINDOW = 32  # neighbours compared within one band's sort order
+SPILL_ROWS = 4096  # signatures buffered before they are written out
+
+_WORD = re.compile(r"\w+")
+_rng = np.random.default_rng(20240101)
+_SEEDS = _rng.integers(0, np.iinfo(np.uint64).max, NUM_PERM, dtype=np.uint64, endpoint=True)
+_MIX = _rng.integers(1, 1 << 63, NUM_PERM // BANDS, dtype=np.uint64) | np.uint64(1)
+
+
+def _splitmix(x: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer (uint64 arithmetic wraps): one independent-looking hash per seed."""
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def minhash(text: str) -> Optional[np.ndarray]:
+    """NUM_PERM-value MinHash signature of the word 3-shingles; None when the text is too short."""
+    words = _WORD.findall(text.lower())
+    shingles = {" ".join(words[i: i + 3]) for i in range(max(0, len(words) - 2))}
+    if len(shingles) < MIN_SHINGLES:
+        return None
+    h = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+    mins = _splitmix(h[None, :] ^ _SEEDS[:, None]).min(axis=1)
+    return (mins >> np.uint64(32)).astype(np.uint32)
+
+
+def band_keys(sigs: np.ndarray) -> np.ndarray:
+    """(rows, BANDS) LSH keys; collisions of a mixed key only add candidates, which are all verified."""
+    cols = sigs.astype(np.uint64).reshape(len(sigs), BANDS, NUM_PERM // BANDS)
+    return (cols * _MIX).sum(axis=2)
+
+
+def canonical_url(url) -> Optional[str]:
+    """Comparable form of a project/repo URL; None for blanks and bare domains."""
+    if not isinstance(url, str) or not url.strip():
+        return None
+    u = url.strip().lower()
+    u = re.sub(r"^https?://(www\.)?", "", u)
+    u = re.sub(r"#.*$", "", u).rstrip("/")
+    if u.endswith(".git"):
+        u = u[:-4]
+    return u if "/" in u else None
+
+
+def _url_key(u: str) -> int:
+    return int.from_bytes(hashlib.blake2b(u.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class _Spill:
+    """Signatures (row-major) and one file of keys per band, written as the scan goes."""
+
+    def __init__(self, work: Path):
+        self.dir = Path(tempfile.mkdtemp(prefix="dedup-", dir=work))
+        self._sigs = (self.dir / "sigs.u32").open("wb")
+        self._bands = [(self.dir / f"band{b}.u64").open("wb") for b in range(BANDS)]
+        self._buf: List[np.ndarray] = []
+        self.rows = 0
+
+    def append(self, sig: np.ndarray) -> int:
+        """Queue one signature; returns its row in signatures()."""
+        self._buf.append(sig)
+        if len(self._buf) >= SPILL_ROWS:
+            self._flush()
+        return self.rows + len(self._buf) - 1
+
+    def _flush(self) -> None:
+        if not self._buf:
+            return
+        sigs = np.vstack(self._buf)
+        self._buf = []
+        self._sigs.write(sigs.tobytes())
+        keys = band_keys(sigs)
+        for b, f in enumerate(self._bands):
+            f.write(np.ascontiguousarray(keys[:, b]).tobytes())
+        self.rows += len(sigs)
+
+    def finish(self) -> None:
+        self._flush()
+        for f in (self._sigs, *self._bands):
+            f.close()
+
+    def signatures(self) -> np.ndarray:
+        if not self.rows:
+            return np.zeros((0, NUM_PERM), dtype=np.uint32)
+        return np.memmap(self.dir / "sigs.u32", dtype=np.uint32, mode="r", shape=(self.rows, NUM_PERM))
+
+    def band(self, b: int) -> np.ndarray:
+        return np.fromfile(self.dir / f"band{b}.u64", dtype=np.uint64)
+
+    def array(self, name: str, values: np.ndarray) -> np.ndarray:
+        """A writable memory-mapped copy of values, kept in the spill directory."""
+        out = np.memmap(self.dir / name, dtype=values.dtype, mode="w+", shape=values.shape)
+        out[:] = values
+        return out
+
+    def close(self) -> None:
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+
+class _UnionFind:
+    def __init__(self, n: int):
+        self.parent = np.arange(n, dtype=np.int64)
+
+    def roots(self) -> np.ndarray:
+        """Root of every element (compressing paths as it goes)."""
+        p = self.parent
+        while True:
+            pp = p[p]
+            if np.array_equal(pp, p):
+                return p
+            p = self.parent = pp
+
+    def union(self, a: int, b: int) -> None:
+        p = self.parent
+        while p[a] != a:
+            a = p[a]
+        while p[b] != b:
+            b = p[b]
+        if a != b:
+            # The earlier row stays the root, so it becomes the canonical row.
+            p[max(a, b)] = min(a, b)
+
+
+def same_repo(url_keys: np.ndarray, url_rows: np.ndarray, n: int) -> np.ndarray:
+    """Earliest row sharing a repository with each row (url_rows[i] has canonical URL hash url_keys[i]).
+
+    Joined transitively, which is right for identity: a Devpost entry whose url and
+    repo_url match two rows puts all three on the same repo.
+    """
+    uf = _UnionFind(n)
+    order = np.lexsort((url_rows, url_keys))
+    k, r = url_keys[order], url_rows[order]
+    same = np.flatnonzero(k[1:] == k[:-1])
+    for a, b in zip(r[same].tolist(), r[same + 1].tolist()):
+        uf.union(a, b)
+    return uf.roots()
+
+
+class _Groups:
+    """Rows grouped under a representative, the group's earliest row.
+
+    A group is made of repo units (rows with the same repo root, which move together);
+    a unit joins a group only if its repo root's signature matches the representative's.
+    """
+
+    def __init__(self, repo: np.ndarray, leader: np.ndarray, sigs: np.ndarray, sig_of: np.ndarray):
+        self.repo = repo
+        self.leader = leader  # row -> representative, initially its repo root
+        self.sigs = sigs
+        self.sig_of = sig_of  # row -> row of sigs, -1 when the text was too short to sign
+        self.members: Dict[int, List[int]] = {}  # representative -> the other rows of its group
+        for i in np.flatnonzero(repo != np.arange(len(repo))).tolist():
+            self.members.setdefault(int(repo[i]), []).append(i)
+
+    def similar(self, a: int, b: int) -> bool:
+        sa, sb = int(self.sig_of[a]), int(self.sig_of[b])
+        return sa >= 0 and sb >= 0 and float((self.sigs[sa] == self.sigs[sb]).mean()) >= MIN_JACCARD
+
+    def merge(self, a: int, b: int) -> bool:
+        """Move the later of a's and b's groups under the earlier representative, unit by unit.
+
+        Nothing moves unless the two representatives match. Units of the later group that
+        don't match the earlier representative form groups of their own again.
+        """
+        first, second = sorted((int(self.leader[a]), int(self.leader[b])))
+        if first == second or not self.similar(first, second):
+            return False
+        joined = self.members.setdefault(first, [])
+        moves: Dict[int, bool] = {}
+        for r in [second, *self.members.pop(second, [])]:
+            q = int(self.repo[r])
+            if q not in moves:
+                moves[q] = q == second or self.similar(q, first)
+            if moves[q]:
+                self.leader[r] = first
+                joined.append(r)
+            else:
+                self.leader[r] = q
+                if r != q:
+                    self.members.setdefault(q, []).append(r)
+        return True
+
+
+def link_near_duplicates(spill: _Spill, rows_of_sig: np.ndarray, groups: _Groups) -> int:
+    """Merge groups whose rows collide in a band and whose representatives match.
+
+    Candidates already in the same group are skipped before verification, so a large
+    cluster of copies costs about one comparison per row instead of one per pair.
+    Returns the number of merges.
+    """
+    sigs, sig_of = groups.sigs, groups.sig_of
+    linked = 0
+    for band in range(BANDS):
+        keys = spill.band(band)
+        order = np.argsort(keys, kind="stable")
+        k = keys[order]
+        del keys
+        for off in range(1, min(BAND_WINDOW, len(order) - 1) + 1):
+            cand = np.flatnonzero(k[:-off] == k[off:])
+            if not len(cand):
+                break  # equal keys are contiguous, so wider offsets can't match either
+            a, b = rows_of_sig[order[cand]], rows_of_sig[order[cand + off]]
+            la, lb = groups.leader[a], groups.leader[b]
+            apart = la != lb
+            a, b, la, lb = a[apart], b[apart], la[apart], lb[apart]
+            sa, sb = sig_of[la], sig_of[lb]
+            signed = (sa >= 0) & (sb >= 0)
+            a, b, sa, sb = a[signed], b[signed], sa[signed], sb[signed]
+            # Representatives as of this offset; merge() re-checks them as groups change.
+            similar = (sigs[sa] == sigs[sb]).mean(axis=1) >= MIN_JACCARD
+            for i, j in zip(a[similar].tolist(), b[similar].tolist()):
+                linked += groups.merge(i, j)
+    return linked
+
+
+class DedupPlan:
+    """Which input rows to drop, and the duplicate count of each kept row.
+
+    Rows are addressed by (source index, byte offset of their line), which is what the
+    streaming build sees; fingerprint identifies the plan so a resumed build can tell it
+    changed.
+    """
+
+    def __init__(self, dropped: Dict[Tuple[int, int], Tuple[int, int]], counts: Dict[Tuple[int, int], int], rows: int):
+        self.dropped = dropped  # (source, line offset) -> canonical (source, line offset)
+        self.counts = counts  # canonical (source, line offset) -> rows folded into it
+        self.rows = rows
+        digest = hashlib.sha256(json.dumps(sorted(dropped.items())).encode("ascii"))
+        self.fingerprint = digest.hexdigest()[:16]
+
+    def annotator(self, source: int) -> Callable[[int, dict], Optional[dict]]:
+        """Source.annotate for the source at this index."""
+        def annotate(offset: int, row: dict) -> Optional[dict]:
+            if (source, offset) in self.dropped:
+                return None
+            n = self.counts.get((source, offset))
+            if n:
+                row = dict(row, duplicates=n)
+            return row
+        return annotate
+
+    def apply(self, sources) -> None:
+        for i, src in enumerate(sources):
+            src.annotate = self.annotator(i)
+
+    def summary(self) -> str:
+        groups = len(self.counts)
+        return (
+            f"Dedup: {len(self.dropped)} of {self.rows} rows folded into {groups} canonical rows "
+            f"({self.rows - len(self.dropped)} kept)"
+        )
+
+
+def plan_duplicates(sources: Sequence, text_of: Callable[[dict], str],
+                    url_fields: Sequence[str] = ("url", "repo_url"), work_dir: Optional[Path] = None) -> DedupPlan:
+    """Scan the builder's sources once (the same rows it will read, in order) and group their duplicates.
+
+    sources are stream_build.Source objects; the spill directory goes under work_dir
+    (default: the first input's directory) and is removed afterwards.
+    """
+    present = [(si, Path(src.path)) for si, src in enumerate(sources) if Path(src.path).exists()]
+    if not present:
+        return DedupPlan({}, {}, 0)
+    spill = _Spill(Path(work_dir) if work_dir else present[0][1].parent)
+    try:
+        files, offsets = array("q"), array("q")
+        sig_of, rows_of_sig = array("q"), array("q")
+        url_keys, url_rows = array("Q"), array("q")
+        for si, path in present:
+            normalize = sources[si].normalize
+            pos = 0
+            with path.open("rb") as f:
+                for line in f:
+                    start, pos = pos, pos + len(line)
+                    if not line.strip():
+                        continue
+                    try:
+                        row = normalize(json.loads(line))
+                    except ValueError:
+                        continue
+                    if row is None:
+                        continue
+                    i = len(offsets)
+                    files.append(si)
+                    offsets.append(start)
+                    sig = minhash(text_of(row))
+                    if sig is None:
+                        sig_of.append(-1)
+                    else:
+                        sig_of.append(spill.append(sig))
+                        rows_of_sig.append(i)
+                    for field in url_fields:
+                        u = canonical_url(row.get(field))
+                        if u is not None:
+                            url_keys.append(_url_key(u))
+                            url_rows.append(i)
+        spill.finish()
+
+        n = len(offsets)
+        repo = spill.array("repo.i64", same_repo(np.array(url_keys, dtype=np.uint64), np.array(url_rows, dtype=np.int64), n))
+        groups = _Groups(repo, spill.array("leader.i64", repo), spill.signatures(),
+                         spill.array("sig_of.i64", np.array(sig_of, dtype=np.int64)))
+        del sig_of, url_keys, url_rows
+        link_near_duplicates(spill, np.array(rows_of_sig, dtype=np.int64), groups)
+
+        dropped: Dict[Tuple[int, int], Tuple[int, int]] = {}
+        counts: Dict[Tuple[int, int], int] = {}
+        for i in np.flatnonzero(groups.leader != np.arange(n)).tolist():
+            root = int(groups.leader[i])
+            canonical = (files[root], offsets[root])
+            dropped[(files[i], offsets[i])] = canonical
+            counts[canonical] = counts.get(canonical, 0) + 1
+        del groups, repo
+        return DedupPlan(dropped, counts, n)
+    finally:
+        spill.close()
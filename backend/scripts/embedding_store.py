@@ -0,0 +1,158 @@
+"""Persistent embedding cache and build manifest shared by the index builders.
+
+Vectors are keyed by a hash of (model name, embedded text), so a rebuild only encodes
+texts that are new or changed. The manifest records what the last build wrote, which
+lets a builder append the new rows to the existing index instead of rebuilding it.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import faiss
+
+from app.ann import add_chunked
+
+_SQL_CHUNK = 500  # stay well under SQLite's bound-parameter limit
+
+
+class EmbeddingStore:
+    """SQLite map of text-hash -> float32 vector for one embedding model."""
+
+    def __init__(self, path, model_name: str):
+        self.path = Path(path)
+        self.model_name = model_name
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path))
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, vec BLOB NOT NULL)")
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, text: str) -> str:
+        h = hashlib.sha256()
+        h.update(self.model_name.encode("utf-8"))
+        h.update(b"\0")
+        h.update(text.encode("utf-8"))
+        return h.hexdigest()[:32]
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        uniq = list(dict.fromkeys(keys))
+        for i in range(0, len(uniq), _SQL_CHUNK):
+            chunk = uniq[i: i + _SQL_CHUNK]
+            marks = ",".join("?" * len(chunk))
+            for k, blob in self._db.execute(f"SELECT key, vec FROM vectors WHERE key IN ({marks})", chunk):
+                found[k] = np.frombuffer(blob, dtype="float32")
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]) -> None:
+        self._db.executemany(
+            "INSERT OR REPLACE INTO vectors (key, vec) VALUES (?, ?)",
+            ((k, np.asarray(v, dtype="float32").tobytes()) for k, v in items.items()),
+        )
+        self._db.commit()
+
+    def encode(self, texts: List[str], encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """Vectors for texts in order; only unseen texts are passed to encode_fn."""
+        return self.submit(texts, encode_fn)()
+
+    def submit(self, texts: List[str], encode_fn: Callable[[List[str]], np.ndarray]) -> Callable[[], np.ndarray]:
+        """Start encode(texts); returns a function that waits for the vectors and caches them.
+
+        An encode_fn with a submit(texts) -> (() -> vectors) method (CorpusEncoder) keeps
+        encoding in the background meanwhile; any other is called right away.
+        """
+        keys = [self.key(t) for t in texts]
+        found = self.get_many(keys)
+
+        missing: Dict[str, str] = {}
+        for k, t in zip(keys, texts):
+            if k not in found and k not in missing:
+                missing[k] = t
+        self.hits += len(texts) - sum(1 for k in keys if k in missing)
+        self.misses += len(missing)
+
+        vecs, wait = None, None
+        if missing:
+            start = getattr(encode_fn, "submit", None)
+            if start is not None:
+                wait = start(list(missing.values()))
+            else:
+                vecs = encode_fn(list(missing.values()))
+
+        def result() -> np.ndarray:
+            if missing:
+                fresh = dict(zip(missing.keys(), np.asarray(wait() if wait is not None else vecs, dtype="float32")))
+                self.put_many(fresh)
+                found.update(fresh)
+            if not texts:
+                return np.zeros((0, 0), dtype="float32")
+            return np.vstack([found[k] for k in keys]).astype("float32", copy=False)
+
+        return result
+
+    def close(self) -> None:
+        self._db.close()
+
+
+def load_manifest(path) -> Optional[dict]:
+    p = Path(path)
+    if not p.exists():
+        return None
+    try:
+        return json.loads(p.read_text(encoding="utf-8"))
+    except ValueError:
+        return None
+
+
+def write_manifest(path, *, model_name: str, index_spec: str, rows: int, files: Sequence = (),
+                   quality_rules: Optional[int] = None) -> None:
+    """Record what was built; row keys are saved separately (row_keys.npy, dtype S32).
+
+    files are the build outputs; their sizes let the API reject a half-written build when
+    it hot-reloads. quality_rules is the app.quality.RULES_VERSION row_quality.npy was
+    computed with. Written to a temp file and renamed, so readers never see a partial one.
+    """
+    path = Path(path)
+    sizes = {os.path.relpath(f, path.parent): os.path.getsize(f) for f in map(Path, files)}
+    manifest = {"model": model_name, "index_spec": index_spec, "rows": int(rows), "files": sizes}
+    if quality_rules is not None:
+        manifest["quality_rules"] = int(quality_rules)
+    tmp = path.with_name(path.stem + ".tmp" + path.suffix)
+    tmp.write_text(json.dumps(manifest), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def appendable_rows(manifest: Optional[dict], row_keys_path, index_path, *, model_name: str,
+                    index_spec: str, keys: Sequence) -> int:
+    """Rows of the previous index that can be kept as-is (0 = rebuild from scratch).
+
+    The previous build must use the same model and index spec, and its rows must be an
+    unchanged prefix of the new corpus; new rows are then simply added to the index.
+    """
+    if not manifest or manifest.get("model") != model_name or manifest.get("index_spec") != index_spec:
+        return 0
+    if not Path(row_keys_path).exists() or not Path(index_path).exists():
+        return 0
+    old = np.load(row_keys_path, mmap_mode="r")
+    n_old = len(old)
+    if n_old == 0 or n_old > len(keys) or manifest.get("rows") != n_old:
+        return 0
+    if not np.array_equal(old, np.asarray(keys[:n_old], dtype="S32")):
+        return 0
+    return n_old
+
+
+def extend_or_build(emb: np.ndarray, n_keep: int, index_path, index_spec: str,
+                    build_fn: Callable[[np.ndarray, str], faiss.Index]) -> faiss.Index:
+    """Append emb[n_keep:] to the saved index when n_keep > 0, otherwise build a fresh one."""
+    if n_keep > 0:
+        index = faiss.read_index(str(index_path))
+        if index.ntotal == n_keep:
+            add_chunked(index, emb, start=n_keep)
+            return index
+    return build_fn(emb, index_spec)
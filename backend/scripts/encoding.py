@@ -0,0 +1,247 @@
+"""Corpus encoders for the index builders.
+
+CorpusEncoder(model, workers=1) encodes in-process, loading the model on first use.
+With workers > 1 it starts a pool of spawned processes, each with its own model and a
+pinned torch thread count (cores // workers), so workers don't oversubscribe the CPU; the
+parent then only loads the model's fast tokenizer, to measure lengths. submit() queues a
+call's batches and returns without waiting, so a caller that submits the next chunk before
+collecting this one (stream_build does) keeps every worker busy across chunk boundaries.
+
+Texts are bucketed by tokenized length: sorted longest first and packed into batches whose
+padded size (rows x longest row) stays under a token budget, so short search_text rows are
+encoded in large batches and never padded to a long Devpost description. Each batch is one
+forward pass; the vectors are scattered back to input order.
+"""
+import json
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional
+
+import numpy as np
+
+TOKEN_BUDGET = 8192  # padded tokens per forward pass
+MAX_BATCH = 64  # CPU throughput stops improving past this; larger sorted batches only add padding
+BASELINE_BATCH = 64  # fixed batch size of the file-order path, for the padding comparison
+DEFAULT_MAX_SEQ_LENGTH = 512  # for a model that records no input limit anywhere
+NO_LIMIT = 1_000_000  # transformers saves model_max_length = int(1e30) for "unlimited"
+
+_worker_model = None
+
+
+def _init_worker(model_name: str, threads: int) -> None:
+    global _worker_model
+    # Must be set before torch/tokenizers spin up their own thread pools.
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["MKL_NUM_THREADS"] = str(threads)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(threads)
+    _worker_model = SentenceTransformer(model_name, device="cpu")
+
+
+def _encode_batch(texts: List[str]) -> np.ndarray:
+    return _worker_model.encode(texts, batch_size=len(texts), show_progress_bar=False).astype("float32")
+
+
+def default_workers() -> int:
+    return os.cpu_count() or 1
+
+
+def _model_file(model_name: str, filename: str) -> Optional[str]:
+    """Local path of one of the model's files; None if the model has no such file."""
+    if os.path.isdir(model_name):
+        path = os.path.join(model_name, filename)
+        return path if os.path.exists(path) else None
+    from huggingface_hub import hf_hub_download
+    from huggingface_hub.utils import EntryNotFoundError
+
+    try:
+        return hf_hub_download(model_name, filename)
+    except EntryNotFoundError:
+        return None
+
+
+def _model_config(model_name: str, filename: str) -> dict:
+    path = _model_file(model_name, filename)
+    if path is None:
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def max_seq_length(model_name: str) -> int:
+    """Where SentenceTransformer truncates the model's input.
+
+    Its sentence_bert_config.json says, when there is one (newer ones may not); otherwise,
+    as SentenceTransformer does, the smaller of the tokenizer's and the model's limits.
+    """
+    n = _model_config(model_name, "sentence_bert_config.json").get("max_seq_length")
+    if n:
+        return int(n)
+    limits = [
+        _model_config(model_name, "tokenizer_config.json").get("model_max_length"),
+        _model_config(model_name, "config.json").get("max_position_embeddings"),
+    ]
+    limits = [int(x) for x in limits if x and x < NO_LIMIT]
+    return min(limits) if limits else DEFAULT_MAX_SEQ_LENGTH
+
+
+def load_length_tokenizer(model_name: str):
+    """The model's fast tokenizer, truncating at its max_seq_length, without loading the weights."""
+    from tokenizers import Tokenizer
+
+    path = _model_file(model_name, "tokenizer.json")
+    if path is None:
+        raise FileNotFoundError(f"{model_name} has no tokenizer.json")
+    tok = Tokenizer.from_file(path)
+    tok.enable_truncation(max_length=max_seq_length(model_name))
+    tok.no_padding()
+    return tok
+
+
+def plan_batches(lengths: np.ndarray, token_budget: int = TOKEN_BUDGET, max_batch: int = MAX_BATCH) -> List[np.ndarray]:
+    """Row indices per batch, longest rows first, each batch within token_budget padded tokens."""
+    order = np.argsort(-lengths, kind="stable")
+    batches: List[np.ndarray] = []
+    start = 0
+    while start < len(order):
+        longest = max(1, int(lengths[order[start]]))
+        size = max(1, min(max_batch, token_budget // longest))
+        batches.append(order[start: start + size])
+        start += size
+    return batches
+
+
+def padded_tokens(lengths: np.ndarray, batches: List[np.ndarray]) -> int:
+    return int(sum(len(b) * int(lengths[b].max()) for b in batches if len(b)))
+
+
+class CorpusEncoder:
+    """Callable texts -> float32 (n, d) array; see the module docstring."""
+
+    def __init__(self, model_name: str, workers: int = 1, token_budget: int = TOKEN_BUDGET,
+                 max_batch: int = MAX_BATCH):
+        self.model_name = model_name
+        self.workers = max(1, int(workers or default_workers()))
+        self.token_budget = token_budget
+        self.max_batch = max_batch
+        self._model = None
+        self._tokenizer = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._inflight = 0
+        self._busy_since = 0.0
+
+        self.texts = 0
+        self.tokens = 0
+        self.padded = 0
+        self.baseline_padded = 0
+        self.seconds = 0.0
+
+    def _local_model(self):
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+
+            self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    def _start_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            threads = max(1, default_workers() // self.workers)
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=mp.get_context("spawn"),  # fork + an initialized torch can deadlock
+                initializer=_init_worker,
+                initargs=(self.model_name, threads),
+            )
+            print(f"Encoding with {self.workers} worker processes x {threads} threads")
+        return self._pool
+
+    def token_lengths(self, texts: List[str]) -> np.ndarray:
+        if self.workers > 1 and self._tokenizer is None:
+            try:
+                self._tokenizer = load_length_tokenizer(self.model_name)
+            except Exception as e:  # e.g. a model without tokenizer.json
+                print(f"Tokenizing with the full model ({type(e).__name__}: {e})")
+                self._tokenizer = False
+        if self._tokenizer:
+            return np.fromiter((len(e.ids) for e in self._tokenizer.encode_batch(texts)), dtype=np.int64, count=len(texts))
+        model = self._local_model()
+        ids = model.tokenizer(
+            texts, truncation=True, max_length=model.max_seq_length,
+            return_attention_mask=False, return_token_type_ids=False,
+        )["input_ids"]
+        return np.fromiter((min(len(x), model.max_seq_length) for x in ids), dtype=np.int64, count=len(texts))
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        return self.submit(texts)()
+
+    def submit(self, texts: List[str]) -> Callable[[], np.ndarray]:
+        """Start encoding texts; returns a function that waits for their (n, d) vectors.
+
+        In-process encoding happens right here; with a pool every batch is queued at once.
+        """
+        lengths = self.token_lengths(texts)
+        batches = plan_batches(lengths, self.token_budget, self.max_batch)
+        parts = [[texts[i] for i in b] for b in batches]
+
+        fixed = [np.arange(i, min(i + BASELINE_BATCH, len(texts))) for i in range(0, len(texts), BASELINE_BATCH)]
+        self.texts += len(texts)
+        self.tokens += int(lengths.sum())
+        self.padded += padded_tokens(lengths, batches)
+        self.baseline_padded += padded_tokens(lengths, fixed)
+
+        t0 = time.perf_counter()
+        if self.workers == 1:
+            model = self._local_model()
+            done = [model.encode(p, batch_size=len(p), show_progress_bar=False) for p in parts]
+            self.seconds += time.perf_counter() - t0
+            futures = None
+        else:
+            pool = self._start_pool()
+            if not self._inflight:
+                self._busy_since = t0
+            self._inflight += 1
+            futures = [pool.submit(_encode_batch, p) for p in parts]
+            done = None
+
+        def result() -> np.ndarray:
+            vecs = done if futures is None else [f.result() for f in futures]
+            if futures is not None:
+                # Pool time is wall time while any call is in flight, so overlapping calls count once.
+                self._inflight -= 1
+                if not self._inflight:
+                    self.seconds += time.perf_counter() - self._busy_since
+            out = np.empty((len(texts), vecs[0].shape[1]), dtype="float32")
+            for rows, v in zip(batches, vecs):
+                out[rows] = v
+            return out
+
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "texts": self.texts,
+            "tokens": self.tokens,
+            "tokens_per_s": self.tokens / self.seconds if self.seconds else 0.0,
+            "padding_waste": 1.0 - self.tokens / self.padded if self.padded else 0.0,
+            "baseline_padding_waste": 1.0 - self.tokens / self.baseline_padded if self.baseline_padded else 0.0,
+        }
+
+    def report(self) -> str:
+        s = self.stats()
+        if not s["texts"]:
+            return "Encoder: nothing to encode"
+        return (
+            f"Encoder: {s['texts']} texts, {s['tokens']} tokens, {s['tokens_per_s']:.0f} tokens/s, "
+            f"padding waste {s['padding_waste']:.1%} (file-order batches of {BASELINE_BATCH}: "
+            f"{s['baseline_padding_waste']:.1%})"
+        )
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
@@ -0,0 +1,180 @@
+"""Export the embedding model to ONNX (optionally int8-quantized) and check parity.
+
+Writes data/onnx/: model.onnx, model.int8.onnx (with --quantize), tokenizer.json and
+embedder.json, which app/embedders.py reads when embed_backend="onnx". The parity check
+encodes sample corpus texts with both the SentenceTransformer and each ONNX model and
+reports the cosine drift; it exits non-zero if any text falls below --min-cosine.
+
+Example:
+    python scripts/export_onnx.py --quantize
+    # then set embed_backend="onnx" (embed_onnx_path picks model.onnx or model.int8.onnx)
+
+Needs torch, onnx and onnxruntime (the quantizer ships with onnxruntime):
+    pip install -r requirements-onnx.txt
+"""
+import argparse
+import inspect
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+from sentence_transformers import SentenceTransformer
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.embedders import OnnxEmbedder  # noqa: E402
+from app.meta import MetaTable  # noqa: E402
+
+DATA = Path("data")
+OUT_DIR = DATA / "onnx"
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+FP32_FILE = "model.onnx"
+INT8_FILE = "model.int8.onnx"
+
+_FALLBACK_TEXTS = [
+    "Estimate carbon emissions from grocery receipts",
+    "Nurse shift handoff summarizer",
+    "A chess robot arm guided by computer vision",
+    "Sign language captioning for live lectures",
+]
+
+
+def check_pipeline(model: SentenceTransformer) -> None:
+    """The ONNX runtime path re-implements mean pooling + normalize; refuse anything else."""
+    names = [type(m).__name__ for m in model]
+    mean = False
+    if names in (["Transformer", "Pooling"], ["Transformer", "Pooling", "Normalize"]):
+        cfg = model[1].get_config_dict()
+        # Newer sentence-transformers store pooling_mode="mean"; older ones a flag per mode.
+        mean = cfg.get("pooling_mode") == "mean" or (
+            cfg.get("pooling_mode_mean_tokens")
+            and not any(v for k, v in cfg.items() if k.startswith("pooling_mode_") and k != "pooling_mode_mean_tokens")
+        )
+    if not mean:
+        raise RuntimeError(f"Unsupported SentenceTransformer pipeline {names} (needs Transformer + mean Pooling)")
+
+
+def single_query_ms(encode, texts: list, repeats: int = 3) -> float:
+    """p50 latency of one-text encodes, the /check cache-miss path."""
+    times = []
+    for _ in range(repeats):
+        for t in texts[:100]:
+            t0 = time.perf_counter()
+            encode([t])
+            times.append((time.perf_counter() - t0) * 1000.0)
+    return float(np.percentile(times, 50))
+
+
+class _HiddenStates(torch.nn.Module):
+    """Keyword-only call into the HF model, returning last_hidden_state."""
+
+    def __init__(self, auto_model, input_names):
+        super().__init__()
+        self.auto_model = auto_model
+        self.input_names = input_names
+
+    def forward(self, *inputs):
+        return self.auto_model(**dict(zip(self.input_names, inputs))).last_hidden_state
+
+
+def export(model: SentenceTransformer, out: Path, opset: int) -> Path:
+    sample = model.tokenizer(["hello world"], return_tensors="pt")
+    input_names = [k for k in ("input_ids", "attention_mask", "token_type_ids") if k in sample]
+    transformer = _HiddenStates(model[0].auto_model.eval(), input_names)
+    axes = {k: {0: "batch", 1: "seq"} for k in input_names}
+    axes["last_hidden_state"] = {0: "batch", 1: "seq"}
+
+    # The TorchScript exporter takes dynamic_axes; torch >= 2.9 defaults to dynamo (onnxscript).
+    extra = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+    path = out / FP32_FILE
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[k] for k in input_names),
+            str(path),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=axes,
+            opset_version=opset,
+            **extra,
+        )
+    return path
+
+
+def quantize(src: Path, dst: Path) -> Path:
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(str(src), str(dst), weight_type=QuantType.QInt8)
+    return dst
+
+
+def sample_texts(n: int) -> list:
+    try:
+        table = MetaTable.open(str(DATA / "projects_meta.bin"), str(DATA / "projects_meta.offsets.npy"),
+                               str(DATA / "projects_meta.json"))
+    except FileNotFoundError:
+        return list(_FALLBACK_TEXTS)
+    step = max(1, len(table) // n)
+    return [table.row(i)["search_text"] for i in range(0, len(table), step)][:n] or list(_FALLBACK_TEXTS)
+
+
+def parity(reference: np.ndarray, vecs: np.ndarray) -> dict:
+    cos = np.sum(reference * vecs, axis=1)
+    return {
+        "mean_cosine": float(cos.mean()),
+        "min_cosine": float(cos.min()),
+        "p1_cosine": float(np.percentile(cos, 1)),
+        "max_drift": float(1.0 - cos.min()),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--model", default=MODEL_NAME)
+    ap.add_argument("--out", default=str(OUT_DIR))
+    ap.add_argument("--quantize", action="store_true", help=f"also write an int8 dynamic-quantized {INT8_FILE}")
+    ap.add_argument("--opset", type=int, default=14)
+    ap.add_argument("--samples", type=int, default=500, help="corpus texts used for the parity check")
+    ap.add_argument("--min-cosine", type=float, default=0.99)
+    args = ap.parse_args()
+
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+    model = SentenceTransformer(args.model, device="cpu")
+    check_pipeline(model)
+
+    fp32 = export(model, out, args.opset)
+    model.tokenizer.save_pretrained(str(out))  # writes tokenizer.json for the fast tokenizer
+    info = {
+        "model_name": args.model,
+        "max_seq_length": int(model.max_seq_length),
+        "pad_token": model.tokenizer.pad_token,
+        "pad_token_id": int(model.tokenizer.pad_token_id),
+        "dim": int(model.get_sentence_embedding_dimension()),
+        "fp32_file": FP32_FILE,
+        "int8_file": INT8_FILE if args.quantize else None,
+    }
+    (out / "embedder.json").write_text(json.dumps(info, indent=2), encoding="utf-8")
+    paths = [fp32] + ([quantize(fp32, out / INT8_FILE)] if args.quantize else [])
+
+    texts = sample_texts(args.samples)
+    reference = model.encode(texts, batch_size=64, normalize_embeddings=True).astype("float32")
+    print(f"torch: p50 single query {single_query_ms(model.encode, texts):.2f}ms")
+    ok = True
+    for path in paths:
+        embedder = OnnxEmbedder(str(path), args.model)
+        report = parity(reference, embedder.encode(texts))
+        ok = ok and report["min_cosine"] >= args.min_cosine
+        print(
+            f"{path.name}: {path.stat().st_size / 1e6:.1f}MB  mean cos={report['mean_cosine']:.6f} "
+            f"min={report['min_cosine']:.6f} p1={report['p1_cosine']:.6f} (n={len(texts)})  "
+            f"p50 single query {single_query_ms(embedder.encode, texts):.2f}ms"
+        )
+    if not ok:
+        sys.exit(f"Cosine drift above tolerance (min cosine < {args.min_cosine}); keep embed_backend='torch'")
+
+
+if __name__ == "__main__":
+    main()
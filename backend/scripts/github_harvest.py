@@ -1,17 +1,51 @@
-import os, time, json, base64, re, random
+"""Harvest hackathon repos from the GitHub search API into data/projects.jsonl.
+
+Months are scanned in order (resuming from data/harvest_state.json). Each search page is
+filtered without READMEs first; the READMEs it still needs are then fetched concurrently
+(--workers threads). Every request draws from a shared per-resource token bucket fed by the
+X-RateLimit-Remaining/Reset headers of earlier responses, so the harvester spends the whole
+hourly quota and only sleeps once it is used up (or GitHub asks it to back off).
+
+Responses are kept in data/http_cache.sqlite (harvest_cache.py) and revalidated with
+conditional requests, so re-scanning a month costs 304s; a README that comes back unchanged
+reuses its cleaned text and score instead of running clean_markdown/score_and_type again.
+
+With --graphql the READMEs a page needs are fetched in batched GraphQL queries
+(GRAPHQL_BATCH repos each, --graphql-url / GITHUB_GRAPHQL_URL) instead of one REST call
+per repo. GraphQL is POST-only, so there are no conditional requests, but the cleaned text
+and score are cached under the REST README's key all the same (matched by a digest of the
+text), so reclassify.py and either mode's next run reuse them.
+
+Ids already harvested are looked up in data/projects_seen.sqlite (harvest_cache.SeenIndex),
+which is updated with every append, instead of re-parsing projects.jsonl on each start.
+A harvested repo that shows up again with different metadata (stars, pushed_at, ...) is
+refreshed: its README is revalidated (a 304 unless it changed, reusing the cleaned text and
+score) and its record is replaced in projects.jsonl when the run ends.
+
+--api-url (or GITHUB_API_URL) points it at another server, e.g. a local stub for testing.
+"""
+import argparse
+import os, time, json, base64, hashlib, re, random, threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import date
 import requests
 from dotenv import load_dotenv
 from requests.exceptions import ReadTimeout, ConnectTimeout, ConnectionError
 
+from harvest_cache import HttpCache, SeenIndex
+
 load_dotenv()
 
 OUT = Path("data/projects.jsonl")
 OUT.parent.mkdir(parents=True, exist_ok=True)
 
 STATE = Path("data/harvest_state.json")
+HTTP_CACHE = Path("data/http_cache.sqlite")
+SEEN_INDEX = Path("data/projects_seen.sqlite")
 
+API_BASE = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+GRAPHQL_URL = os.getenv("GITHUB_GRAPHQL_URL", f"{API_BASE}/graphql")
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 HEADERS = {
     "Accept": "application/vnd.github+json",
@@ -34,15 +68,156 @@ GENERIC_TITLE = {
     "hackathon", "hackathons", "hackathon-project", "hackathon project", "project"
 }
 
+
+def _required_literal(pattern: str) -> str:
+    """Leading literal text every match of pattern contains ("" when there isn't a safe one)."""
+    body = pattern[2:] if pattern.startswith(r"\b") else pattern
+    depth = 0
+    for ch in body:
+        depth += (ch == "(") - (ch == ")")
+        if ch == "|" and depth == 0:
+            return ""  # top-level alternation: no single literal is required
+    lit = re.match(r"[\w ]*", body).group()
+    if len(lit) < len(body) and body[len(lit)] in "?*{":
+        lit = lit[:-1]  # the last character is optional
+    return lit
+
+
+class PatternSet:
+    """
+    Precompiled patterns with a literal screen: a pattern is only searched for when its
+    leading literal (e.g. "sponsor" for \bsponsors?\b) occurs in the text, which is a
+    plain substring test. Most README texts contain few of the words, so this skips most
+    regex scans; count() equals sum(1 for p in patterns if re.search(p, text)).
+    """
+
+    def __init__(self, patterns):
+        self.patterns = [(_required_literal(p), re.compile(p)) for p in patterns]
+
+    def count(self, text: str) -> int:
+        return sum(1 for lit, pat in self.patterns if lit in text and pat.search(text))
+
+
+_POS_README = PatternSet(POS_README)
+_NEG_PLATFORM = PatternSet(NEG_PLATFORM)
+_NEG_TEMPLATE = PatternSet(NEG_TEMPLATE)
+_NEG_LIST = PatternSet(NEG_LIST)
+
 # Throttling + scanning controls
 MAX_PAGES_PER_QUERY = 2
-SLEEP_BETWEEN_SEARCH_CALLS = 1.2
-SLEEP_BETWEEN_READMES = 0.6
+README_WORKERS = 8  # concurrent README fetches; GitHub asks clients to stay well under 100
+GRAPHQL_BATCH = 25  # repos per GraphQL query (each asks for every README_PATHS candidate)
+# GraphQL has no /readme lookup, so each query asks for the usual root README names.
+README_PATHS = ("README.md", "readme.md", "Readme.md", "README.markdown", "README.rst", "README.txt", "README")
 
 LOW_YIELD_MONTH_NEW_REPOS = 10
 LOW_YIELD_MONTH_STREAK_STOP = 6
 
-_BACKOFF = 0  # secondary rate-limit backoff
+
+class RateBudget:
+    """
+    Token bucket shared by all harvester threads, one bucket per GitHub rate-limit resource
+    ("core", "search", ...). Tokens are the X-RateLimit-Remaining GitHub last reported,
+    minus requests granted since; the bucket refills at X-RateLimit-Reset. A secondary-limit
+    backoff pauses every thread, not just the one that hit it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}  # resource -> {"remaining": int | None, "reset": int}
+        self._pause_until = 0.0
+        self.backoff = 0
+        self.requests = 0
+        self.waited_s = 0.0
+
+    @staticmethod
+    def resource_for(url: str) -> str:
+        if url.rstrip("/").endswith("graphql"):
+            return "graphql"
+        return "search" if "/search/" in url else "core"
+
+    def acquire(self, resource: str) -> None:
+        while True:
+            with self._lock:
+                now = time.time()
+                b = self._buckets.setdefault(resource, {"remaining": None, "reset": 0})
+                if b["remaining"] == 0 and now >= b["reset"]:
+                    b["remaining"] = None  # new window; the next response tells us its size
+                wait = self._pause_until - now
+                if wait <= 0 and b["remaining"] != 0:
+                    if b["remaining"] is not None:
+                        b["remaining"] -= 1
+                    self.requests += 1
+                    return
+                if wait <= 0:
+                    wait = b["reset"] - now + 1
+                    print(f"[rate-limit] {resource} budget spent; sleeping {wait:.0f}s until reset ...")
+                self.waited_s += wait
+            time.sleep(wait)
+
+    def update(self, resource: str, headers) -> None:
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+        if remaining is None or reset is None:
+            return
+        resource = headers.get("X-RateLimit-Resource", resource)
+        remaining, reset = int(remaining), int(reset)
+        with self._lock:
+            b = self._buckets.setdefault(resource, {"remaining": None, "reset": 0})
+            if reset > b["reset"] or b["remaining"] is None:
+                b["reset"], b["remaining"] = reset, remaining
+            elif reset == b["reset"]:
+                # Responses arrive out of order; the lowest count is the freshest.
+                b["remaining"] = min(b["remaining"], remaining)
+
+    def exhaust(self, resource: str, reset: int) -> None:
+        with self._lock:
+            b = self._buckets.setdefault(resource, {"remaining": None, "reset": 0})
+            b["remaining"], b["reset"] = 0, max(b["reset"], reset)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._pause_until = max(self._pause_until, time.time() + seconds)
+
+    def refund(self, resource: str) -> None:
+        """Return a token; 304 Not Modified responses don't count against the limit."""
+        with self._lock:
+            b = self._buckets.get(resource)
+            if b is not None and b["remaining"] is not None:
+                b["remaining"] += 1
+            self.requests -= 1
+
+    def escalate(self, retry_after: bool = False) -> int:
+        """Grow the secondary-limit backoff (at least 15s once GitHub sent Retry-After)."""
+        with self._lock:
+            if retry_after:
+                self.backoff = min(120, max(self.backoff, 15))
+            else:
+                self.backoff = 15 if self.backoff == 0 else min(120, int(self.backoff * 1.8))
+            return self.backoff
+
+    def clear_backoff(self) -> None:
+        with self._lock:
+            self.backoff = 0
+
+    def summary(self) -> str:
+        with self._lock:
+            left = ", ".join(f"{k}={v['remaining']}" for k, v in sorted(self._buckets.items()))
+        return f"{self.requests} requests, {self.waited_s:.0f} thread-seconds waiting on rate limits (remaining: {left or 'unknown'})"
+
+
+BUDGET = RateBudget()
+CACHE = None  # HttpCache, opened by main() unless --no-cache
+_local = threading.local()
+
+
+def _session() -> requests.Session:
+    """One keep-alive session per thread (requests.Session is not thread-safe)."""
+    s = getattr(_local, "session", None)
+    if s is None:
+        s = _local.session = requests.Session()
+        s.headers.update(HEADERS)
+    return s
 
 
 def load_state():
@@ -63,50 +238,53 @@ def save_state(next_year: int, next_month: int):
     STATE.write_text(json.dumps({"last_year": next_year, "last_month": next_month}), encoding="utf-8")
 
 
-def gh_get(url, params=None, *, timeout=45, max_retries=6):
+def _send(method, url, *, timeout, max_retries, **kwargs) -> requests.Response:
     """
-    GitHub GET with:
+    One GitHub request with:
+      - a shared rate budget (waits for a token before sending)
       - network retry (timeouts, connection reset)
-      - primary rate limit (remaining==0 -> sleep to reset)
-      - secondary rate limit (retry-after or exponential backoff)
+      - primary rate limit (remaining==0 -> all threads wait for reset)
+      - secondary rate limit (retry-after or exponential backoff, paused for all threads)
       - 5xx retries
+    Returns the first response that isn't one of those; callers check its status.
     """
-    global _BACKOFF
+    resource = RateBudget.resource_for(url)
 
     for attempt in range(1, max_retries + 1):
+        BUDGET.acquire(resource)
         try:
-            r = requests.get(url, headers=HEADERS, params=params, timeout=timeout)
+            r = _session().request(method, url, timeout=timeout, **kwargs)
         except (ReadTimeout, ConnectTimeout, ConnectionError) as e:
             sleep_s = min(120, int(2 ** attempt)) + random.randint(0, 5)
             print(f"[net] {type(e).__name__} attempt {attempt}/{max_retries}; sleeping {sleep_s}s ...")
             time.sleep(sleep_s)
             continue
 
+        BUDGET.update(resource, r.headers)
+
         if r.status_code in (403, 429):
             remaining = r.headers.get("X-RateLimit-Remaining")
             reset = r.headers.get("X-RateLimit-Reset")
             retry_after = r.headers.get("Retry-After")
 
-            # Primary rate limit
+            # Primary rate limit: the next acquire() sleeps until reset
             if remaining == "0" and reset:
-                sleep_s = max(5, int(reset) - int(time.time()) + 2)
-                print(f"[rate-limit] remaining=0; sleeping {sleep_s}s ...")
-                time.sleep(sleep_s)
-                _BACKOFF = 0
+                BUDGET.exhaust(r.headers.get("X-RateLimit-Resource", resource), int(reset))
+                BUDGET.clear_backoff()
                 continue
 
             # Secondary limit
             if retry_after:
                 sleep_s = int(retry_after) + random.randint(0, 3)
-                print(f"[secondary-limit] retry-after={retry_after}; sleeping {sleep_s}s ...")
-                time.sleep(sleep_s)
-                _BACKOFF = min(120, max(_BACKOFF, 15))
+                print(f"[secondary-limit] retry-after={retry_after}; pausing {sleep_s}s ...")
+                BUDGET.pause(sleep_s)
+                BUDGET.escalate(retry_after=True)
                 continue
 
-            _BACKOFF = 15 if _BACKOFF == 0 else min(120, int(_BACKOFF * 1.8))
-            sleep_s = _BACKOFF + random.randint(0, 6)
-            print(f"[secondary-limit] sleeping {sleep_s}s (backoff={_BACKOFF}) ...")
-            time.sleep(sleep_s)
+            backoff = BUDGET.escalate()
+            sleep_s = backoff + random.randint(0, 6)
+            print(f"[secondary-limit] pausing {sleep_s}s (backoff={backoff}) ...")
+            BUDGET.pause(sleep_s)
             continue
 
         # Retry transient server errors
@@ -116,16 +294,62 @@ def gh_get(url, params=None, *, timeout=45, max_retries=6):
             time.sleep(sleep_s)
             continue
 
-        r.raise_for_status()
-        _BACKOFF = 0
-        return r.json(), r.headers
+        return r
 
     raise RuntimeError(f"Failed to fetch {url} after {max_retries} retries")
 
 
+def gh_get(url, params=None, *, timeout=45, max_retries=6):
+    """
+    GitHub GET through _send, with conditional requests against CACHE (304 -> cached body).
+
+    Returns (data, headers, changed); changed is False when the cached body was reused.
+    """
+    key = HttpCache.key(url, params)
+    cached = CACHE.get(key) if CACHE is not None else None
+    conditional = CACHE.conditional_headers(cached) if cached is not None else {}
+
+    r = _send("GET", url, params=params, headers=conditional, timeout=timeout, max_retries=max_retries)
+    if r.status_code == 304 and cached is not None:
+        BUDGET.refund(RateBudget.resource_for(url))
+        BUDGET.clear_backoff()
+        CACHE.touch(key)
+        return json.loads(cached.body), r.headers, False
+
+    r.raise_for_status()
+    BUDGET.clear_backoff()
+    etag, last_modified = r.headers.get("ETag"), r.headers.get("Last-Modified")
+    if CACHE is not None and (etag or last_modified):
+        CACHE.put(key, etag, last_modified, r.content)
+    return r.json(), r.headers, True
+
+
+def gh_graphql(query, *, timeout=60, max_retries=6):
+    """
+    POST a GraphQL query through _send; returns its "data". Errors for individual fields
+    (e.g. a repo that was deleted) leave those fields null; a RATE_LIMITED error waits
+    for the graphql budget to reset and retries.
+    """
+    for _ in range(max_retries):
+        r = _send("POST", GRAPHQL_URL, json={"query": query}, timeout=timeout, max_retries=max_retries)
+        r.raise_for_status()
+        body = r.json()
+        errors = body.get("errors") or []
+        if any(e.get("type") == "RATE_LIMITED" for e in errors):
+            reset = int(r.headers.get("X-RateLimit-Reset", time.time() + 60))
+            BUDGET.exhaust("graphql", reset)
+            continue
+        if body.get("data") is None:
+            raise RuntimeError(f"GraphQL query failed: {errors[:1]}")
+        BUDGET.clear_backoff()
+        return body["data"]
+
+    raise RuntimeError(f"GraphQL query still rate limited after {max_retries} attempts")
+
+
 def search_repos(query, page=1, per_page=100):
-    url = "https://api.github.com/search/repositories"
-    data, _ = gh_get(
+    url = f"{API_BASE}/search/repositories"
+    data, _, _ = gh_get(
         url,
         params={"q": query, "sort": "updated", "order": "desc", "page": page, "per_page": per_page},
         timeout=60,
@@ -133,34 +357,93 @@ def search_repos(query, page=1, per_page=100):
     return data.get("items", [])
 
 
+def readme_url(owner, repo):
+    return f"{API_BASE}/repos/{owner}/{repo}/readme"
+
+
 def get_readme(owner, repo):
-    url = f"https://api.github.com/repos/{owner}/{repo}/readme"
+    """(README text, changed); changed is False when the cached copy was still current, None on failure."""
     try:
-        data, _ = gh_get(url, timeout=45)
-        content = data.get("content", "")
-        if content:
-            return base64.b64decode(content).decode("utf-8", errors="ignore")
+        data, _, changed = gh_get(readme_url(owner, repo), timeout=45)
     except Exception:
-        return ""
-    return ""
+        return "", None
+    content = data.get("content", "")
+    if content:
+        return base64.b64decode(content).decode("utf-8", errors="ignore"), changed
+    return "", changed
+
+
+def graphql_readmes(full_names) -> dict:
+    """README text for up to GRAPHQL_BATCH "owner/repo" names in one GraphQL query ("" if none found, None if the query failed)."""
+    files = " ".join(f'f{j}: object(expression: "HEAD:{p}") {{ ... on Blob {{ text }} }}' for j, p in enumerate(README_PATHS))
+    fields = []
+    for i, full in enumerate(full_names):
+        owner, repo = full.split("/", 1)
+        fields.append(f"r{i}: repository(owner: {json.dumps(owner)}, name: {json.dumps(repo)}) {{ {files} }}")
+    try:
+        data = gh_graphql("query { " + " ".join(fields) + " }")
+    except Exception as e:
+        print(f"[graphql] batch of {len(full_names)} failed ({e}); leaving their READMEs empty")
+        return {full: None for full in full_names}
+
+    out = {}
+    for i, full in enumerate(full_names):
+        node = data.get(f"r{i}") or {}
+        blobs = (node.get(f"f{j}") or {} for j in range(len(README_PATHS)))
+        out[full] = next((b["text"] for b in blobs if b.get("text")), "")
+    return out
+
+
+def readme_digest(readme: str) -> str:
+    return hashlib.sha256(readme.encode("utf-8")).hexdigest()[:32]
+
+
+def readme_fields(owner, repo, title, desc, topics, readme=None):
+    """
+    (readme_clean, submission_score, type_label) for a repo whose README is worth fetching.
+    An unchanged README reuses the cleaned text cached with it, and its score too unless
+    the title/description/topics moved. readme is the text when it was already fetched
+    (graphql_readmes); it is cached under the REST README's key all the same, so either
+    path reuses what the other derived.
+    """
+    key = HttpCache.key(readme_url(owner, repo))
+    if readme is None:
+        readme, changed = get_readme(owner, repo)
+        derived = CACHE.derived(key) if CACHE is not None and changed is False else None
+    else:
+        changed = True
+        derived = CACHE.derived(key, readme_digest(readme)) if CACHE is not None else None
+    if derived is None:
+        derived = {"clean": clean_markdown(readme), "digest": readme_digest(readme)}
+
+    inputs = [title, desc, topics]
+    if derived.get("inputs") != inputs:
+        derived["score"], derived["type"] = score_and_type(title, desc, derived["clean"], topics)
+        derived["inputs"] = inputs
+        if CACHE is not None and changed is not None:
+            CACHE.set_derived(key, derived)
+    return derived["clean"], derived["score"], derived["type"]
+
+
+_MARKDOWN_RULES = [
+    (re.compile(r"```.*?```", flags=re.S), " "),          # fenced code blocks
+    (re.compile(r"`[^`]+`"), " "),                        # inline code
+    (re.compile(r"!\[[^\]]*\]\([^\)]*\)"), " "),          # images: ![alt](url)
+    (re.compile(r"\[([^\]]+)\]\([^\)]*\)"), r"\1"),       # links: [text](url) -> text
+    (re.compile(r"<[^>]+>"), " "),                        # html tags
+    (re.compile(r"^#{1,6}\s*", flags=re.M), ""),          # headings
+    (re.compile(r"^\s*[-*>]\s+", flags=re.M), ""),        # bullets/quotes
+    (re.compile(r"\s+"), " "),
+]
 
 
 def clean_markdown(md: str) -> str:
     """Remove README boilerplate that hurts embedding quality."""
     if not md:
         return ""
-    md = re.sub(r"```.*?```", " ", md, flags=re.S)            # fenced code blocks
-    md = re.sub(r"`[^`]+`", " ", md)                          # inline code
-# Remove images: ![alt](url)
-    md = re.sub(r"!\[[^\]]*\]\([^\)]*\)", " ", md)
-
-# Replace links: [text](url) -> text
-    md = re.sub(r"\[([^\]]+)\]\([^\)]*\)", r"\1", md)
-    md = re.sub(r"<[^>]+>", " ", md)                          # html tags
-    md = re.sub(r"^#{1,6}\s*", "", md, flags=re.M)            # headings
-    md = re.sub(r"^\s*[-*>]\s+", "", md, flags=re.M)          # bullets/quotes
-    md = re.sub(r"\s+", " ", md).strip()
-    return md
+    for pat, repl in _MARKDOWN_RULES:
+        md = pat.sub(repl, md)
+    return md.strip()
 
 
 def build_search_text(title: str, desc: str, topics: list[str]) -> str:
@@ -194,18 +477,16 @@ def score_and_type(title: str, desc: str, readme_clean: str, topics: list[str])
 
     score = 0.0
 
-    for pat in POS_README:
-        if re.search(pat, text):
-            score += 1.0
+    score += float(_POS_README.count(text))
 
     if any(k in text for k in ["frontend", "backend", "react", "fastapi", "flask", "django", "nextjs", "api", "mobile", "ios", "android"]):
         score += 0.5
     if any(k in text for k in ["features", "how it works", "architecture", "pipeline"]):
         score += 0.5
 
-    platform_hits = sum(1 for pat in NEG_PLATFORM if re.search(pat, text))
-    template_hits = sum(1 for pat in NEG_TEMPLATE if re.search(pat, text))
-    list_hits = sum(1 for pat in NEG_LIST if re.search(pat, text))
+    platform_hits = _NEG_PLATFORM.count(text)
+    template_hits = _NEG_TEMPLATE.count(text)
+    list_hits = _NEG_LIST.count(text)
 
     if t in GENERIC_TITLE:
         score -= 1.5
@@ -239,34 +520,148 @@ def month_range(start_year: int, start_month: int, end_year: int, end_month: int
             y += 1
 
 
-def load_seen_ids():
-    seen = set()
-    if not OUT.exists():
-        return seen
-    with OUT.open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                obj = json.loads(line)
-                rid = obj.get("id")
-                if rid:
-                    seen.add(rid)
-            except Exception:
-                continue
+def record_fingerprint(rec: dict) -> str:
+    """Hash of the search metadata a record was built from; differs once a repo gains stars, pushes, etc."""
+    fields = [rec.get("title") or "", rec.get("description") or "", rec.get("tags") or [],
+              rec.get("stars") or 0, rec.get("pushed_at")]
+    return hashlib.sha256(json.dumps(fields, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+
+def item_fingerprint(it: dict) -> str:
+    return record_fingerprint({
+        "title": it.get("name"), "description": it.get("description"), "tags": it.get("topics"),
+        "stars": it.get("stargazers_count"), "pushed_at": it.get("pushed_at"),
+    })
+
+
+def load_seen_ids() -> SeenIndex:
+    seen = SeenIndex(SEEN_INDEX, OUT, record_fingerprint)
+    if seen.synced:
+        print(f"[seen] indexed {seen.synced} records from {OUT}")
     return seen
 
 
+def update_records(seen_ids: SeenIndex, records: dict) -> None:
+    """
+    Replace the OUT lines of already-harvested ids with records (id -> record), then store
+    their new fingerprints. Like reclassify.py, the file is rewritten to a temp file and
+    renamed over OUT; other lines are copied byte-for-byte.
+    """
+    tmp = OUT.with_name(OUT.name + ".tmp")
+    with OUT.open("rb") as src, tmp.open("wb") as dst:
+        for line in src:
+            try:
+                rid = json.loads(line).get("id")
+            except ValueError:
+                rid = None
+            rec = records.get(rid)
+            dst.write(line if rec is None else (json.dumps(rec, ensure_ascii=False) + "\n").encode("utf-8"))
+        dst.flush()
+        os.fsync(dst.fileno())
+    os.replace(tmp, OUT)
+    for rid, rec in records.items():
+        seen_ids.add(rid, record_fingerprint(rec))
+    seen_ids.commit()
+
+
+def wants_readme(it: dict, readme_stars_min: int) -> bool:
+    """Pre-score a search item without its README to decide whether to fetch it."""
+    topics = it.get("topics") or []
+    pre_score, pre_type = score_and_type(it.get("name", "") or "", it.get("description") or "", "", topics)
+    return it.get("stargazers_count", 0) >= readme_stars_min and pre_type == "project" and pre_score >= 1.0
+
+
+def page_candidates(items, seen_ids: SeenIndex, readme_stars_min: int, limit: int, refreshing=()):
+    """
+    Repos from one search page worth processing, in page order: new, non-fork repos that
+    pass the length check (at most `limit`), and already-harvested repos to refresh. The
+    stored fingerprint decides the latter: only repos whose metadata is unchanged are
+    skipped (as are ids in `refreshing`, already queued); refreshes skip the new-repo
+    filters, since their old record is in the corpus either way, and don't count against
+    `limit`. Each notes whether its README is worth fetching.
+    """
+    picked, refresh = [], []
+    page_ids = set()
+    for it in items:
+        full = it["full_name"]
+        rid = f"github:{full}"
+
+        if rid in page_ids or rid in refreshing:
+            continue
+        if rid in seen_ids:
+            if seen_ids.changed(rid, item_fingerprint(it)):
+                refresh.append((it, wants_readme(it, readme_stars_min)))
+                page_ids.add(rid)
+            continue
+        if len(picked) >= limit:
+            continue
+        if it.get("fork") or it.get("archived"):
+            continue
+
+        # search_text doesn't depend on the README, so short rows are dropped before fetching it
+        if len(build_search_text(it.get("name", "") or "", it.get("description") or "", it.get("topics") or [])) < 60:
+            continue
+
+        picked.append((it, wants_readme(it, readme_stars_min)))
+        page_ids.add(rid)
+    return picked, refresh
+
+
+def make_record(candidate, readmes=None) -> dict:
+    """readmes maps full_name -> README text prefetched with graphql_readmes; None fetches over REST."""
+    it, wants_readme = candidate
+    topics = it.get("topics") or []
+    title = it.get("name", "") or ""
+    desc = it.get("description") or ""
+
+    prefetched = readmes.get(it["full_name"], "") if readmes is not None else None
+    if wants_readme and readmes is not None and prefetched is None:
+        readme_clean = ""  # its GraphQL batch failed; nothing worth caching
+        submission_score, type_label = score_and_type(title, desc, readme_clean, topics)
+    elif wants_readme:
+        owner, repo = it["full_name"].split("/", 1)
+        readme_clean, submission_score, type_label = readme_fields(owner, repo, title, desc, topics, prefetched)
+    else:
+        readme_clean = ""
+        submission_score, type_label = score_and_type(title, desc, readme_clean, topics)
+
+    search_text = build_search_text(title, desc, topics)
+    explain_text = build_explain_text(title, desc, topics, readme_clean)
+
+    return {
+        "id": f"github:{it['full_name']}",
+        "source": "github",
+        "title": title,
+        "description": desc,
+        "tags": topics,
+        "url": it.get("html_url"),
+        "created_at": it.get("created_at"),
+        "pushed_at": it.get("pushed_at"),
+        "stars": it.get("stargazers_count", 0),
+        "language": it.get("language"),
+        "submission_score": submission_score,
+        "type_label": type_label,
+        "search_text": search_text,
+        "text": explain_text,
+        "explain_text": explain_text,
+    }
+
+
 def main(
     target_new: int = 15000,
     end_year: int = 2026,
     end_month: int = 1,
     stars_min: int = 0,
     readme_stars_min: int = 10,
+    workers: int = README_WORKERS,
+    cache: bool = True,
+    graphql: bool = False,
 ):
+    global CACHE
     if not GITHUB_TOKEN:
         print("Warning: GITHUB_TOKEN not set. You will hit rate limits quickly.")
+        if graphql:
+            print("Warning: GitHub's GraphQL API requires a token.")
 
     base_queries = [
         f"topic:hackathon stars:>={stars_min}",
@@ -286,116 +681,113 @@ def main(
 
     new_count = 0
     low_yield_streak = 0
+    t0 = time.perf_counter()
+    CACHE = HttpCache(HTTP_CACHE) if cache else None
 
-    with OUT.open("a", encoding="utf-8") as out:
-        for (y, m, d1, d2) in month_range(start_year, start_month, end_year, end_month):
-            month_new = 0
-
-            for base in base_queries:
-                q = f"{base} created:{d1}..{d2}"
-                page = 1
-
-                while new_count < target_new and page <= MAX_PAGES_PER_QUERY:
-                    items = search_repos(q, page=page, per_page=100)
-                    time.sleep(SLEEP_BETWEEN_SEARCH_CALLS)
-
-                    if not items:
-                        break
-
-                    for it in items:
-                        full = it["full_name"]
-                        rid = f"github:{full}"
-
-                        if rid in seen_ids:
-                            continue
-                        if it.get("fork") or it.get("archived"):
-                            continue
-
-                        owner, repo = full.split("/", 1)
-                        topics = it.get("topics") or []
-                        stars = it.get("stargazers_count", 0)
-                        lang = it.get("language")
-
-                        title = it.get("name", "") or ""
-                        desc = it.get("description") or ""
-
-                        # Pre-score without README to decide whether to fetch it
-                        pre_score, pre_type = score_and_type(title, desc, "", topics)
-
-                        readme = ""
-                        if stars >= readme_stars_min and pre_type == "project" and pre_score >= 1.0:
-                            readme = get_readme(owner, repo)
-                            time.sleep(SLEEP_BETWEEN_READMES)
-
-                        readme_clean = clean_markdown(readme)
-                        submission_score, type_label = score_and_type(title, desc, readme_clean, topics)
-
-                        search_text = build_search_text(title, desc, topics)
-                        explain_text = build_explain_text(title, desc, topics, readme_clean)
-
-                        if len(search_text) < 60:
-                            continue
-
-                        rec = {
-                            "id": rid,
-                            "source": "github",
-                            "title": title,
-                            "description": desc,
-                            "tags": topics,
-                            "url": it.get("html_url"),
-                            "created_at": it.get("created_at"),
-                            "pushed_at": it.get("pushed_at"),
-                            "stars": stars,
-                            "language": lang,
-                            "submission_score": submission_score,
-                            "type_label": type_label,
-                            "search_text": search_text,
-                            "text": explain_text,
-                            "explain_text": explain_text,
-                        }
-
-                        out.write(json.dumps(rec, ensure_ascii=False) + "\n")
-                        seen_ids.add(rid)
-                        new_count += 1
-                        month_new += 1
-
-                        if new_count % 200 == 0:
-                            print(f"[progress] added {new_count} new repos (total now {len(seen_ids)})")
+    # id -> updated record of an already-harvested repo. They are written over the old lines
+    # once, at the end of the run (or when it's interrupted, since the months are already saved
+    # as done), rather than rewriting projects.jsonl after every month.
+    refreshed = {}
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            for (y, m, d1, d2) in month_range(start_year, start_month, end_year, end_month):
+                month_new = 0
+                month_refreshed = len(refreshed)
+
+                with OUT.open("a", encoding="utf-8") as out:
+                    for base in base_queries:
+                        q = f"{base} created:{d1}..{d2}"
+                        page = 1
+
+                        while new_count < target_new and page <= MAX_PAGES_PER_QUERY:
+                            items = search_repos(q, page=page, per_page=100)
+
+                            if not items:
+                                break
+
+                            picked, refresh = page_candidates(
+                                items, seen_ids, readme_stars_min, target_new - new_count, refreshing=refreshed
+                            )
+                            readmes = None
+                            if graphql:
+                                names = [it["full_name"] for it, wants in picked + refresh if wants]
+                                batches = [names[i: i + GRAPHQL_BATCH] for i in range(0, len(names), GRAPHQL_BATCH)]
+                                readmes = {}
+                                for found in pool.map(graphql_readmes, batches):
+                                    readmes.update(found)
+
+                            # READMEs are fetched concurrently; records are still written in page order.
+                            for i, rec in enumerate(pool.map(lambda c: make_record(c, readmes), picked + refresh)):
+                                if i >= len(picked):
+                                    refreshed[rec["id"]] = rec
+                                    continue
+                                out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                                seen_ids.add(rec["id"], record_fingerprint(rec))
+                                new_count += 1
+                                month_new += 1
+
+                                if new_count % 200 == 0:
+                                    print(f"[progress] added {new_count} new repos (total now {len(seen_ids)})")
+
+                            out.flush()
+                            seen_ids.commit()
+                            page += 1
 
                         if new_count >= target_new:
                             break
 
-                    page += 1
+                # Save progress AFTER finishing a month: next run starts at next month
+                ny, nm = y, m + 1
+                if nm == 13:
+                    nm = 1
+                    ny += 1
+                save_state(ny, nm)
+
+                print(
+                    f"[month] {y}-{m:02d}: added {month_new} repos (total new={new_count}); "
+                    f"refreshed {len(refreshed) - month_refreshed} already-harvested repos that changed since"
+                )
+
+                # Low-yield streak is only meaningful in recent years
+                if month_new <= LOW_YIELD_MONTH_NEW_REPOS:
+                    low_yield_streak += 1
+                else:
+                    low_yield_streak = 0
+
+                if y >= 2024 and low_yield_streak >= LOW_YIELD_MONTH_STREAK_STOP:
+                    print(f"[stop] low-yield streak={low_yield_streak} in {y}. Stopping early to save rate limit.")
+                    break
 
                 if new_count >= target_new:
                     break
-
-            # Save progress AFTER finishing a month: next run starts at next month
-            ny, nm = y, m + 1
-            if nm == 13:
-                nm = 1
-                ny += 1
-            save_state(ny, nm)
-
-            print(f"[month] {y}-{m:02d}: added {month_new} repos (total new={new_count})")
-
-            # Low-yield streak is only meaningful in recent years
-            if month_new <= LOW_YIELD_MONTH_NEW_REPOS:
-                low_yield_streak += 1
-            else:
-                low_yield_streak = 0
-
-            if y >= 2024 and low_yield_streak >= LOW_YIELD_MONTH_STREAK_STOP:
-                print(f"[stop] low-yield streak={low_yield_streak} in {y}. Stopping early to save rate limit.")
-                break
-
-            if new_count >= target_new:
-                break
-
-    print(f"Added {new_count} new repos. Total records now: {len(seen_ids)}")
+    finally:
+        if refreshed:
+            update_records(seen_ids, refreshed)
+
+    elapsed = time.perf_counter() - t0
+    print(f"Added {new_count} new repos and refreshed {len(refreshed)} in {elapsed:.0f}s. Total records now: {len(seen_ids)}")
+    print(f"GitHub API: {BUDGET.summary()}")
+    if CACHE is not None:
+        print(f"HTTP cache: {CACHE.summary()}")
+        CACHE.close()
+    seen_ids.close()
     print(f"Output: {OUT}")
     print(f"State: {STATE}")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    ap = argparse.ArgumentParser(description="Harvest hackathon repos from GitHub into data/projects.jsonl")
+    ap.add_argument("--target-new", type=int, default=15000)
+    ap.add_argument("--workers", type=int, default=README_WORKERS, help="concurrent README fetches")
+    ap.add_argument("--no-cache", action="store_true", help=f"don't read or write {HTTP_CACHE}")
+    ap.add_argument("--graphql", action="store_true",
+                    help=f"fetch READMEs in GraphQL batches of {GRAPHQL_BATCH} instead of one REST call each")
+    ap.add_argument("--api-url", default=None, help=f"GitHub REST API base (default {API_BASE})")
+    ap.add_argument("--graphql-url", default=None, help="GraphQL endpoint (default: <api-url>/graphql)")
+    args = ap.parse_args()
+    if args.api_url:
+        API_BASE = args.api_url.rstrip("/")
+        GRAPHQL_URL = f"{API_BASE}/graphql"
+    if args.graphql_url:
+        GRAPHQL_URL = args.graphql_url
+    main(target_new=args.target_new, workers=args.workers, cache=not args.no_cache, graphql=args.graphql)
@@ -0,0 +1,217 @@
+"""Persistent state for the GitHub harvester: an HTTP response cache and a seen-id index.
+
+HttpCache: responses are stored with their ETag/Last-Modified validators, so a rerun sends conditional
+requests: an unchanged search page or README comes back as 304 Not Modified, which GitHub
+doesn't count against the primary rate limit, and the cached body is reused. Values the
+harvester derived from a body (the cleaned README and its score) are stored next to it and
+dropped whenever the body changes; they carry a digest of the text they came from, so a
+README fetched some other way (GraphQL) can reuse them too.
+
+SeenIndex: the ids already written to data/projects.jsonl, with a fingerprint of the
+metadata they were harvested with, kept in SQLite and updated as records are appended. It
+remembers how much of the JSONL it has indexed, so opening it reads nothing when the file
+is as it left it, only the new tail after an outside append, and everything once if the
+file was rewritten.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional
+from urllib.parse import urlencode
+
+
+@dataclass
+class CachedResponse:
+    etag: Optional[str]
+    last_modified: Optional[str]
+    body: bytes
+    derived: Optional[dict]
+
+
+class HttpCache:
+    """SQLite map of request-key -> (validators, body, derived values); safe to share across threads."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, "
+            "body BLOB NOT NULL, derived TEXT, fetched_at REAL NOT NULL)"
+        )
+        self.revalidated = 0
+        self.fetched = 0
+        self.reused = 0
+
+    @staticmethod
+    def key(url: str, params: Optional[dict] = None) -> str:
+        full = url + ("?" + urlencode(sorted(params.items())) if params else "")
+        return hashlib.sha256(full.encode("utf-8")).hexdigest()[:32]
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT etag, last_modified, body, derived FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, body, derived = row
+        return CachedResponse(etag, last_modified, bytes(body), json.loads(derived) if derived else None)
+
+    def conditional_headers(self, entry: Optional[CachedResponse]) -> dict:
+        headers = {}
+        if entry is not None and entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry is not None and entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def put(self, key: str, etag: Optional[str], last_modified: Optional[str], body: bytes) -> None:
+        """Store a fresh body; its derived values are cleared."""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, etag, last_modified, body, derived, fetched_at) "
+                "VALUES (?, ?, ?, ?, NULL, ?)",
+                (key, etag, last_modified, body, time.time()),
+            )
+            self._db.commit()
+            self.fetched += 1
+
+    def touch(self, key: str) -> None:
+        """Record a 304 revalidation."""
+        with self._lock:
+            self._db.execute("UPDATE responses SET fetched_at = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            self.revalidated += 1
+
+    def derived(self, key: str, digest: Optional[str] = None) -> Optional[dict]:
+        """Derived values for key; with digest, only if they were derived from a body with that digest."""
+        with self._lock:
+            row = self._db.execute("SELECT derived FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or row[0] is None:
+                return None
+            derived = json.loads(row[0])
+            if digest is not None and derived.get("digest") != digest:
+                return None
+            self.reused += 1
+        return derived
+
+    def set_derived(self, key: str, derived: dict) -> None:
+        """Store derived values; a key with no response yet (e.g. a body fetched over GraphQL) gets an empty one."""
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO responses (key, etag, last_modified, body, derived, fetched_at) "
+                "VALUES (?, NULL, NULL, x'', ?, ?) ON CONFLICT(key) DO UPDATE SET derived = excluded.derived",
+                (key, json.dumps(derived), time.time()),
+            )
+            self._db.commit()
+
+    def summary(self) -> str:
+        return f"{self.revalidated} unchanged (304), {self.fetched} fetched, {self.reused} cleaned READMEs reused"
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+_HEAD_BYTES = 1 << 16  # prefix hashed to notice the JSONL being replaced rather than appended to
+
+
+def _head_hash(path: Path, length: int) -> str:
+    with path.open("rb") as f:
+        return hashlib.sha256(f.read(length)).hexdigest()
+
+
+class SeenIndex:
+    """SQLite set of record ids (with metadata fingerprints) mirroring an append-only JSONL file."""
+
+    def __init__(self, path, jsonl_path, fingerprint_of: Callable[[dict], str]):
+        self.path = Path(path)
+        self.jsonl_path = Path(jsonl_path)
+        self.fingerprint_of = fingerprint_of
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path))
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS seen (id TEXT PRIMARY KEY, fingerprint TEXT NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._rows = int(self._meta("rows") or 0)
+        self.synced = self.sync()
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, **values) -> None:
+        self._db.executemany(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", ((k, str(v)) for k, v in values.items())
+        )
+
+    def sync(self) -> int:
+        """Index whatever the JSONL holds beyond what was indexed; returns the records read."""
+        size = self.jsonl_path.stat().st_size if self.jsonl_path.exists() else 0
+        indexed = int(self._meta("jsonl_bytes") or 0)
+        head_len = int(self._meta("head_bytes") or 0)
+        if indexed and (size < indexed or _head_hash(self.jsonl_path, head_len) != self._meta("head_sha256")):
+            self._db.execute("DELETE FROM seen")
+            self._rows = indexed = 0
+        if size == indexed:
+            return 0
+
+        read = 0
+        with self.jsonl_path.open("rb") as f:
+            f.seek(indexed)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # partial last line; picked up once it is complete
+                indexed += len(line)
+                try:
+                    obj = json.loads(line)
+                except ValueError:
+                    continue
+                if obj.get("id"):
+                    self.add(obj["id"], self.fingerprint_of(obj))
+                    read += 1
+        self._commit(indexed)
+        return read
+
+    def fingerprint(self, rid: str) -> Optional[str]:
+        """Stored fingerprint, or None if the id was never seen."""
+        row = self._db.execute("SELECT fingerprint FROM seen WHERE id = ?", (rid,)).fetchone()
+        return row[0] if row else None
+
+    def __contains__(self, rid: str) -> bool:
+        return self.fingerprint(rid) is not None
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def changed(self, rid: str, fingerprint: str) -> bool:
+        """True if the id was seen with different metadata."""
+        stored = self.fingerprint(rid)
+        return stored is not None and stored != fingerprint
+
+    def add(self, rid: str, fingerprint: str) -> None:
+        cur = self._db.execute("INSERT OR IGNORE INTO seen (id, fingerprint) VALUES (?, ?)", (rid, fingerprint))
+        if cur.rowcount:
+            self._rows += 1
+        else:
+            self._db.execute("UPDATE seen SET fingerprint = ? WHERE id = ?", (fingerprint, rid))
+
+    def commit(self) -> None:
+        """Call after flushing appends to the JSONL, so the index and file agree."""
+        self._commit(self.jsonl_path.stat().st_size)
+
+    def _commit(self, jsonl_bytes: int) -> None:
+        head_len = min(jsonl_bytes, _HEAD_BYTES)
+        head = _head_hash(self.jsonl_path, head_len) if jsonl_bytes else hashlib.sha256(b"").hexdigest()
+        self._set_meta(rows=self._rows, jsonl_bytes=jsonl_bytes, head_bytes=head_len, head_sha256=head)
+        self._db.commit()
+
+    def close(self) -> None:
+        self._db.close()
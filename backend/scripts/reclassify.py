@@ -0,0 +1,154 @@
+"""Re-score submission_score/type_label across data/projects.jsonl with the current patterns.
+
+Run after changing POS_README/NEG_* (or score_and_type) in github_harvest.py. The file is
+streamed in chunks through a process pool; each record is re-scored from its stored title,
+description, tags and README. Records whose labels don't change are copied byte-for-byte.
+The result is written to a temp file and renamed over the input, so readers see either
+the old file or the new one. Rebuild the indexes afterwards to pick up the new labels.
+
+Records only keep the first 3500 characters of their cleaned README; when the harvester's
+HTTP cache still holds the full cleaned text for a repo, that is used instead.
+
+Example:
+    python scripts/reclassify.py --workers 0 --dry-run
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import github_harvest as gh
+from harvest_cache import HttpCache
+
+CHUNK_LINES = 2000
+
+_cache: Optional[HttpCache] = None
+
+
+def _init_worker(cache_path: Optional[str]) -> None:
+    global _cache
+    _cache = HttpCache(cache_path) if cache_path else None
+
+
+def stored_readme(rec: dict) -> str:
+    """The cleaned README the record was scored with: cached in full, else the part kept in explain_text."""
+    rid = rec.get("id") or ""
+    if _cache is not None and rid.startswith("github:") and "/" in rid:
+        owner, repo = rid[len("github:"):].split("/", 1)
+        derived = _cache.derived(HttpCache.key(gh.readme_url(owner, repo)))
+        if derived and "clean" in derived:
+            return derived["clean"]
+    text = rec.get("explain_text") or rec.get("text") or ""
+    i = text.find("\nREADME: ")
+    return text[i + len("\nREADME: "):] if i >= 0 else ""
+
+
+def reclassify_lines(lines: List[bytes]) -> Tuple[List[bytes], Counter]:
+    out, counts = [], Counter()
+    for line in lines:
+        try:
+            rec = json.loads(line)
+        except ValueError:
+            out.append(line)
+            counts["unparsed"] += 1
+            continue
+        if "type_label" not in rec:
+            out.append(line)  # not a harvested record (e.g. ingest_example.py rows)
+            continue
+
+        score, typ = gh.score_and_type(rec.get("title"), rec.get("description"), stored_readme(rec), rec.get("tags") or [])
+        counts["records"] += 1
+        if score == rec.get("submission_score") and typ == rec.get("type_label"):
+            out.append(line)
+            continue
+        counts["rescored"] += 1
+        if typ != rec.get("type_label"):
+            counts[f"{rec.get('type_label')} -> {typ}"] += 1
+        rec["submission_score"], rec["type_label"] = score, typ
+        out.append((json.dumps(rec, ensure_ascii=False) + "\n").encode("utf-8"))
+    return out, counts
+
+
+def _chunks(f, n: int):
+    chunk = []
+    for line in f:
+        chunk.append(line)
+        if len(chunk) >= n:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _results(chunks, workers: int, cache_path: Optional[str]):
+    """reclassify_lines over chunks, in order, with at most 2 chunks in flight per worker."""
+    if workers == 1:
+        _init_worker(cache_path)
+        yield from map(reclassify_lines, chunks)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cache_path,)) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(reclassify_lines, chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def main(path=gh.OUT, workers: int = 1, cache_path=gh.HTTP_CACHE, dry_run: bool = False,
+         chunk_lines: int = CHUNK_LINES) -> Counter:
+    path = Path(path)
+    workers = max(1, int(workers or os.cpu_count() or 1))
+    cache = str(cache_path) if cache_path and Path(cache_path).exists() else None
+    size = path.stat().st_size
+    tmp = path.with_name(path.name + ".tmp")
+
+    totals = Counter()
+    t0 = time.perf_counter()
+    next_report = 50_000
+    with path.open("rb") as src, (open(os.devnull, "wb") if dry_run else tmp.open("wb")) as dst:
+        for lines, counts in _results(_chunks(src, chunk_lines), workers, cache):
+            dst.writelines(lines)
+            totals.update(counts)
+            if totals["records"] >= next_report:
+                rate = totals["records"] / (time.perf_counter() - t0)
+                print(f"[progress] {totals['records']} records, {totals['rescored']} rescored ({rate:.0f} records/s)")
+                next_report += 50_000
+        if not dry_run:
+            dst.flush()
+            os.fsync(dst.fileno())
+
+    elapsed = time.perf_counter() - t0
+    if not dry_run:
+        if path.stat().st_size != size:
+            tmp.unlink()
+            sys.exit(f"{path} changed while reclassifying (is the harvester running?); left it untouched")
+        os.replace(tmp, path)
+
+    print(
+        f"Reclassified {totals['records']} records in {elapsed:.1f}s "
+        f"({totals['records'] / elapsed if elapsed else 0:.0f} records/s, {workers} workers): "
+        f"{totals['rescored']} rescored" + (" (dry run, nothing written)" if dry_run else "")
+    )
+    for key, n in sorted(totals.items()):
+        if " -> " in key or key == "unparsed":
+            print(f"  {key}: {n}")
+    return totals
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Re-score submission_score/type_label in projects.jsonl")
+    ap.add_argument("--input", default=str(gh.OUT))
+    ap.add_argument("--workers", type=int, default=1, help="worker processes (0 = one per core)")
+    ap.add_argument("--http-cache", default=str(gh.HTTP_CACHE), help="harvester cache with full cleaned READMEs")
+    ap.add_argument("--chunk-lines", type=int, default=CHUNK_LINES)
+    ap.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    args = ap.parse_args()
+    main(args.input, workers=args.workers, cache_path=args.http_cache, dry_run=args.dry_run,
+         chunk_lines=args.chunk_lines)
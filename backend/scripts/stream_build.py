@@ -0,0 +1,468 @@
+"""Chunked, resumable corpus build shared by build_index.py and build_dual_index.py.
+
+Input JSONL is read chunk_rows records at a time. Each chunk is encoded (through the
+embedding cache) and appended to append-only columns under data/.build/: raw float32
+vectors, metadata records + offsets, row timestamps, neighbor-quality flags, row keys and
+term counts. After every
+chunk the input byte offsets, a hash of the input consumed so far and the column sizes are
+checkpointed to state.json; an interrupted build truncates the columns back to that
+checkpoint and carries on from there. If an input was rewritten in the meantime (the
+harvester's refreshes and reclassify.py replace projects.jsonl), its consumed prefix no
+longer hashes the same and the build starts over.
+
+The next chunk is read and handed to the encoder before the current one is written out, so
+a worker pool (encoding.CorpusEncoder) never drains at a chunk boundary. Peak memory is two
+chunks plus the term vocabulary: the final .npy files are copied out of the columns in
+slices and the FAISS index is trained on a sample and filled from the memory-mapped
+embeddings.
+
+Every output is written to a temp file and renamed over the old one, so an API process
+that memory-mapped the previous build keeps reading it until it hot-reloads. The manifest
+(with each output's size) is written last and marks the build complete.
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import faiss
+
+from app.ann import build_index, describe_index
+from app.meta import dump_row, normalize_row
+from app.quality import RULES_VERSION, is_good_neighbor
+from app.terms import _tokenize, idf_from_df
+from embedding_store import EmbeddingStore, appendable_rows, extend_or_build, load_manifest, write_manifest
+
+CHUNK_ROWS = 4096
+COPY_ROWS = 65536  # rows per slice when copying columns into .npy outputs
+HASH_BLOCK = 1 << 20
+
+_STATE_VERSION = 3
+
+
+@dataclass
+class Source:
+    """One JSONL input; normalize maps a raw record to a row dict (None skips it).
+
+    annotate, if set, is then called with the byte offset of the record's line and the row,
+    and may drop (None) or amend it; see dedup.DedupPlan.
+    """
+    path: Path
+    normalize: Callable[[dict], Optional[dict]]
+    annotate: Optional[Callable[[int, dict], Optional[dict]]] = None
+
+
+@dataclass
+class Outputs:
+    index: Path
+    meta_bin: Path
+    meta_offsets: Path
+    terms: Path
+    emb: Path
+    row_ts: Path
+    row_quality: Path
+    row_keys: Path
+    manifest: Path
+    work: Path
+
+    @classmethod
+    def in_dir(cls, data: Path) -> "Outputs":
+        return cls(
+            index=data / "index_all.faiss",
+            meta_bin=data / "projects_meta.bin",
+            meta_offsets=data / "projects_meta.offsets.npy",
+            terms=data / "projects_terms",
+            emb=data / "embeddings.npy",
+            row_ts=data / "row_timestamps.npy",
+            row_quality=data / "row_quality.npy",
+            row_keys=data / "row_keys.npy",
+            manifest=data / "build_manifest.json",
+            work=data / ".build",
+        )
+
+
+@contextmanager
+def _replacing(path: Path):
+    """Yield a temp path next to path, then rename it over path."""
+    tmp = path.with_name(path.stem + ".tmp" + path.suffix)
+    yield tmp
+    os.replace(tmp, path)
+
+
+def safe_normalize(emb: np.ndarray) -> np.ndarray:
+    emb = np.nan_to_num(emb, nan=0.0, posinf=0.0, neginf=0.0).astype("float32")
+    norms = np.linalg.norm(emb, axis=1, keepdims=True)
+    norms = np.where(norms == 0, 1.0, norms)
+    return emb / norms
+
+
+class _Column:
+    """Append-only fixed-width binary file, truncated to a checkpointed row count on open."""
+
+    def __init__(self, path: Path, dtype, rows: int = 0, width: int = 1):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.width = width
+        self.rows = rows
+        self._f = open(path, "r+b" if path.exists() else "w+b")
+        self._f.truncate(rows * self.row_bytes)
+        self._f.seek(0, os.SEEK_END)
+
+    @property
+    def row_bytes(self) -> int:
+        return self.dtype.itemsize * self.width
+
+    def append(self, values) -> None:
+        arr = np.ascontiguousarray(values, dtype=self.dtype)
+        self._f.write(arr.tobytes())
+        self.rows += arr.size // self.width
+
+    def sync(self) -> None:
+        self._f.flush()
+        os.fsync(self._f.fileno())
+
+    def close(self) -> None:
+        self._f.close()
+
+    def view(self) -> np.ndarray:
+        shape = (self.rows, self.width) if self.width > 1 else (self.rows,)
+        if self.rows == 0:
+            return np.zeros(shape, dtype=self.dtype)
+        self._f.flush()
+        return np.memmap(self.path, dtype=self.dtype, mode="r", shape=shape)
+
+    def save_raw(self, out: Path) -> None:
+        self._f.flush()
+        with _replacing(out) as tmp:
+            shutil.copyfile(self.path, tmp)
+
+    def save_npy(self, out: Path, dtype=None, leading_zero: bool = False) -> None:
+        """Copy the column into a .npy file slice by slice (optionally prefixed with a 0 row)."""
+        src = self.view()
+        lead = 1 if leading_zero else 0
+        with _replacing(out) as tmp:
+            dst = np.lib.format.open_memmap(
+                tmp, mode="w+", dtype=dtype or self.dtype, shape=(len(src) + lead,) + src.shape[1:],
+            )
+            if lead:
+                dst[0] = 0
+            for i in range(0, len(src), COPY_ROWS):
+                dst[lead + i: lead + i + COPY_ROWS] = src[i: i + COPY_ROWS]
+            dst.flush()
+            del dst
+
+
+class _TermColumns:
+    """Streaming TermIndex: CSR counts spill to columns; vocabulary and DF stay in memory."""
+
+    def __init__(self, work: Path, state: dict):
+        self.work = work
+        self.indptr = _Column(work / "terms_indptr.i64", np.int64, state.get("rows", 0))
+        self.indices = _Column(work / "terms_indices.i32", np.int32, state.get("term_nnz", 0))
+        self.counts = _Column(work / "terms_counts.i32", np.int32, state.get("term_nnz", 0))
+
+        self.vocab: Dict[str, int] = {}
+        vocab_path = work / "terms_vocab.txt"
+        self._vocab_f = open(vocab_path, "r+b" if vocab_path.exists() else "w+b")
+        self._vocab_f.truncate(state.get("vocab_bytes", 0))
+        for term in self._vocab_f.read().decode("utf-8").splitlines():
+            self.vocab[term] = len(self.vocab)
+        self._vocab_f.seek(0, os.SEEK_END)
+
+        n_terms = len(self.vocab)
+        self.df = np.zeros(max(1024, n_terms), dtype=np.int64)
+        if n_terms:
+            self.df[:n_terms] = np.load(work / "terms_df.npy")[:n_terms]
+
+    def _term_id(self, term: str) -> int:
+        j = self.vocab.get(term)
+        if j is None:
+            j = self.vocab[term] = len(self.vocab)
+            self._vocab_f.write(term.encode("utf-8") + b"\n")
+            if j >= len(self.df):
+                self.df = np.concatenate([self.df, np.zeros(len(self.df), dtype=np.int64)])
+        return j
+
+    def add(self, search_text: str, text: str) -> None:
+        for term in set(_tokenize(search_text)):
+            j = self._term_id(term)  # may grow self.df, so look it up afterwards
+            self.df[j] += 1
+        counts = Counter(_tokenize(text))
+        self.indices.append([self._term_id(t) for t in counts])
+        self.counts.append(list(counts.values()))
+        self.indptr.append([self.indices.rows])
+
+    def checkpoint(self) -> dict:
+        for col in (self.indptr, self.indices, self.counts):
+            col.sync()
+        self._vocab_f.flush()
+        os.fsync(self._vocab_f.fileno())
+        tmp = self.work / "terms_df.tmp.npy"
+        np.save(tmp, self.df[: len(self.vocab)])
+        os.replace(tmp, self.work / "terms_df.npy")
+        return {"term_nnz": self.indices.rows, "vocab_bytes": self._vocab_f.tell()}
+
+    FILES = ("indptr.npy", "indices.npy", "counts.npy", "idf.npy", "vocab.txt", "info.json")
+
+    def save(self, out: Path) -> None:
+        """Write the same files as TermIndex.save."""
+        out.mkdir(parents=True, exist_ok=True)
+        n_rows = self.indptr.rows
+        idx_dtype = np.int32 if self.indices.rows < 2**31 else np.int64
+        self.indptr.save_npy(out / "indptr.npy", dtype=idx_dtype, leading_zero=True)
+        self.indices.save_npy(out / "indices.npy", dtype=idx_dtype)
+        self.counts.save_npy(out / "counts.npy")
+        n_docs = max(1, n_rows)
+        with _replacing(out / "idf.npy") as tmp:
+            np.save(tmp, idf_from_df(self.df[: len(self.vocab)], n_docs))
+
+        self._vocab_f.flush()
+        with _replacing(out / "vocab.txt") as tmp, open(tmp, "wb") as dst:
+            self._vocab_f.seek(0)
+            shutil.copyfileobj(self._vocab_f, dst)
+            if dst.tell():
+                dst.truncate(dst.tell() - 1)  # vocab.txt is "\n".join(terms), no trailing newline
+        with _replacing(out / "info.json") as tmp:
+            tmp.write_text(json.dumps({"rows": n_rows, "n_docs": n_docs}), encoding="utf-8")
+
+    def close(self) -> None:
+        for col in (self.indptr, self.indices, self.counts):
+            col.close()
+        self._vocab_f.close()
+
+
+def _prefix_hash(path: Path, length: int):
+    """sha256 of the first length bytes of path."""
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        while length > 0:
+            block = f.read(min(HASH_BLOCK, length))
+            if not block:
+                break
+            h.update(block)
+            length -= len(block)
+    return h
+
+
+def _read_chunks(sources: Sequence[Source], offsets: List[int], hashes: list,
+                 chunk_rows: int) -> Iterator[Tuple[List[dict], dict]]:
+    """Yield (rows, checkpoint): the input byte offsets just past those rows and the digests of everything before them.
+
+    hashes holds a running sha256 per source, already fed the bytes before its offset.
+    """
+    offsets = list(offsets)
+
+    def checkpoint() -> dict:
+        return {"offsets": list(offsets), "digests": [h.hexdigest() for h in hashes]}
+
+    rows: List[dict] = []
+    for si, src in enumerate(sources):
+        if not src.path.exists():
+            continue
+        with src.path.open("rb") as f:
+            f.seek(offsets[si])
+            for line in f:
+                raw = None
+                if line.strip():
+                    try:
+                        raw = json.loads(line)
+                    except ValueError:
+                        if not line.endswith(b"\n"):
+                            break  # record still being appended; the next build picks it up
+                start = offsets[si]
+                offsets[si] += len(line)
+                hashes[si].update(line)
+                row = src.normalize(raw) if raw is not None else None
+                if row is not None and src.annotate is not None:
+                    row = src.annotate(start, row)
+                if row is None:
+                    continue
+                rows.append(row)
+                if len(rows) >= chunk_rows:
+                    yield rows, checkpoint()
+                    rows = []
+    if rows:
+        yield rows, checkpoint()
+
+
+def _consumed_hashes(sources: Sequence[Source], state: dict) -> Optional[list]:
+    """Running hashes of each source's consumed prefix, or None if one no longer matches the checkpoint."""
+    hashes = []
+    for s, off, digest in zip(sources, state["offsets"], state["digests"]):
+        if off and (not s.path.exists() or s.path.stat().st_size < off):
+            return None
+        h = _prefix_hash(s.path, off) if off else hashlib.sha256()
+        if h.hexdigest() != digest:
+            return None
+        hashes.append(h)
+    return hashes
+
+
+def _load_state(out: Outputs, sources: Sequence[Source], model_name: str, restart: bool,
+                input_id: str) -> Tuple[dict, list]:
+    """(state, running input hashes) to resume from, or a fresh state with the work dir cleared."""
+    fresh = {
+        "version": _STATE_VERSION,
+        "model": model_name,
+        "sources": [str(s.path) for s in sources],
+        "input_id": input_id,
+        "offsets": [0] * len(sources),
+        "digests": [hashlib.sha256().hexdigest()] * len(sources),
+        "rows": 0,
+    }
+    state_path = out.work / "state.json"
+    if not restart and state_path.exists():
+        try:
+            state = json.loads(state_path.read_text(encoding="utf-8"))
+        except ValueError:
+            state = None
+        if (
+            state
+            and state.get("version") == _STATE_VERSION
+            and state.get("model") == model_name
+            and state.get("sources") == fresh["sources"]
+            and state.get("input_id", "") == input_id
+        ):
+            hashes = _consumed_hashes(sources, state)
+            if hashes is not None:
+                return state, hashes
+            print("Inputs were rewritten since the interrupted build; starting over")
+    shutil.rmtree(out.work, ignore_errors=True)
+    out.work.mkdir(parents=True, exist_ok=True)
+    return fresh, [hashlib.sha256() for _ in sources]
+
+
+def _encoded_chunks(chunks, cache: EmbeddingStore, encode_fn, text_of) -> Iterator[Tuple[List[dict], dict, List[str], np.ndarray]]:
+    """(rows, checkpoint, texts, vectors) per chunk; each chunk's encoding starts before the previous one is yielded."""
+    pending = None
+    for rows, checkpoint in chunks:
+        texts = [text_of(p) for p in rows]
+        job = (rows, checkpoint, texts, cache.submit(texts, encode_fn))
+        if pending is not None:
+            yield (*pending[:3], pending[3]())
+        pending = job
+    if pending is not None:
+        yield (*pending[:3], pending[3]())
+
+
+def _save_state(out: Outputs, state: dict) -> None:
+    tmp = out.work / "state.tmp.json"
+    tmp.write_text(json.dumps(state), encoding="utf-8")
+    os.replace(tmp, out.work / "state.json")
+
+
+def run_build(
+    sources: Sequence[Source],
+    *,
+    out: Outputs,
+    model_name: str,
+    encode_fn: Callable[[List[str]], np.ndarray],
+    text_of: Callable[[dict], str],
+    timestamp_of: Callable[[dict], int],
+    index_spec: str = "flat",
+    cache_path: Path,
+    full: bool = False,
+    chunk_rows: int = CHUNK_ROWS,
+    restart: bool = False,
+    input_id: str = "",
+) -> dict:
+    """Build every API artifact from sources; resumes an interrupted build unless restart.
+
+    input_id names whatever else decides which rows are read (e.g. a dedup plan's
+    fingerprint); an interrupted build only resumes if it is unchanged.
+    """
+    state, hashes = _load_state(out, sources, model_name, restart, input_id)
+    if state["rows"]:
+        print(f"Resuming build at row {state['rows']} (offsets {state['offsets']})")
+
+    dim = state.get("dim")
+    emb_col = _Column(out.work / "embeddings.f32", np.float32, state["rows"], dim) if dim else None
+    meta_col = _Column(out.work / "meta.bin", np.uint8, state.get("meta_bytes", 0))
+    meta_ends = _Column(out.work / "meta_ends.i64", np.int64, state["rows"])
+    ts_col = _Column(out.work / "row_ts.i64", np.int64, state["rows"])
+    good_col = _Column(out.work / "row_good.u8", np.bool_, state["rows"])
+    key_col = _Column(out.work / "row_keys.s32", "S32", state["rows"])
+    terms = _TermColumns(out.work, state)
+
+    cache = EmbeddingStore(cache_path, model_name)
+    t0 = time.perf_counter()
+    done = 0
+    for rows, checkpoint, texts, vecs in _encoded_chunks(
+        _read_chunks(sources, state["offsets"], hashes, chunk_rows), cache, encode_fn, text_of
+    ):
+        emb = safe_normalize(vecs)
+        if emb_col is None:
+            dim = state["dim"] = int(emb.shape[1])
+            emb_col = _Column(out.work / "embeddings.f32", np.float32, 0, dim)
+        emb_col.append(emb)
+        key_col.append([cache.key(t).encode("ascii") for t in texts])
+        ts_col.append([timestamp_of(p) for p in rows])
+
+        ends, good = [], []
+        for p in rows:
+            row = normalize_row(p)
+            meta_col.append(np.frombuffer(dump_row(row), dtype=np.uint8))
+            ends.append(meta_col.rows)
+            good.append(is_good_neighbor(row))
+            terms.add(row["search_text"], row["text"])
+        meta_ends.append(ends)
+        good_col.append(good)
+
+        for col in (emb_col, meta_col, meta_ends, ts_col, good_col, key_col):
+            col.sync()
+        state.update(terms.checkpoint())
+        state.update(checkpoint, rows=state["rows"] + len(rows), meta_bytes=meta_col.rows)
+        _save_state(out, state)
+        done += len(rows)
+        print(
+            f"  {state['rows']} rows ({cache.misses} encoded, {cache.hits} reused, "
+            f"{done / max(time.perf_counter() - t0, 1e-9):.0f} rows/s)"
+        )
+    cache.close()
+
+    n = state["rows"]
+    if n == 0 or emb_col is None:
+        raise RuntimeError("No projects loaded from " + ", ".join(str(s.path) for s in sources))
+
+    # Final artifacts, each copied out of its column in slices.
+    emb_col.save_npy(out.emb)
+    meta_col.save_raw(out.meta_bin)
+    meta_ends.save_npy(out.meta_offsets, leading_zero=True)
+    terms.save(out.terms)
+    ts_col.save_npy(out.row_ts)
+    good_col.save_npy(out.row_quality)
+
+    # Appends to the previous index when its rows are an unchanged prefix of this corpus.
+    manifest = load_manifest(out.manifest)
+    n_keep = 0 if full else appendable_rows(
+        manifest, out.row_keys, out.index, model_name=model_name, index_spec=index_spec, keys=key_col.view(),
+    )
+    emb = np.load(out.emb, mmap_mode="r")
+    index = extend_or_build(emb, n_keep, out.index, index_spec, build_index)
+    with _replacing(out.index) as tmp:
+        faiss.write_index(index, str(tmp))
+    key_col.save_npy(out.row_keys)
+    write_manifest(
+        out.manifest, model_name=model_name, index_spec=index_spec, rows=n,
+        files=[out.emb, out.meta_bin, out.meta_offsets, out.row_ts, out.row_quality, out.row_keys, out.index]
+        + [out.terms / f for f in _TermColumns.FILES],
+        quality_rules=RULES_VERSION,
+    )
+
+    dated = int((ts_col.view() >= 0).sum())
+    good = int(good_col.view().sum())
+    for col in (emb_col, meta_col, meta_ends, ts_col, good_col, key_col):
+        col.close()
+    terms.close()
+    del emb
+    shutil.rmtree(out.work, ignore_errors=True)
+
+    print(f"Index: {'appended ' + str(n - n_keep) + ' rows' if n_keep else 'rebuilt'}")
+    return {"rows": n, "dated": dated, "good": good, "index": describe_index(index)}
@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+# The scripts import each other as top-level modules (run as `python scripts/<name>.py`),
+# and the app as a package from backend/.
+BACKEND = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND))
+sys.path.insert(0, str(BACKEND / "scripts"))
@@ -0,0 +1,137 @@
+import json
+import zlib
+from collections import Counter
+
+import numpy as np
+import pytest
+
+import dedup
+from app.meta import MetaTable
+from stream_build import Outputs, Source, run_build
+
+_rng = np.random.default_rng(7)
+VOCAB = [f"word{i}" for i in range(20000)]
+
+
+def words(n: int = 150) -> list:
+    return list(_rng.choice(VOCAB, n, replace=False))
+
+
+def edited(base: list, start: int, n: int = 16) -> list:
+    """base with n consecutive words replaced by fresh ones."""
+    return base[:start] + words(n) + base[start + n:]
+
+
+def similarity(a: list, b: list) -> float:
+    sa, sb = dedup.minhash(" ".join(a)), dedup.minhash(" ".join(b))
+    return float((sa == sb).mean())
+
+
+ALPHA = words()
+ALPHA_FORK = edited(ALPHA, 70, 4)
+# A chain: each link is a near-duplicate of the next, but the ends are different projects.
+CHAIN = [words()]
+CHAIN.append(edited(CHAIN[0], 20))
+CHAIN.append(edited(CHAIN[1], 110))
+OTHER = words()
+
+
+def row(title: str, text: list = (), **urls) -> dict:
+    return {"id": title, "title": title, "description": " ".join(text), **urls}
+
+
+# None is a blank line: it shifts the byte offsets the plan is keyed by without being a row.
+PROJECTS = [
+    row("alpha", ALPHA, url="https://github.com/a/alpha"),
+    row("other", OTHER, url="https://github.com/x/other"),
+    None,
+    row("alpha-fork", ALPHA_FORK, url="https://github.com/fork/alpha"),
+    row("chain-0", CHAIN[0]),
+    row("chain-1", CHAIN[1]),
+    row("chain-2", CHAIN[2]),
+    row("other-short", url="https://github.com/x/other"),  # too short to sign; joined by URL
+    row("other-spelled", words(), url="HTTPS://www.GitHub.com/X/other.git/"),
+]
+DEVPOST = [
+    row("alpha-devpost", words(), url="https://devpost.com/software/alpha", repo_url="https://github.com/a/alpha"),
+    row("devpost-only", words(), url="https://devpost.com/software/unique"),
+]
+FOLDED = {
+    "alpha-fork": "alpha",
+    "chain-1": "chain-0",
+    "other-short": "other",
+    "other-spelled": "other",
+    "alpha-devpost": "alpha",
+}  # dropped row -> the row it is folded into
+
+
+def text_of(p: dict) -> str:
+    return p["title"] + "\n" + p["description"]
+
+
+def write_jsonl(path, rows) -> dict:
+    """Write rows (None = blank line); returns id -> byte offset of its line."""
+    offsets, pos = {}, 0
+    with path.open("wb") as f:
+        for r in rows:
+            line = b"\n" if r is None else (json.dumps(r) + "\n").encode("utf-8")
+            if r is not None:
+                offsets[r["id"]] = pos
+            f.write(line)
+            pos += len(line)
+    return offsets
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    sources = [Source(tmp_path / "projects.jsonl", lambda raw: raw), Source(tmp_path / "devpost.jsonl", lambda raw: raw)]
+    keys = {}
+    for si, (src, rows) in enumerate(zip(sources, (PROJECTS, DEVPOST))):
+        keys.update({rid: (si, off) for rid, off in write_jsonl(src.path, rows).items()})
+    return sources, keys
+
+
+def test_fixture_similarities():
+    assert similarity(ALPHA, ALPHA_FORK) >= dedup.MIN_JACCARD
+    assert similarity(CHAIN[0], CHAIN[1]) >= dedup.MIN_JACCARD
+    assert similarity(CHAIN[1], CHAIN[2]) >= dedup.MIN_JACCARD
+    assert similarity(CHAIN[0], CHAIN[2]) < dedup.MIN_JACCARD
+
+
+def test_plan_groups(corpus):
+    sources, keys = corpus
+    plan = dedup.plan_duplicates(sources, text_of)
+
+    assert plan.rows == len(keys)
+    assert plan.dropped == {keys[rid]: keys[into] for rid, into in FOLDED.items()}
+    assert plan.counts == {keys[into]: n for into, n in Counter(FOLDED.values()).items()}
+    assert not list((sources[0].path.parent).glob("dedup-*"))  # spill directory removed
+
+
+def test_chain_link_between_its_ends(tmp_path):
+    # With the link last, it may group with either end first, but the ends never share a group.
+    path = tmp_path / "chain.jsonl"
+    rows = [row("chain-0", CHAIN[0]), row("chain-2", CHAIN[2]), row("chain-1", CHAIN[1])]
+    keys = {rid: (0, off) for rid, off in write_jsonl(path, rows).items()}
+    plan = dedup.plan_duplicates([Source(path, lambda raw: raw)], text_of)
+    assert plan.dropped in ({keys["chain-1"]: keys["chain-0"]}, {keys["chain-1"]: keys["chain-2"]})
+
+
+def test_build_keeps_representatives(corpus, tmp_path):
+    sources, _ = corpus
+    plan = dedup.plan_duplicates(sources, text_of)
+    plan.apply(sources)
+
+    def encode(texts):
+        return np.stack([np.random.default_rng(zlib.crc32(t.encode("utf-8"))).standard_normal(8) for t in texts]).astype("float32")
+
+    out = Outputs.in_dir(tmp_path / "data")
+    summary = run_build(
+        sources, out=out, model_name="stub", encode_fn=encode, text_of=text_of,
+        timestamp_of=lambda p: -1, cache_path=tmp_path / "emb.sqlite", input_id="dedup:" + plan.fingerprint,
+    )
+    meta = MetaTable.open(str(out.meta_bin), str(out.meta_offsets))
+    kept = {r["id"]: r.get("duplicates", 0) for r in meta.iter_rows()}
+
+    assert summary["rows"] == len(kept) == len(PROJECTS) + len(DEVPOST) - 1 - len(FOLDED)
+    assert kept == {"alpha": 2, "other": 2, "chain-0": 1, "chain-2": 0, "devpost-only": 0}
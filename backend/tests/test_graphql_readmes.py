@@ -0,0 +1,119 @@
+import base64
+import json
+import re
+
+import pytest
+import requests
+
+import github_harvest as gh
+from harvest_cache import HttpCache
+
+READMES = {
+    "octo/demo": "# Demo\n\nBuilt at **HackMIT 2024** in 36 hours. ![shot](x.png) See the [devpost](https://devpost.com/x).",
+    "octo/tool": "# Tool\n\nA CLI for [parsing](https://example.com) logs.\n\n```sh\ntool --help\n```",
+    "octo/bare": "",
+}
+
+
+def item(full_name: str, **extra) -> dict:
+    return {
+        "full_name": full_name,
+        "name": full_name.split("/", 1)[1],
+        "description": "weekend hackathon project",
+        "topics": ["hackathon"],
+        "html_url": f"https://github.com/{full_name}",
+        "stargazers_count": 3,
+        **extra,
+    }
+
+
+def response(status: int, body=None, headers=None) -> requests.Response:
+    r = requests.Response()
+    r.status_code = status
+    r._content = json.dumps(body).encode("utf-8") if body is not None else b""
+    r.headers.update(headers or {})
+    return r
+
+
+class FakeGitHub:
+    """Serves READMES over REST (GET .../readme, with ETags) and GraphQL (POST, HEAD:README.md blobs)."""
+
+    def __init__(self):
+        self.calls = []
+
+    def request(self, method, url, headers=None, json=None, **kwargs):
+        self.calls.append(method)
+        if method == "POST":
+            data = {}
+            for alias, owner, name in re.findall(r'(r\d+): repository\(owner: "([^"]+)", name: "([^"]+)"\)', json["query"]):
+                text = READMES.get(f"{owner}/{name}")
+                data[alias] = None if text is None else {"f0": {"text": text} if text else None}
+            return response(200, {"data": data})
+        full = url[len(gh.API_BASE + "/repos/"):-len("/readme")]
+        if not READMES.get(full):
+            return response(404, {"message": "Not Found"})
+        etag = f'"{gh.readme_digest(READMES[full])}"'
+        if (headers or {}).get("If-None-Match") == etag:
+            return response(304, headers={"ETag": etag})
+        content = base64.b64encode(READMES[full].encode("utf-8")).decode("ascii")
+        return response(200, {"content": content, "encoding": "base64"}, {"ETag": etag})
+
+
+@pytest.fixture
+def github(monkeypatch):
+    server = FakeGitHub()
+    monkeypatch.setattr(gh, "_session", lambda: server)
+    monkeypatch.setattr(gh, "BUDGET", gh.RateBudget())
+    return server
+
+
+def records(cache, graphql: bool):
+    gh.CACHE = cache
+    candidates = [(item(name), True) for name in READMES]
+    readmes = gh.graphql_readmes(list(READMES)) if graphql else None
+    return [gh.make_record(c, readmes) for c in candidates]
+
+
+def test_graphql_and_rest_give_the_same_records(github, tmp_path, monkeypatch):
+    monkeypatch.setattr(gh, "CACHE", None)
+    rest = records(HttpCache(tmp_path / "rest.sqlite"), graphql=False)
+    batched = records(HttpCache(tmp_path / "graphql.sqlite"), graphql=True)
+
+    assert batched == rest
+    assert "HackMIT" in rest[0]["explain_text"]
+    assert github.calls.count("POST") == 1
+
+
+def test_graphql_readmes_are_cached_like_rest(github, tmp_path, monkeypatch):
+    monkeypatch.setattr(gh, "CACHE", None)
+    cache = HttpCache(tmp_path / "http_cache.sqlite")
+    first = records(cache, graphql=True)
+
+    key = HttpCache.key(gh.readme_url("octo", "demo"))
+    derived = cache.derived(key)
+    assert derived["clean"] == gh.clean_markdown(READMES["octo/demo"])
+    assert derived["score"] == first[0]["submission_score"]
+
+    # A REST run finds no validators (GraphQL has none) and refetches, caching the same values.
+    assert records(cache, graphql=False) == first
+    assert cache.derived(key)["clean"] == derived["clean"]
+
+    # The next GraphQL run reuses every cleaned README, since each text's digest still matches.
+    cleaned = []
+    monkeypatch.setattr(gh, "clean_markdown", lambda md: cleaned.append(md) or "")
+    assert records(cache, graphql=True) == first
+    assert cleaned == []
+
+
+def test_failed_graphql_batch_is_not_cached(github, tmp_path, monkeypatch):
+    monkeypatch.setattr(gh, "CACHE", None)
+    cache = HttpCache(tmp_path / "http_cache.sqlite")
+
+    def unavailable(query):
+        raise RuntimeError("GraphQL API unavailable")
+
+    monkeypatch.setattr(gh, "gh_graphql", unavailable)
+
+    rec = records(cache, graphql=True)[0]
+    assert "README" not in rec["explain_text"]
+    assert cache.derived(HttpCache.key(gh.readme_url("octo", "demo"))) is None
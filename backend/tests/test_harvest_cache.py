@@ -0,0 +1,136 @@
+import base64
+import json
+
+import pytest
+import requests
+
+import github_harvest as gh
+from harvest_cache import HttpCache
+
+
+class FakeClock:
+    """Stands in for the time module inside github_harvest; sleep() advances the clock."""
+
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+        self.slept = []
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def make_response(status: int, body=None, headers=None) -> requests.Response:
+    r = requests.Response()
+    r.status_code = status
+    r._content = json.dumps(body).encode("utf-8") if body is not None else b""
+    r.headers.update(headers or {})
+    return r
+
+
+class FakeGitHub:
+    """A requests.Session stand-in serving one README with an ETag, answering 304 when it matches."""
+
+    def __init__(self, text: str, etag: str = '"v1"'):
+        self.text = text
+        self.etag = etag
+        self.calls = []
+
+    def request(self, method, url, headers=None, **kwargs):
+        headers = headers or {}
+        self.calls.append((method, url, dict(headers)))
+        limits = {"X-RateLimit-Remaining": "100", "X-RateLimit-Reset": "2000000000", "X-RateLimit-Resource": "core"}
+        if headers.get("If-None-Match") == self.etag:
+            return make_response(304, headers={"ETag": self.etag, **limits})
+        content = base64.b64encode(self.text.encode("utf-8")).decode("ascii")
+        return make_response(200, {"content": content, "encoding": "base64"}, {"ETag": self.etag, **limits})
+
+
+@pytest.fixture
+def harvester(tmp_path, monkeypatch):
+    cache = HttpCache(tmp_path / "http_cache.sqlite")
+    monkeypatch.setattr(gh, "CACHE", cache)
+    monkeypatch.setattr(gh, "BUDGET", gh.RateBudget())
+    yield cache
+    cache.close()
+
+
+def test_readme_etag_round_trip(harvester, monkeypatch):
+    server = FakeGitHub("# Demo\nBuilt at a hackathon for the devpost submission.")
+    monkeypatch.setattr(gh, "_session", lambda: server)
+    cleaned = []
+    clean_markdown = gh.clean_markdown
+    monkeypatch.setattr(gh, "clean_markdown", lambda md: cleaned.append(md) or clean_markdown(md))
+
+    first = gh.readme_fields("octo", "demo", "demo", "a demo", ["hackathon"])
+    assert "If-None-Match" not in server.calls[0][2]
+    assert harvester.fetched == 1 and len(cleaned) == 1
+
+    second = gh.readme_fields("octo", "demo", "demo", "a demo", ["hackathon"])
+    assert server.calls[1][2]["If-None-Match"] == '"v1"'
+    assert harvester.revalidated == 1 and harvester.reused == 1
+    assert len(cleaned) == 1  # the 304 reused the cleaned text cached with the body
+    assert second == first
+    assert gh.BUDGET.requests == 1  # 304s are refunded
+
+
+def test_changed_readme_replaces_cached_body(harvester, monkeypatch):
+    server = FakeGitHub("# Old\nA weekend project.")
+    monkeypatch.setattr(gh, "_session", lambda: server)
+    assert gh.get_readme("octo", "demo") == ("# Old\nA weekend project.", True)
+
+    server.text, server.etag = "# New\nBuilt at a hackathon.", '"v2"'
+    assert gh.get_readme("octo", "demo") == ("# New\nBuilt at a hackathon.", True)
+    assert gh.get_readme("octo", "demo") == ("# New\nBuilt at a hackathon.", False)
+    key = HttpCache.key(gh.readme_url("octo", "demo"))
+    assert harvester.get(key).etag == '"v2"'
+
+
+def test_budget_spends_remaining_then_waits_for_reset(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(gh, "time", clock)
+    budget = gh.RateBudget()
+    budget.update("core", {"X-RateLimit-Remaining": "3", "X-RateLimit-Reset": str(int(clock.now) + 30)})
+
+    for _ in range(3):
+        budget.acquire("core")
+    assert clock.slept == []  # the quota is spent without pacing
+
+    budget.acquire("core")  # empty bucket: sleeps past the reset, then starts a new window
+    assert clock.slept == [31]
+    assert budget.requests == 4
+
+
+def test_budget_resources_are_separate(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(gh, "time", clock)
+    budget = gh.RateBudget()
+    budget.exhaust("search", int(clock.now) + 60)
+
+    budget.acquire("core")
+    assert clock.slept == []
+    budget.acquire("search")
+    assert clock.slept == [61]
+
+
+def test_budget_keeps_lowest_remaining_of_out_of_order_responses():
+    budget = gh.RateBudget()
+    budget.update("core", {"X-RateLimit-Remaining": "10", "X-RateLimit-Reset": "500"})
+    budget.update("core", {"X-RateLimit-Remaining": "12", "X-RateLimit-Reset": "500"})
+    assert "core=10" in budget.summary()
+    budget.update("core", {"X-RateLimit-Remaining": "5000", "X-RateLimit-Reset": "4100"})
+    assert "core=5000" in budget.summary()
+
+
+def test_secondary_limit_pause_applies_to_every_resource(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(gh, "time", clock)
+    budget = gh.RateBudget()
+    budget.pause(20)
+
+    budget.acquire("core")
+    budget.acquire("search")
+    assert clock.slept == [20]
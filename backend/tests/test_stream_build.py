@@ -0,0 +1,106 @@
+import json
+import zlib
+
+import numpy as np
+import pytest
+
+from app.meta import MetaTable
+from app.timestamps import row_timestamp
+from stream_build import Outputs, Source, run_build
+
+CHUNK = 50
+
+
+class Interrupted(Exception):
+    pass
+
+
+def encode(texts):
+    """Deterministic stand-in for a sentence encoder."""
+    return np.stack([np.random.default_rng(zlib.crc32(t.encode("utf-8"))).standard_normal(8) for t in texts]).astype("float32")
+
+
+def failing_after(calls: int):
+    def encode_fn(texts):
+        encode_fn.calls += 1
+        if encode_fn.calls > calls:
+            raise Interrupted()
+        return encode(texts)
+
+    encode_fn.calls = 0
+    return encode_fn
+
+
+def project(i: int, title: str = None) -> dict:
+    return {
+        "id": f"p{i}",
+        "title": title or f"Project {i}",
+        "description": f"hackathon entry number {i}",
+        "created_at": f"2024-{1 + i % 12:02d}-01T00:00:00Z",
+    }
+
+
+def write_jsonl(path, records) -> None:
+    path.write_text("".join(json.dumps(r) + "\n" for r in records), encoding="utf-8")
+
+
+def build(tmp_path, path, encode_fn=encode):
+    return run_build(
+        [Source(path, lambda raw: raw)],
+        out=Outputs.in_dir(tmp_path / "data"),
+        model_name="stub",
+        encode_fn=encode_fn,
+        text_of=lambda p: p["title"] + "\n" + p["description"],
+        timestamp_of=row_timestamp,
+        cache_path=tmp_path / "emb.sqlite",
+        chunk_rows=CHUNK,
+    )
+
+
+def built_rows(tmp_path):
+    out = Outputs.in_dir(tmp_path / "data")
+    meta = MetaTable.open(str(out.meta_bin), str(out.meta_offsets))
+    return [meta.row(i) for i in range(len(meta))], np.load(out.emb), np.load(out.row_ts)
+
+
+def interrupted_build(tmp_path, path) -> None:
+    with pytest.raises(Interrupted):
+        build(tmp_path, path, failing_after(3))
+    state = json.loads((tmp_path / "data" / ".build" / "state.json").read_text())
+    assert state["rows"] == 2 * CHUNK  # chunks 1-2 written; 3 encoded ahead, 4 failed
+
+
+@pytest.mark.parametrize("title", ["P0", "Project 0 with a much longer title than before"])
+def test_resume_after_input_rewrite_starts_over(tmp_path, capsys, title):
+    path = tmp_path / "projects.jsonl"
+    records = [project(i) for i in range(300)]
+    write_jsonl(path, records)
+    interrupted_build(tmp_path, path)
+
+    # An already-consumed record changes length, as after a harvester refresh or reclassify.py.
+    records[0] = project(0, title)
+    write_jsonl(path, records)
+    assert build(tmp_path, path)["rows"] == 300
+    assert "starting over" in capsys.readouterr().out
+
+    rows, emb, ts = built_rows(tmp_path)
+    assert [r["id"] for r in rows] == [r["id"] for r in records]
+    assert rows[0]["title"] == title
+    expected = encode([title + "\n" + records[0]["description"]])[0]
+    assert np.allclose(emb[0], expected / np.linalg.norm(expected), atol=1e-6)
+    assert list(ts) == [row_timestamp(r) for r in records]
+
+
+def test_resume_after_append_continues(tmp_path, capsys):
+    path = tmp_path / "projects.jsonl"
+    records = [project(i) for i in range(300)]
+    write_jsonl(path, records)
+    interrupted_build(tmp_path, path)
+
+    records += [project(i) for i in range(300, 320)]
+    write_jsonl(path, records)
+    assert build(tmp_path, path)["rows"] == 320
+    assert f"Resuming build at row {2 * CHUNK}" in capsys.readouterr().out
+
+    rows, _, _ = built_rows(tmp_path)
+    assert [r["id"] for r in rows] == [r["id"] for r in records]